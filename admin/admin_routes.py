@@ -1,8 +1,27 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, current_app, send_file, abort
 from flask_login import login_required, current_user, login_user, logout_user
-from shared.models import db, User, Device, SensorData
+from shared.models import db, User, Device, SensorData, AlertEpisode, NotificationOutbox, HealthDigest, ScheduledJob
 from shared.forms import CreateAdminForm, LoginForm
+from shared.live_buffer import get_live_buffer
+from shared.fragments import render_cached_page, mark_data_changed, time_bucket, GLOBAL_VERSION
+from shared.identity import mark_identities_changed
+from shared import metrics
+from shared.sql_profiler import query_budget
+from shared.population import record_reading, compare_to_population
+from shared.scheduler import definitions_for, run_now
+from shared.reports import InvalidReportRange, parse_range, submit_report, report_status, get_store
+from shared.shards import readings_session, readings_query, commit_readings, delete_user_readings, scatter
+from shared.alert_rules import alert_engine
+from shared.notifications import enqueue_alert_notifications
+from shared.health import classify_status
+from shared.devices import touch_device, provision_devices, parse_device_records, detect_format
+from shared.pagination import keyset_paginate, prefix_filter, InvalidCursor
+from shared.passwords import PasswordVerifierBusy, rehash_after_login
 from datetime import datetime, timedelta
+from sqlalchemy import case, func, select
+import csv
+import io
+from werkzeug.utils import secure_filename
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -18,7 +37,14 @@ def admin_login():
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         
-        if user and user.check_password(form.password.data) and user.is_active and user.role == 'admin':
+        try:
+            valid = bool(user) and user.check_password(form.password.data)
+        except PasswordVerifierBusy:
+            flash('El servidor está atendiendo muchos inicios de sesión. Inténtalo de nuevo en unos segundos.', 'warning')
+            return render_template('admin/login.html', form=form), 503
+        
+        if valid and user.is_active and user.role == 'admin':
+            rehash_after_login(user, form.password.data)
             login_user(user, remember=True, force=True)
             flash('¡Inicio de sesión exitoso como Administrador!', 'success')
             return redirect(url_for('admin.admin_dashboard'))
@@ -51,53 +77,67 @@ def restrict_to_admin():
 
 @admin_bp.route('/dashboard')
 @login_required
+@query_budget(4)
 def admin_dashboard():
-    if current_user.is_root_admin():
-        total_users = User.query.filter_by(role='user', is_active=True, is_deleted=False).count()
-        recent_users = User.query.filter_by(role='user', is_active=True, is_deleted=False).order_by(User.created_at.desc()).limit(5).all()
-        total_admins = User.query.filter_by(role='admin', is_active=True, is_deleted=False).count() - 1
-        inactive_users = User.query.filter_by(is_active=False, is_deleted=True).count()
-    else:
-        total_users = User.query.filter_by(role='user', is_active=True, is_deleted=False).count()
-        recent_users = User.query.filter_by(role='user', is_active=True, is_deleted=False).order_by(User.created_at.desc()).limit(5).all()
-        total_admins = 0
-        inactive_users = User.query.filter_by(is_active=False, is_deleted=True, created_by=current_user.id).count()
+    is_root = current_user.is_root_admin()
+    active_patient = (User.role == 'user') & User.is_active & ~User.is_deleted
+    inactive = ~User.is_active & User.is_deleted
+    if not is_root:
+        inactive = inactive & (User.created_by == current_user.id)
+    
+    # Todos los contadores en una sola consulta (antes, un COUNT por tarjeta)
+    counts = db.session.execute(select(
+        _count_where(active_patient),
+        _count_where((User.role == 'admin') & User.is_active & ~User.is_deleted),
+        _count_where(inactive),
+        _count_where((User.created_by == current_user.id) & User.is_active & ~User.is_deleted),
+        select(func.count(Device.id)).scalar_subquery(),
+        select(func.count(Device.id)).where(Device.is_used).scalar_subquery(),
+        select(func.count(AlertEpisode.id)).scalar_subquery()
+    ).select_from(User)).one()
+    total_users, active_admins, inactive_users, my_users, total_devices, used_devices, total_alerts = counts
+    recent_users = User.query.filter(active_patient).order_by(User.created_at.desc()).limit(5).all()
     
     stats = {
         'total_users': total_users,
-        'total_devices': Device.query.count(),
-        'used_devices': Device.query.filter_by(is_used=True).count(),
-        'available_devices': Device.query.filter_by(is_used=False).count(),
-        'total_alerts': SensorData.query.filter_by(is_alert=True).count(),
-        'total_admins': total_admins,
-        'my_users': User.query.filter_by(created_by=current_user.id, is_active=True, is_deleted=False).count(),
+        'total_devices': total_devices,
+        'used_devices': used_devices,
+        'available_devices': total_devices - used_devices,
+        'total_alerts': total_alerts,
+        'total_admins': active_admins - 1 if is_root else 0,
+        'my_users': my_users,
         'inactive_users': inactive_users,
-        'is_root_admin': current_user.is_root_admin()
+        'is_root_admin': is_root
     }
     
     return render_template('admin/dashboard.html', stats=stats, recent_users=recent_users)
 
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
 # ==================== GESTIÓN DE USUARIOS ====================
 
 @admin_bp.route('/users')
 @login_required
 def admin_users():
-    if current_user.is_root_admin():
-        users_list = User.query.filter_by(role='user', is_active=True, is_deleted=False).order_by(User.created_at.desc()).all()
-    else:
-        users_list = User.query.filter_by(role='user', is_active=True, is_deleted=False).order_by(User.created_at.desc()).all()
+    try:
+        page = paginate_listing('users')
+    except InvalidCursor:
+        return redirect(url_for('admin.admin_users'))
     
-    return render_template('admin/users.html', users=users_list)
+    return render_template('admin/users.html', users=page.items, page=page,
+                           listing=LISTINGS['users'], endpoint='admin.admin_users')
 
 @admin_bp.route('/inactive-users')
 @login_required
 def admin_inactive_users():
-    if current_user.is_root_admin():
-        inactive_users = User.query.filter_by(is_active=False, is_deleted=True).order_by(User.deleted_at.desc()).all()
-    else:
-        inactive_users = User.query.filter_by(is_active=False, is_deleted=True, created_by=current_user.id).order_by(User.deleted_at.desc()).all()
+    try:
+        page = paginate_listing('inactive_users')
+    except InvalidCursor:
+        return redirect(url_for('admin.admin_inactive_users'))
     
-    return render_template('admin/inactive_users.html', users=inactive_users)
+    return render_template('admin/inactive_users.html', users=page.items, page=page,
+                           listing=LISTINGS['inactive_users'], endpoint='admin.admin_inactive_users')
 
 @admin_bp.route('/user/deactivate/<int:user_id>', methods=['POST'])
 @login_required
@@ -152,11 +192,19 @@ def admin_delete_permanent(user_id):
         device = Device.query.filter_by(device_code=user.device_code).first()
         if device:
             device.is_used = False
+            device.assigned_at = None
     
-    SensorData.query.filter_by(user_id=user_id).delete()
+    delete_user_readings([user_id])
+    AlertEpisode.query.filter_by(user_id=user_id).delete()
+    NotificationOutbox.query.filter_by(user_id=user_id).delete()
     db.session.delete(user)
     db.session.commit()
     
+    alert_engine.forget(user_id)
+    live_buffer = get_live_buffer()
+    if live_buffer:
+        live_buffer.discard(user_id)
+    
     flash('Usuario eliminado permanentemente del sistema', 'warning')
     return redirect(url_for('admin.admin_inactive_users'))
 
@@ -165,8 +213,20 @@ def admin_delete_permanent(user_id):
 @admin_bp.route('/devices')
 @login_required
 def admin_devices():
-    devices_list = Device.query.order_by(Device.created_at).all()
-    return render_template('admin/devices.html', devices=devices_list)
+    try:
+        page = paginate_listing('devices')
+    except InvalidCursor:
+        return redirect(url_for('admin.admin_devices'))
+    
+    # Un único agregado para el resumen (no se cargan las filas)
+    counts = dict(db.session.query(Device.is_used, func.count(Device.id)).group_by(Device.is_used).all())
+    device_stats = {
+        'total': sum(counts.values()),
+        'available': counts.get(False, 0),
+        'used': counts.get(True, 0)
+    }
+    return render_template('admin/devices.html', devices=page.items, page=page, device_stats=device_stats,
+                           listing=LISTINGS['devices'], endpoint='admin.admin_devices')
 
 # ==================== GESTIÓN DE ADMINISTRADORES (ROOT ONLY) ====================
 
@@ -194,7 +254,11 @@ def admin_create_admin():
             role='admin',
             created_by=current_user.id
         )
-        admin.set_password(form.password.data)
+        try:
+            admin.set_password(form.password.data)
+        except PasswordVerifierBusy:
+            flash('El servidor está atendiendo muchas solicitudes. Inténtalo de nuevo en unos segundos.', 'warning')
+            return render_template('admin/create_admin.html', form=form), 503
         
         db.session.add(admin)
         db.session.commit()
@@ -211,15 +275,17 @@ def admin_admins():
         flash('Solo el administrador principal puede gestionar otros administradores', 'danger')
         return redirect(url_for('admin.admin_dashboard'))
     
-    admins_list = User.query.filter(
-        User.role == 'admin',
-        User.id != current_user.id
-    ).order_by(User.created_at.desc()).all()
+    try:
+        page = paginate_listing('admins')
+    except InvalidCursor:
+        return redirect(url_for('admin.admin_admins'))
     
-    return render_template('admin/admins.html', admins=admins_list)
+    return render_template('admin/admins.html', admins=page.items, page=page,
+                           listing=LISTINGS['admins'], endpoint='admin.admin_admins')
 
 @admin_bp.route('/admin/delete/<int:admin_id>', methods=['POST'])
 @login_required
+@query_budget(12)
 def admin_delete_admin(admin_id):
     if not current_user.is_root_admin():
         flash('Solo el administrador principal puede eliminar otros administradores', 'danger')
@@ -236,12 +302,26 @@ def admin_delete_admin(admin_id):
         return redirect(url_for('admin.admin_admins'))
     
     users_created = User.query.filter_by(created_by=target_admin.id).all()
-    for user in users_created:
-        SensorData.query.filter_by(user_id=user.id).delete()
+    created_ids = [user.id for user in users_created]
+    delete_user_readings(created_ids)
+    # Un DELETE por tabla para todos los pacientes, no uno por paciente
+    if created_ids:
+        AlertEpisode.query.filter(AlertEpisode.user_id.in_(created_ids)).delete()
+        NotificationOutbox.query.filter(NotificationOutbox.user_id.in_(created_ids)).delete()
     
     User.query.filter_by(created_by=target_admin.id).delete()
     db.session.delete(target_admin)
     db.session.commit()
+    # El DELETE masivo no pasa por los eventos de la sesión: sesiones abiertas
+    # y páginas en caché de esos pacientes se invalidan a mano
+    mark_identities_changed(created_ids)
+    mark_data_changed(created_ids)
+    
+    live_buffer = get_live_buffer()
+    for user in users_created:
+        alert_engine.forget(user.id)
+        if live_buffer:
+            live_buffer.discard(user.id)
     
     flash('Administrador eliminado correctamente', 'success')
     return redirect(url_for('admin.admin_admins'))
@@ -250,36 +330,64 @@ def admin_delete_admin(admin_id):
 
 @admin_bp.route('/user-reports')
 @login_required
+@query_budget(4)
 def admin_user_reports():
+    # Agrega a todos los pacientes: se valida con la versión global (altas,
+    # bajas, resúmenes) y el tramo de tiempo acota el desfase de las lecturas
+    return render_cached_page('admin/user_reports.html',
+                              key=(current_user.is_root_admin(), time_bucket()),
+                              user_ids=[GLOBAL_VERSION],
+                              build=_user_reports_context)
+
+def _user_reports_context():
     if current_user.is_root_admin():
         users = User.query.filter_by(role='user', is_active=True, is_deleted=False).all()
     else:
         users = User.query.filter_by(role='user', is_active=True, is_deleted=False).all()
     
+    # Resúmenes precalculados por el lote nocturno (flask generate-digests)
+    latest_digest_date = db.session.query(db.func.max(HealthDigest.digest_date)).scalar()
+    digests = {}
+    if latest_digest_date:
+        digests = {d.user_id: d for d in HealthDigest.query.filter_by(digest_date=latest_digest_date)}
+    
+    # Sin resumen (usuario nuevo o lote no ejecutado): agregado en vivo de la
+    # última semana, un GROUP BY por shard en paralelo
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    live_stats = {}
+    missing = [user.id for user in users if user.id not in digests]
+    if missing:
+        for shard_stats in scatter(lambda connection, user_ids: _recent_stats(connection, user_ids, week_ago),
+                                   missing):
+            live_stats.update(shard_stats)
+    
+    live_buffer = get_live_buffer()
     user_reports = []
     for user in users:
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        user_data = SensorData.query.filter(
-            SensorData.user_id == user.id,
-            SensorData.timestamp >= week_ago
-        ).all()
+        live_reading = live_buffer.latest(user.id) if live_buffer else None
+        digest = digests.get(user.id)
         
-        total_readings = len(user_data)
-        alert_readings = len([d for d in user_data if d.is_alert])
-        avg_bpm = sum([d.bpm for d in user_data]) / total_readings if total_readings > 0 else 0
+        if digest:
+            user_reports.append({
+                'user': user,
+                'total_readings': digest.total_readings,
+                'alert_readings': digest.alert_readings,
+                'avg_bpm': digest.avg_bpm,
+                'status': digest.status,
+                'status_class': digest.status_class,
+                'last_reading': live_reading.timestamp if live_reading else digest.last_reading_at,
+                'resting_bpm': digest.resting_bpm,
+                'anomaly_count': digest.anomaly_count
+            })
+            continue
         
-        if total_readings == 0:
-            status = "Sin datos"
-            status_class = "secondary"
-        elif alert_readings / total_readings < 0.1:
-            status = "Excelente"
-            status_class = "success"
-        elif alert_readings / total_readings < 0.3:
-            status = "Estable"
-            status_class = "warning"
-        else:
-            status = "Necesita atención"
-            status_class = "danger"
+        total_readings, alert_readings, avg_bpm, last_reading = live_stats.get(user.id, (0, 0, 0, None))
+        
+        # Última lectura: primero el buffer en vivo, si no la más reciente de la semana
+        if live_reading:
+            last_reading = live_reading.timestamp
+        
+        status, status_class = classify_status(total_readings, alert_readings)
         
         user_reports.append({
             'user': user,
@@ -288,10 +396,22 @@ def admin_user_reports():
             'avg_bpm': round(avg_bpm, 1),
             'status': status,
             'status_class': status_class,
-            'last_reading': user_data[0].timestamp if user_data else None
+            'last_reading': last_reading
         })
     
-    return render_template('admin/user_reports.html', user_reports=user_reports)
+    return dict(user_reports=user_reports, digest_date=latest_digest_date)
+
+def _recent_stats(connection, user_ids, since):
+    """Lecturas, alertas, BPM medio y última lectura desde ``since`` de cada usuario (los de un shard)."""
+    rows = connection.execute(
+        select(SensorData.user_id, func.count(SensorData.id),
+               func.sum(case((SensorData.is_alert, 1), else_=0)),
+               func.avg(SensorData.bpm), func.max(SensorData.timestamp))
+        .where(SensorData.user_id.in_(user_ids), SensorData.timestamp >= since)
+        .group_by(SensorData.user_id)
+    )
+    return {user_id: (total, int(alerts or 0), avg_bpm or 0, last_reading)
+            for user_id, total, alerts, avg_bpm, last_reading in rows}
 
 @admin_bp.route('/user-report/<int:user_id>')
 @login_required
@@ -306,8 +426,15 @@ def admin_user_detailed_report(user_id):
         flash('No se puede ver reporte de usuario desactivado', 'danger')
         return redirect(url_for('admin.admin_user_reports'))
     
+    return render_cached_page('admin/user_detailed_report.html',
+                              key=user.id,
+                              user_ids=[user.id],
+                              build=lambda: _detailed_report_context(user))
+
+def _detailed_report_context(user):
     month_ago = datetime.utcnow() - timedelta(days=30)
-    user_data = SensorData.query.filter(
+    readings = readings_query(user.id)
+    user_data = readings.filter(
         SensorData.user_id == user.id,
         SensorData.timestamp >= month_ago
     ).order_by(SensorData.timestamp.desc()).all()
@@ -321,7 +448,7 @@ def admin_user_detailed_report(user_id):
         week_start = datetime.utcnow() - timedelta(weeks=(4-i))
         week_end = week_start + timedelta(weeks=1)
         
-        week_readings = SensorData.query.filter(
+        week_readings = readings.filter(
             SensorData.user_id == user.id,
             SensorData.timestamp >= week_start,
             SensorData.timestamp < week_end
@@ -338,14 +465,90 @@ def admin_user_detailed_report(user_id):
             'readings': len(week_readings)
         })
     
-    return render_template('admin/user_detailed_report.html',
-                         user=user,
-                         user_data=user_data,
-                         total_readings=total_readings,
-                         alert_readings=alert_readings,
-                         avg_bpm=avg_bpm,
-                         weekly_data=weekly_data,
-                         month_ago=month_ago)
+    # Posición frente a su franja de edad y condición (histogramas de población)
+    digest = HealthDigest.query.filter_by(user_id=user.id)\
+        .order_by(HealthDigest.digest_date.desc()).first()
+    population = compare_to_population(user, avg_bpm, digest.resting_bpm if digest else None)
+    
+    return dict(user=user,
+                user_data=user_data,
+                total_readings=total_readings,
+                alert_readings=alert_readings,
+                avg_bpm=avg_bpm,
+                weekly_data=weekly_data,
+                population=population,
+                month_ago=month_ago)
+
+# ==================== REPORTES DESCARGABLES ====================
+
+def _report_links(status):
+    if 'job_id' in status:
+        status['status_url'] = url_for('admin.admin_api_report_status', job_id=status['job_id'])
+    if status.get('key'):
+        status['download_url'] = url_for('admin.admin_download_report', key=status['key'],
+                                         filename=status.get('filename'))
+    return status
+
+@admin_bp.route('/api/reports', methods=['POST'])
+@login_required
+def admin_api_submit_report():
+    """Pide el reporte de un paciente; 200 si ya está generado, 202 si se encoló."""
+    data = request.get_json(silent=True) or request.form
+    try:
+        user = db.session.get(User, int(data.get('user_id')))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'user_id requerido'}), 400
+    if user is None or user.role != 'user' or user.is_deleted:
+        return jsonify({'error': 'Paciente no encontrado'}), 404
+    try:
+        start_date, end_date = parse_range(data.get('start'), data.get('end'))
+    except InvalidReportRange as e:
+        return jsonify({'error': str(e)}), 400
+    
+    status = _report_links(submit_report(user, start_date, end_date))
+    return jsonify(status), 200 if status['status'] == 'ready' else 202
+
+@admin_bp.route('/api/reports/<int:job_id>')
+@login_required
+def admin_api_report_status(job_id):
+    entry = ScheduledJob.query.filter_by(id=job_id, job='patient-report').first_or_404()
+    return jsonify(_report_links(report_status(entry)))
+
+@admin_bp.route('/reports/<key>/download')
+@login_required
+def admin_download_report(key):
+    try:
+        path = get_store().path(key)
+    except ValueError:
+        abort(404)
+    filename = secure_filename(request.args.get('filename') or '') or f'reporte_{key[:12]}.html'
+    try:
+        return send_file(path, mimetype='text/html', as_attachment=True, download_name=filename)
+    except FileNotFoundError:
+        abort(404)
+
+# ==================== TRABAJOS EN SEGUNDO PLANO ====================
+
+@admin_bp.route('/jobs')
+@login_required
+def admin_jobs():
+    periodic = ScheduledJob.query.filter(ScheduledJob.interval_seconds.isnot(None))\
+        .order_by(ScheduledJob.name).all()
+    one_off = ScheduledJob.query.filter(ScheduledJob.interval_seconds.is_(None))\
+        .order_by(ScheduledJob.id.desc()).limit(50).all()
+    return render_template('admin/jobs.html', periodic=periodic, one_off=one_off,
+                           definitions=definitions_for(current_app.config['APP_ROLE']),
+                           now=datetime.utcnow())
+
+@admin_bp.route('/jobs/<int:job_id>/run', methods=['POST'])
+@login_required
+def admin_run_job(job_id):
+    if run_now(job_id):
+        db.session.commit()
+        flash('Trabajo programado: se ejecutará en los próximos segundos', 'success')
+    else:
+        flash('El trabajo ya se está ejecutando o ya terminó', 'warning')
+    return redirect(url_for('admin.admin_jobs'))
 
 # ==================== APIs ====================
 
@@ -356,12 +559,57 @@ def admin_api_stats():
         'total_users': User.query.filter_by(role='user', is_active=True, is_deleted=False).count(),
         'used_devices': Device.query.filter_by(is_used=True).count(),
         'available_devices': Device.query.filter_by(is_used=False).count(),
-        'active_alerts': SensorData.query.filter_by(is_alert=True).count()
+        'active_alerts': AlertEpisode.query.filter_by(ended_at=None).count()
     }
     return jsonify(stats)
 
+@admin_bp.route('/api/devices/provision', methods=['POST'])
+@login_required
+def admin_api_provision_devices():
+    """
+    Aprovisionamiento masivo. Acepta un archivo en el campo ``file`` o el
+    cuerpo crudo (text/csv o application/x-ndjson).
+    """
+    upload = request.files.get('file')
+    if upload:
+        fmt = detect_format(upload.filename or '', upload.mimetype or '')
+        lines = io.TextIOWrapper(upload.stream, encoding='utf-8')
+    else:
+        fmt = detect_format(content_type=request.mimetype or '')
+        lines = io.StringIO(request.get_data(as_text=True))
+    
+    try:
+        result = provision_devices(parse_device_records(lines, fmt),
+                                   batch=request.args.get('batch') or request.form.get('batch'))
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'error': f'Archivo no válido: {str(e)}'}), 400
+    
+    print(f"📦 Aprovisionamiento por {current_user.username}: {result}")
+    return jsonify(result), 200
+
+@admin_bp.route('/api/list/<kind>')
+@login_required
+def admin_api_list(kind):
+    """
+    Listados paginados en JSON (users, inactive_users, devices, admins).
+    Parámetros: q, campo, orden, after, before, per_page.
+    """
+    if kind not in LISTINGS:
+        return jsonify({'error': f'Listado desconocido: {kind}'}), 404
+    if kind == 'admins' and not current_user.is_root_admin():
+        return jsonify({'error': 'Solo el administrador principal'}), 403
+    
+    try:
+        page = paginate_listing(kind)
+    except InvalidCursor:
+        return jsonify({'error': 'Cursor no válido'}), 400
+    
+    return jsonify(page.to_dict(LISTINGS[kind]['serialize']))
+
 # ✅ ENDPOINT CRÍTICO PARA ESP32 - SIN @login_required
 @admin_bp.route('/api/sensor-data', methods=['POST'])
+@query_budget(10)
 def receive_sensor_data():
     """
     Endpoint para recibir datos del ESP32.
@@ -372,22 +620,27 @@ def receive_sensor_data():
         data = request.get_json()
         
         if not data:
+            metrics.ingest_rejected.inc('no_json')
             return jsonify({'error': 'No se recibieron datos JSON'}), 400
             
         if 'device_code' not in data or 'bpm' not in data:
+            metrics.ingest_rejected.inc('incomplete')
             return jsonify({'error': 'Datos incompletos. Se requiere device_code y bpm'}), 400
         
         device_code = data['device_code'].strip().upper()
         bpm = int(data['bpm'])
         
         if bpm < 30 or bpm > 220:
+            metrics.ingest_rejected.inc('out_of_range')
             return jsonify({'error': f'BPM fuera de rango válido: {bpm}'}), 400
         
         user = User.query.filter_by(device_code=device_code).first()
         if not user:
+            metrics.ingest_rejected.inc('unknown_device')
             return jsonify({'error': f'Dispositivo no registrado: {device_code}'}), 404
         
         if not user.is_active or user.is_deleted:
+            metrics.ingest_rejected.inc('inactive_user')
             return jsonify({'error': 'Usuario desactivado'}), 403
         
         max_safe = user.max_safe_bpm or 120
@@ -401,8 +654,28 @@ def receive_sensor_data():
             timestamp=datetime.utcnow()
         )
         
-        db.session.add(sensor_data)
-        db.session.commit()
+        # Con sensor_data repartida la lectura se confirma ya en su shard, antes
+        # de tomar el bloqueo de escritura de la BD principal; sin reparto va
+        # en la misma transacción que los episodios
+        readings = readings_session(user.id)
+        readings.add(sensor_data)
+        commit_readings(readings)
+        touch_device(device_code, data.get('firmware_version'), sensor_data.timestamp)
+        
+        # Episodios de alerta (umbral sostenido, histéresis, cambio brusco)
+        try:
+            alert_events = alert_engine.evaluate(user, bpm, sensor_data.timestamp)
+            # Solo se encola: el envío lo hace el despachador fuera de la petición
+            enqueue_alert_notifications(user, alert_events, current_app.config)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            alert_engine.forget(user.id)
+            raise
+        
+        publish_live_reading(user.id, sensor_data)
+        record_reading(user, sensor_data)
+        metrics.ingest_readings.inc('true' if is_alert else 'false')
         
         response_data = {
             'message': 'Datos recibidos correctamente',
@@ -419,12 +692,163 @@ def receive_sensor_data():
             else:
                 response_data['alert_message'] = f'ALERTA: Bradicardia ({bpm} < {min_safe} BPM)'
         
+        for event in alert_events:
+            metrics.alert_episodes.inc(event.rule.name, event.type)
+            print(f"🚨 Episodio {event.rule.name} {'abierto' if event.type == 'opened' else 'cerrado'} - Usuario: {user.username}")
+        opened = [event.rule.name for event in alert_events if event.type == 'opened']
+        if opened:
+            response_data['alert_episodes'] = opened
+        
         print(f"✅ Datos recibidos - Usuario: {user.username}, BPM: {bpm}, Alerta: {is_alert}")
         
         return jsonify(response_data), 200
         
     except ValueError as e:
+        metrics.ingest_rejected.inc('invalid_bpm')
         return jsonify({'error': f'Error en formato de BPM: {str(e)}'}), 400
     except Exception as e:
+        metrics.ingest_rejected.inc('error')
         print(f"❌ Error en receive_sensor_data: {str(e)}")
-        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+# ==================== FUNCIONES AUXILIARES ====================
+
+def publish_live_reading(user_id, sensor_data):
+    """Escribe la lectura en el buffer compartido; si el slot no es del usuario lo carga desde la BD."""
+    live_buffer = get_live_buffer()
+    if not live_buffer:
+        return
+    try:
+        if live_buffer.append(user_id, sensor_data.timestamp, sensor_data.bpm, sensor_data.is_alert):
+            return
+        latest = readings_query(user_id).filter_by(user_id=user_id)\
+            .order_by(SensorData.timestamp.desc())\
+            .limit(live_buffer.capacity)\
+            .all()
+        if live_buffer.seed(user_id, [(d.timestamp, d.bpm, d.is_alert) for d in reversed(latest)]):
+            metrics.live_buffer_evictions.inc()
+    except Exception as e:
+        # El buffer es solo una caché: la lectura ya está en la BD
+        print(f"⚠️ Error actualizando buffer en vivo: {str(e)}")
+
+# ==================== LISTADOS PAGINADOS ====================
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+def _serialize_user(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'device_code': user.device_code,
+        'heart_condition': user.heart_condition,
+        'created_at': _iso(user.created_at),
+        'deleted_at': _iso(user.deleted_at)
+    }
+
+def _serialize_device(device):
+    return {
+        'id': device.id,
+        'device_code': device.device_code,
+        'is_used': device.is_used,
+        'assigned_at': _iso(device.assigned_at),
+        'last_seen_at': _iso(device.last_seen_at),
+        'firmware_version': device.firmware_version,
+        'batch': device.batch,
+        'created_at': _iso(device.created_at)
+    }
+
+def _users_query():
+    return User.query.filter_by(role='user', is_active=True, is_deleted=False)
+
+def _inactive_users_query():
+    query = User.query.filter_by(is_active=False, is_deleted=True)
+    if not current_user.is_root_admin():
+        query = query.filter_by(created_by=current_user.id)
+    return query
+
+def _admins_query():
+    return User.query.filter(User.role == 'admin', User.id != current_user.id)
+
+def _devices_query():
+    query = Device.query
+    estado = request.args.get('estado')
+    if estado == 'disponible':
+        query = query.filter_by(is_used=False)
+    elif estado == 'en_uso':
+        query = query.filter_by(is_used=True)
+    return query
+
+# Campos de búsqueda: (columna, sin distinguir mayúsculas). Al buscar se ordena
+# por ese mismo campo para que filtro y orden usen el mismo índice.
+_USER_SEARCH = {
+    'usuario': (User.username, True),
+    'email': (User.email, True),
+    'dispositivo': (User.device_code, False)
+}
+
+# Órdenes: (columnas, descendente); la última columna es única
+LISTINGS = {
+    'users': {
+        'query': _users_query,
+        'search': _USER_SEARCH,
+        'sorts': {
+            'recientes': ([User.created_at, User.id], True),
+            'usuario': ([func.lower(User.username), User.id], False),
+            'email': ([func.lower(User.email), User.id], False)
+        },
+        'serialize': _serialize_user
+    },
+    'inactive_users': {
+        'query': _inactive_users_query,
+        'search': _USER_SEARCH,
+        'sorts': {
+            'recientes': ([User.deleted_at, User.id], True),
+            'usuario': ([func.lower(User.username), User.id], False)
+        },
+        'serialize': _serialize_user
+    },
+    'admins': {
+        'query': _admins_query,
+        'search': {'usuario': _USER_SEARCH['usuario'], 'email': _USER_SEARCH['email']},
+        'sorts': {
+            'recientes': ([User.created_at, User.id], True),
+            'usuario': ([func.lower(User.username), User.id], False)
+        },
+        'serialize': _serialize_user
+    },
+    'devices': {
+        'query': _devices_query,
+        'search': {'dispositivo': (Device.device_code, False)},
+        'sorts': {
+            'antiguos': ([Device.created_at, Device.id], False),
+            'recientes': ([Device.created_at, Device.id], True),
+            'codigo': ([Device.device_code], False)
+        },
+        'serialize': _serialize_device
+    }
+}
+
+def paginate_listing(kind):
+    """Aplica búsqueda, orden y cursor de la petición al listado ``kind``."""
+    listing = LISTINGS[kind]
+    query = listing['query']()
+    sort = request.args.get('orden')
+    columns, descending = listing['sorts'].get(sort) or next(iter(listing['sorts'].values()))
+    
+    q = request.args.get('q', '').strip()
+    field = request.args.get('campo')
+    if q:
+        column, case_insensitive = listing['search'].get(field) or next(iter(listing['search'].values()))
+        if not case_insensitive:
+            q = q.upper()
+        query = query.filter(*prefix_filter(column, q, case_insensitive))
+        sort_key = func.lower(column) if case_insensitive else column
+        id_column = columns[-1]
+        columns, descending = ([sort_key, id_column] if sort_key is not id_column else [id_column]), False
+    
+    return keyset_paginate(query, columns, descending,
+                           after=request.args.get('after'),
+                           before=request.args.get('before'),
+                           per_page=request.args.get('per_page', type=int))
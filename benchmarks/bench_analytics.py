@@ -0,0 +1,180 @@
+# benchmarks/bench_analytics.py
+"""
+Rendimiento del análisis vectorizado de series (shared/analytics.py).
+
+Genera en memoria series sintéticas de 7 días (shared/synthetic.py, una
+lectura cada 3 s) y mide cada función en muestras/s. Compara las dos más
+sencillas con un bucle de Python equivalente, y mide analyze_series completo
+en pacientes/s por núcleo.
+
+Con --instance también mide la carga desde la BD (load_series) y el análisis
+de los pacientes de esa instancia (p.ej. sembrada con ``flask seed-readings``).
+
+Uso:
+    python benchmarks/bench_analytics.py --patients 20
+    python benchmarks/bench_analytics.py --instance /tmp/hearttone --limit 50
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from shared import analytics
+from shared.synthetic import generate_readings
+
+
+def python_rolling_mean(values, window):
+    """Referencia: ventana deslizante con deque y suma incremental."""
+    result = []
+    buffer = deque()
+    total = 0.0
+    for value in values:
+        buffer.append(value)
+        total += value
+        if len(buffer) > window:
+            total -= buffer.popleft()
+        if len(buffer) == window:
+            result.append(total / window)
+    return result
+
+
+def python_rmssd(times, bpm, max_gap=analytics.MAX_GAP):
+    squares = []
+    for i in range(1, len(bpm)):
+        if times[i] - times[i - 1] <= max_gap:
+            diff = 60000.0 / bpm[i] - 60000.0 / bpm[i - 1]
+            squares.append(diff * diff)
+    return math.sqrt(sum(squares) / len(squares)) if squares else None
+
+
+def _best(fn, runs):
+    """Mejor tiempo de ``runs`` ejecuciones (segundos) y el último resultado."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def synthetic_series(patients, days, seed):
+    rng = np.random.default_rng(seed)
+    end = datetime.utcnow()
+    conditions = ['', 'arritmia', 'taquicardia', 'bradicardia']
+    series = []
+    for i in range(patients):
+        patient = SimpleNamespace(age=30 + i % 50, heart_condition=conditions[i % len(conditions)],
+                                  min_safe_bpm=55, max_safe_bpm=140)
+        times, bpm, _ = generate_readings(patient, end - timedelta(days=days), end, 3, rng)
+        series.append((times, bpm.astype(np.float64)))
+    return series
+
+
+def bench_functions(series, runs):
+    times, bpm = series[0]
+    samples = len(bpm)
+    window = analytics.WINDOW
+    print(f"Serie de {samples:,} lecturas, ventana {window}\n")
+    print(f"{'función':<30}{'ms':>10}{'M muestras/s':>15}")
+    cases = [
+        ('rolling_mean', lambda: analytics.rolling_mean(bpm, window)),
+        ('rolling_std', lambda: analytics.rolling_std(bpm, window)),
+        ('rolling_median', lambda: analytics.rolling_median(bpm, window)),
+        ('successive_difference_stats', lambda: analytics.successive_difference_stats(times, bpm)),
+        ('zscore_anomalies', lambda: analytics.zscore_anomalies(bpm, window)),
+        ('changepoints', lambda: analytics.changepoints(bpm, window)),
+        ('resting_rate', lambda: analytics.resting_rate(bpm, window)),
+        ('analyze_series', lambda: analytics.analyze_series(times, bpm)),
+    ]
+    timings = {}
+    for name, fn in cases:
+        elapsed, _ = _best(fn, runs)
+        timings[name] = elapsed
+        print(f"{name:<30}{elapsed * 1000:>10.1f}{samples / elapsed / 1e6:>15.2f}")
+
+    # Referencias en Python puro (listas, como el código previo a NumPy)
+    bpm_list, times_list = bpm.tolist(), times.tolist()
+    print(f"\n{'referencia Python':<30}{'ms':>10}{'aceleración':>15}")
+    elapsed, reference = _best(lambda: python_rolling_mean(bpm_list, window), 1)
+    assert np.allclose(reference, analytics.rolling_mean(bpm, window))
+    print(f"{'rolling_mean':<30}{elapsed * 1000:>10.1f}{elapsed / timings['rolling_mean']:>14.0f}×")
+    elapsed, reference = _best(lambda: python_rmssd(times_list, bpm_list), 1)
+    assert abs(reference - analytics.successive_difference_stats(times, bpm)['rmssd_ms']) < 0.1
+    print(f"{'rmssd':<30}{elapsed * 1000:>10.1f}"
+          f"{elapsed / timings['successive_difference_stats']:>14.0f}×")
+
+
+def bench_patients(series):
+    started = time.perf_counter()
+    results = [analytics.analyze_series(times, bpm) for times, bpm in series]
+    elapsed = time.perf_counter() - started
+    samples = sum(len(bpm) for _, bpm in series)
+    print(f"\nanalyze_series: {len(series)} pacientes en {elapsed:.2f}s "
+          f"({len(series) / elapsed:.1f} pacientes/s, {samples / elapsed / 1e6:.2f} M lecturas/s por núcleo)")
+    print(f"  reposo mediano {statistics.median(r['resting_bpm'] for r in results):.1f} BPM, "
+          f"anomalías {sum(r['anomaly_count'] for r in results)}, "
+          f"cambios de nivel {sum(r['changepoint_count'] for r in results)}")
+
+
+def bench_database(instance, limit, days):
+    os.environ['INSTANCE_PATH'] = instance
+    from shared.app_factory import create_app
+    from shared.models import db, User
+    from shared.shards import readings_engine
+
+    app = create_app('admin')
+    since = datetime.utcnow() - timedelta(days=days)
+    with app.app_context():
+        user_ids = [uid for (uid,) in db.session.query(User.id).filter_by(role='user').order_by(User.id).limit(limit)]
+        load_time = analyze_time = 0.0
+        rows = 0
+        for user_id in user_ids:
+            # Con SENSOR_SHARDS en el entorno, cada paciente desde su shard
+            with readings_engine(user_id).connect() as connection:
+                started = time.perf_counter()
+                times, bpm = analytics.load_series(connection, user_id, since)
+                loaded = time.perf_counter()
+            analytics.analyze_series(times, bpm)
+            load_time += loaded - started
+            analyze_time += time.perf_counter() - loaded
+            rows += len(bpm)
+    total = load_time + analyze_time
+    if not user_ids or not total:
+        print("\nℹ️ La instancia no tiene pacientes con lecturas")
+        return
+    print(f"\nBD {instance}: {len(user_ids)} pacientes, {rows:,} lecturas")
+    print(f"  carga    {load_time:.2f}s ({rows / load_time / 1e6:.2f} M filas/s)")
+    print(f"  análisis {analyze_time:.2f}s ({rows / analyze_time / 1e6:.2f} M lecturas/s)")
+    print(f"  total    {len(user_ids) / total:.1f} pacientes/s por proceso")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, default=20, help='Series sintéticas en memoria')
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--instance', help='Directorio de instancia con lecturas a analizar')
+    parser.add_argument('--limit', type=int, default=50, help='Pacientes de la instancia')
+    options = parser.parse_args()
+
+    series = synthetic_series(options.patients, options.days, options.seed)
+    bench_functions(series, options.runs)
+    bench_patients(series)
+    if options.instance:
+        bench_database(options.instance, options.limit, options.days)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
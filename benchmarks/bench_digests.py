@@ -0,0 +1,99 @@
+# benchmarks/bench_digests.py
+"""
+Lote nocturno de resúmenes (``flask generate-digests``) sobre una instancia
+sembrada con ``flask seed-readings``.
+
+Ejecuta los mismos comandos de la CLI que en producción: crea --patients
+pacientes sintéticos con --days días de lecturas cada --interval segundos y
+lanza el lote con y sin --analytics. Con --instance reutiliza una instancia
+ya sembrada (solo siembra si no hay pacientes).
+
+    sembrado     filas cargadas y tiempo de seed-readings
+    resúmenes    usuarios/s del lote y si terminó dentro de --budget
+
+Uso:
+    python benchmarks/bench_digests.py --patients 10000 --days 1 --interval 60
+    python benchmarks/bench_digests.py --instance /tmp/hearttone_digests --workers 4 --budget 600
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _create_app(instance, shards):
+    # INSTANCE_PATH se lee al importar la fábrica
+    os.environ['INSTANCE_PATH'] = instance
+    sys.path.insert(0, ROOT)
+    from shared.app_factory import create_app
+    with contextlib.redirect_stdout(io.StringIO()):
+        return create_app('admin', {'SENSOR_SHARDS': shards, 'SCHEDULER_ENABLED': False,
+                                    'METRICS_ENABLED': False})
+
+
+def _invoke(runner, args):
+    started = time.perf_counter()
+    result = runner.invoke(args=args)
+    elapsed = time.perf_counter() - started
+    if result.exception and not isinstance(result.exception, SystemExit):
+        raise result.exception
+    return result.output.strip().splitlines(), elapsed
+
+
+def run(instance, options):
+    app = _create_app(instance, options.shards)
+    from shared.commands import initialize_database
+    from shared.models import User
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        initialize_database(app)
+    runner = app.test_cli_runner()
+
+    with app.app_context():
+        patients = User.query.filter_by(role='user', is_deleted=False).count()
+    if not patients:
+        lines, elapsed = _invoke(runner, ['seed-readings', '--patients', str(options.patients),
+                                          '--days', str(options.days), '--interval', str(options.interval),
+                                          '--seed', '1'])
+        print(f"sembrado ({elapsed:.1f}s): {lines[-1]}")
+    else:
+        print(f"sembrado: instancia existente con {patients} pacientes")
+
+    for analytics in ('--no-analytics', '--analytics'):
+        args = ['generate-digests', analytics, '--chunk-size', str(options.chunk_size)]
+        if options.workers:
+            args += ['--workers', str(options.workers)]
+        if options.budget:
+            args += ['--budget', str(options.budget)]
+        lines, elapsed = _invoke(runner, args)
+        print(f"resúmenes {analytics} ({elapsed:.1f}s): {' | '.join(lines)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lote de resúmenes sobre una instancia sembrada')
+    parser.add_argument('--instance', default=None, help='Directorio de instancia (por defecto, temporal)')
+    parser.add_argument('--patients', type=int, default=10000)
+    parser.add_argument('--days', type=float, default=1, help='Días de lecturas por paciente')
+    parser.add_argument('--interval', type=float, default=60, help='Segundos entre lecturas')
+    parser.add_argument('--shards', type=int, default=0, help='SENSOR_SHARDS de la instancia')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos del lote (por defecto, núcleos)')
+    parser.add_argument('--chunk-size', type=int, default=200)
+    parser.add_argument('--budget', type=float, default=None, help='Presupuesto de tiempo del lote en segundos')
+    options = parser.parse_args()
+
+    print(f"núcleos: {os.cpu_count()}")
+    if options.instance:
+        os.makedirs(options.instance, exist_ok=True)
+        run(options.instance, options)
+    else:
+        with tempfile.TemporaryDirectory(prefix='bench_digests_') as instance:
+            run(instance, options)
+
+
+if __name__ == '__main__':
+    main()
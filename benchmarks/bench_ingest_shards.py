@@ -0,0 +1,162 @@
+# benchmarks/bench_ingest_shards.py
+"""
+Ingesta concurrente con sensor_data en una sola BD frente a repartida en
+shards (SENSOR_SHARDS, shared/shards.py).
+
+Para cada número de shards prepara una instancia temporal con --patients
+pacientes (con dispositivo y --history días de lecturas) y lanza --processes
+procesos que, como los workers de gunicorn, envían --readings lecturas cada uno
+a POST /admin/api/sensor-data con el cliente de pruebas, repartidas al azar
+entre los pacientes. Con --reader otro proceso repite mientras tanto el
+agregado diario de un paciente (como los reportes): en una sola BD su bloqueo
+de lectura retrasa las confirmaciones de todos los pacientes.
+
+    lecturas/s   lecturas aceptadas / tiempo total
+    p50 / p95    latencia de cada envío
+    errores      respuestas distintas de 200 (p. ej. "database is locked")
+
+Uso:
+    python benchmarks/bench_ingest_shards.py --shards 0,4 --processes 4 --readings 500
+    python benchmarks/bench_ingest_shards.py --shards 0,2,8 --patients 64 --reader
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _create_app(instance, shards):
+    # INSTANCE_PATH se lee al importar la fábrica: cada proceso lo fija antes
+    os.environ['INSTANCE_PATH'] = instance
+    sys.path.insert(0, ROOT)
+    from shared.app_factory import create_app
+    with contextlib.redirect_stdout(io.StringIO()):
+        return create_app('admin', {'SENSOR_SHARDS': shards, 'SCHEDULER_ENABLED': False,
+                                    'METRICS_ENABLED': False})
+
+
+def _setup(instance, shards, patients, history):
+    from datetime import datetime
+
+    app = _create_app(instance, shards)
+    from shared.commands import initialize_database
+    from shared.models import db, User
+    from shared.synthetic import create_patients, seed_readings
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        initialize_database(app)
+    with app.app_context():
+        ids = create_patients(patients, seed=1)
+        users = User.query.filter(User.id.in_(ids)).order_by(User.id).all()
+        stamp = datetime.utcnow().strftime('%H%M%S')
+        for i, user in enumerate(users):
+            user.device_code = f'BENCH-{stamp}-{i:05d}'
+        db.session.commit()
+        if history:
+            seed_readings(users, days=history, interval=30, seed=2)
+        return [(user.id, user.device_code) for user in users]
+
+
+def _ingest(instance, shards, codes, readings, start, seed):
+    app = _create_app(instance, shards)
+    client = app.test_client()
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+    start.wait()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(readings):
+            started = time.perf_counter()
+            response = client.post('/admin/api/sensor-data',
+                                   json={'device_code': rng.choice(codes), 'bpm': rng.randint(55, 110)})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+    return latencies, errors
+
+
+def _read(instance, shards, user_id, start, stop):
+    app = _create_app(instance, shards)
+    from sqlalchemy import func, select
+    from shared.models import SensorData
+    from shared.shards import readings_session
+
+    day = func.date(SensorData.timestamp)
+    statement = select(day, func.count(SensorData.id), func.avg(SensorData.bpm))\
+        .where(SensorData.user_id == user_id).group_by(day)
+    queries = 0
+    start.wait()
+    with app.app_context():
+        while not stop.is_set():
+            readings_session(user_id).execute(statement).all()
+            readings_session(user_id).rollback()  # Suelta el bloqueo de lectura entre consultas
+            queries += 1
+    return queries
+
+
+def run(shards, options, context):
+    with tempfile.TemporaryDirectory(prefix='bench_shards_') as instance:
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            patients = pool.submit(_setup, instance, shards, options.patients, options.history).result()
+        codes = [code for _, code in patients]
+
+        manager = context.Manager()
+        start, stop = manager.Event(), manager.Event()
+        workers = options.processes + (1 if options.reader else 0)
+        with ProcessPoolExecutor(workers, mp_context=context) as pool:
+            ingests = [pool.submit(_ingest, instance, shards, codes, options.readings, start, seed)
+                       for seed in range(options.processes)]
+            reader = pool.submit(_read, instance, shards, patients[0][0], start, stop) if options.reader else None
+            time.sleep(options.warmup)  # Que todos los procesos terminen de importar
+            started = time.perf_counter()
+            start.set()
+            results = [future.result() for future in ingests]
+            elapsed = time.perf_counter() - started
+            stop.set()
+            queries = reader.result() if reader else None
+        manager.shutdown()
+
+    latencies = sorted(latency for latencies, _ in results for latency in latencies)
+    errors = sum(errors for _, errors in results)
+    accepted = len(latencies) - errors
+    return {
+        'shards': shards,
+        'throughput': accepted / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'errors': errors,
+        'queries': queries,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingesta concurrente con y sin shards de sensor_data')
+    parser.add_argument('--shards', default='0,4', help='Números de shards a comparar (0 = una sola BD)')
+    parser.add_argument('--processes', type=int, default=4, help='Procesos enviando lecturas')
+    parser.add_argument('--readings', type=int, default=500, help='Lecturas por proceso')
+    parser.add_argument('--patients', type=int, default=32)
+    parser.add_argument('--history', type=float, default=1, help='Días de lecturas previas por paciente')
+    parser.add_argument('--reader', action='store_true', help='Añadir un proceso con consultas largas')
+    parser.add_argument('--warmup', type=float, default=3, help='Segundos para que arranquen los procesos')
+    options = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    print(f"{'shards':>6} {'lecturas/s':>11} {'p50 ms':>8} {'p95 ms':>8} {'errores':>8} {'consultas':>10}")
+    for shards in [int(value) for value in options.shards.split(',')]:
+        result = run(shards, options, context)
+        queries = '-' if result['queries'] is None else result['queries']
+        print(f"{result['shards']:>6} {result['throughput']:>11.0f} {result['p50']:>8.1f} "
+              f"{result['p95']:>8.1f} {result['errors']:>8} {queries:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_intent_matcher.py
+"""
+Micro-benchmark y comparación de corpus del IntentMatcher de CardioBot.
+
+Compara el enrutamiento del IntentMatcher con la cadena original de
+``any(word in message ...)``. El matcher debe coincidir con la
+cadena original aplicada a texto sin acentos; las diferencias con la
+original sin normalizar (mensajes escritos sin tilde) se listan aparte.
+
+Uso:
+    python benchmarks/bench_intent_matcher.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.chatbot_config import INTENTS, fold_text, intent_matcher
+
+CORPUS = [
+    '¿Cómo estoy?',
+    'como estoy hoy',
+    'Quiero ver mi estado',
+    'hazme un análisis',
+    'analisis de mi salud por favor',
+    'Tengo una alerta en el monitor',
+    'es una emergencia',
+    '¿hay peligro?',
+    'dame un consejo',
+    '¿Qué hacer si me late rápido?',
+    'que hacer',
+    'alguna recomendación para dormir',
+    'recomendacion',
+    'mi ritmo está alto',
+    '¿cuántos bpm tengo?',
+    'siento los latidos fuertes',
+    'ritmo cardíaco en reposo',
+    'ritmo cardiaco',
+    '¿puedo tomar esta medicina?',
+    'cambiar de medicamento',
+    'olvidé la pastilla',
+    'tengo dolor en el pecho',
+    'me da mareo al levantarme',
+    'síntoma raro',
+    'sintomas',
+    'Hola',
+    'gracias CardioBot',
+    'tengo dolor y además una alerta',
+    'consejo sobre mi salud',
+]
+
+
+def legacy_intent(message):
+    """Réplica del enrutamiento original (subcadenas sobre el texto en minúsculas)."""
+    lowered = message.lower()
+    for intent, keywords in INTENTS:
+        if any(word in lowered for word in keywords):
+            return intent
+    return None
+
+
+def folded_legacy_intent(message):
+    """Cadena original, pero con mensaje y palabras clave sin acentos."""
+    folded = fold_text(message)
+    for intent, keywords in INTENTS:
+        if any(fold_text(word) in folded for word in keywords):
+            return intent
+    return None
+
+
+def compiled_intent(message):
+    return intent_matcher.match(fold_text(message))[0]
+
+
+def compare_corpus():
+    mismatches = []
+    accent_fixes = []
+    for message in CORPUS:
+        new = compiled_intent(message)
+        if new != folded_legacy_intent(message):
+            mismatches.append((message, folded_legacy_intent(message), new))
+        elif new != legacy_intent(message):
+            accent_fixes.append((message, legacy_intent(message), new))
+    return mismatches, accent_fixes
+
+
+def main():
+    mismatches, accent_fixes = compare_corpus()
+    for message, old, new in accent_fixes:
+        print(f"✅ {message!r}: original={old} compilado={new} (sin acentos)")
+    for message, old, new in mismatches:
+        print(f"❌ {message!r}: esperado={old} compilado={new}")
+    print(f"Corpus: {len(CORPUS)} mensajes, {len(accent_fixes)} corregidos por acentos, "
+          f"{len(mismatches)} discrepancias")
+
+    number = 2000
+    per_message = 1e6 / (number * len(CORPUS))
+    timings = [
+        ('Original (sin normalizar acentos)', legacy_intent),
+        ('Original + normalización de acentos', folded_legacy_intent),
+        ('IntentMatcher', compiled_intent),
+    ]
+    for label, matcher in timings:
+        elapsed = timeit.timeit(lambda: [matcher(m) for m in CORPUS], number=number)
+        print(f"{label}: {elapsed * per_message:.2f} µs/mensaje")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+# benchmarks/bench_routes.py
+"""
+Latencia, consultas SQL y pico de memoria de las rutas de usuario y admin
+sobre un volumen de datos grande, con comparación contra una línea base.
+
+Construye (una vez) una BD sintética de N pacientes con M lecturas repartidas
+en los últimos días, y mide cada ruta en proceso con el cliente de pruebas del
+modo combinado. La caché de fragmentos se vacía antes de cada petición para
+medir el trabajo real de la ruta, no el acierto de caché (--warm la conserva).
+
+    latencia   mediana y p95 de --repeat peticiones (tras --warmup)
+    consultas  sentencias SQL de la última petición (shared/sql_profiler.py)
+    memoria    pico de tracemalloc durante una petición adicional
+
+Con --save se escribe la línea base; sin él se compara con ella y el script
+termina con código 1 si alguna ruta empeora más de --threshold (latencia y
+memoria, con un margen absoluto para rutas de pocos ms) o hace más consultas.
+La línea base depende de la máquina: se genera y compara en la misma.
+
+Uso:
+    python benchmarks/bench_routes.py --patients 1000 --readings 1000000 --save
+    python benchmarks/bench_routes.py --patients 1000 --readings 1000000
+    python benchmarks/bench_routes.py --patients 50 --readings 50000 --routes dashboard,ingest
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline_routes.json')
+BENCH_DEVICE = 'HR-SENSOR-A1B2-C3D4'
+BENCH_PASSWORD = 'bench123'
+
+# Margen absoluto: por debajo de esto la diferencia se considera ruido
+LATENCY_SLACK_MS = 2.0
+MEMORY_SLACK_KB = 256
+
+# nombre -> (cliente, método, ruta); {patient} es el id del paciente de prueba
+ROUTES = {
+    'dashboard': ('user', 'GET', '/user/dashboard'),
+    'health_report': ('user', 'GET', '/user/health-report'),
+    'api_real_time_data': ('user', 'GET', '/user/api/real-time-data'),
+    'api_weekly_report': ('user', 'GET', '/user/api/weekly-report'),
+    'admin_dashboard': ('admin', 'GET', '/admin/dashboard'),
+    'admin_user_reports': ('admin', 'GET', '/admin/user-reports'),
+    'admin_user_detailed_report': ('admin', 'GET', '/admin/user-report/{patient}'),
+    'ingest': ('device', 'POST', '/admin/api/sensor-data'),
+}
+
+
+# ==================== DATOS SINTÉTICOS ====================
+
+def seed_database(app, patients, readings, days, seed=42):
+    """
+    Crea ``patients`` pacientes (el primero con la pulsera de prueba) y
+    ``readings`` lecturas repartidas entre ellos en los últimos ``days`` días.
+
+    Returns:
+        int: id del paciente de prueba
+    """
+    from werkzeug.security import generate_password_hash
+    from shared.devices import claim_device
+    from shared.models import db, User, SensorData
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    # Un único hash para todos: el coste de seeding no debe ser el de pbkdf2
+    password_hash = generate_password_hash(BENCH_PASSWORD, method=app.config['PASSWORD_HASH_USER'])
+
+    with app.app_context():
+        rows = []
+        for i in range(patients):
+            rows.append(dict(username=f'bench{i:05d}', email=f'bench{i:05d}@example.com',
+                             password_hash=password_hash, role='user',
+                             device_code=BENCH_DEVICE if i == 0 else None,
+                             is_active=True, is_deleted=False, created_at=now - timedelta(days=days),
+                             age=rng.randint(18, 85), weight=rng.randint(50, 110), height=rng.randint(150, 195),
+                             heart_condition='ninguna', max_safe_bpm=120, min_safe_bpm=60))
+        db.session.execute(User.__table__.insert(), rows)
+        claim_device(BENCH_DEVICE)
+        db.session.commit()
+        user_ids = [uid for (uid,) in db.session.query(User.id).filter(User.role == 'user').order_by(User.id)]
+
+        per_patient = max(1, readings // patients)
+        step = days * 86400 / per_patient
+        batch = []
+        inserted = 0
+        for user_id in user_ids:
+            for i in range(per_patient):
+                bpm = min(190, max(40, int(rng.gauss(78, 14))))
+                batch.append(dict(user_id=user_id, bpm=bpm, is_alert=bpm > 120 or bpm < 60,
+                                  timestamp=now - timedelta(seconds=step * i)))
+            if len(batch) >= 50000:
+                db.session.execute(SensorData.__table__.insert(), batch)
+                db.session.commit()
+                inserted += len(batch)
+                batch = []
+                print(f"  … {inserted:,} lecturas", end='\r', flush=True)
+        if batch:
+            db.session.execute(SensorData.__table__.insert(), batch)
+            db.session.commit()
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        return user_ids[0]
+
+
+# ==================== MEDICIÓN ====================
+
+def _clear_caches():
+    from shared.fragments import get_fragment_cache
+    cache = get_fragment_cache()
+    if cache is not None:
+        cache.cache.clear()
+
+
+def _request(clients, name, patient_id):
+    kind, method, path = ROUTES[name]
+    client = clients[kind]
+    if kind == 'device':
+        response = client.post(path, json={'device_code': BENCH_DEVICE, 'bpm': random.randint(60, 100)})
+    else:
+        response = client.open(path.format(patient=patient_id), method=method)
+    if response.status_code >= 400 or response.status_code in (301, 302):
+        raise RuntimeError(f'{name}: {method} {path} respondió {response.status_code}')
+    return response
+
+
+def measure(clients, name, patient_id, repeat, warmup, warm):
+    from shared.sql_profiler import record_queries
+
+    for _ in range(warmup):
+        _request(clients, name, patient_id)
+
+    samples = []
+    queries = 0
+    for _ in range(repeat):
+        if not warm:
+            _clear_caches()
+        with record_queries() as recorder:
+            started = time.perf_counter()
+            _request(clients, name, patient_id)
+            samples.append((time.perf_counter() - started) * 1000)
+        queries = len(recorder)
+
+    if not warm:
+        _clear_caches()
+    tracemalloc.start()
+    _request(clients, name, patient_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 2),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+        'queries': queries,
+        'peak_kb': round(peak / 1024),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Returns: list de regresiones (texto)."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current['p50_ms'] > before['p50_ms'] * (1 + threshold) + LATENCY_SLACK_MS:
+            regressions.append(f"{name}: latencia {before['p50_ms']} → {current['p50_ms']} ms")
+        if current['queries'] > before['queries']:
+            regressions.append(f"{name}: consultas {before['queries']} → {current['queries']}")
+        if current['peak_kb'] > before['peak_kb'] * (1 + threshold) + MEMORY_SLACK_KB:
+            regressions.append(f"{name}: memoria {before['peak_kb']} → {current['peak_kb']} KB")
+    return regressions
+
+
+def _login(app, path, username, password):
+    client = app.test_client()
+    response = client.post(path, data={'username': username, 'password': password})
+    if response.status_code != 302:
+        raise RuntimeError(f'No se pudo iniciar sesión en {path} como {username}')
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patients', type=int, default=1000)
+    parser.add_argument('--readings', type=int, default=1000000, help='Lecturas en total')
+    parser.add_argument('--days', type=int, default=30, help='Días que cubren las lecturas')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--routes', help='Subconjunto separado por comas (por defecto todas)')
+    parser.add_argument('--warm', action='store_true', help='No vaciar la caché de fragmentos')
+    parser.add_argument('--instance', help='Directorio de la BD; se reutiliza si ya tiene el mismo volumen')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save', action='store_true', help='Escribir la línea base en lugar de comparar')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Empeoramiento tolerado (0.25 = 25%%)')
+    options = parser.parse_args()
+
+    names = options.routes.split(',') if options.routes else list(ROUTES)
+    unknown = [name for name in names if name not in ROUTES]
+    if unknown:
+        parser.error(f"rutas desconocidas: {', '.join(unknown)}")
+
+    instance_path = options.instance or tempfile.mkdtemp(prefix='bench-routes-')
+    os.makedirs(instance_path, exist_ok=True)
+    os.environ['INSTANCE_PATH'] = instance_path
+    # Hash barato: se mide la ruta, no el login
+    os.environ['PASSWORD_HASH_USER'] = os.environ['PASSWORD_HASH_ADMIN'] = 'pbkdf2:sha256:1000'
+    os.environ.setdefault('METRICS_ENABLED', '0')
+
+    from shared.app_factory import create_app
+    from shared.commands import initialize_database
+    from shared.models import db, User
+
+    app = create_app('combined', {'WTF_CSRF_ENABLED': False})
+    dataset = {'patients': options.patients, 'readings': options.readings, 'days': options.days}
+    meta_path = os.path.join(instance_path, 'bench_dataset.json')
+    existing = None
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            existing = json.load(f)
+
+    if existing and existing['dataset'] == dataset:
+        initialize_database(app)
+        patient_id = existing['patient_id']
+        print(f"📦 BD existente en {instance_path}")
+    else:
+        print(f"📦 Generando {options.patients:,} pacientes × {options.readings:,} lecturas en {instance_path}")
+        started = time.perf_counter()
+        initialize_database(app, reset=True)
+        patient_id = seed_database(app, options.patients, options.readings, options.days)
+        with open(meta_path, 'w') as f:
+            json.dump({'dataset': dataset, 'patient_id': patient_id}, f)
+        print(f"📦 BD lista en {time.perf_counter() - started:.1f} s")
+
+    with app.app_context():
+        patient = db.session.get(User, patient_id)
+        username = patient.username
+    clients = {
+        'user': _login(app, '/user/login', username, BENCH_PASSWORD),
+        'admin': _login(app, '/admin/login', 'admin', 'admin123'),
+        'device': app.test_client(),
+    }
+
+    results = {}
+    print(f"\n{'ruta':<28}{'p50 ms':>10}{'p95 ms':>10}{'consultas':>11}{'pico KB':>10}")
+    for name in names:
+        # Los print de las rutas (ingesta, episodios) ensuciarían la tabla
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = results[name] = measure(clients, name, patient_id, options.repeat, options.warmup, options.warm)
+        print(f"{name:<28}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+              f"{result['queries']:>11}{result['peak_kb']:>10}")
+
+    report = {
+        'dataset': dataset,
+        'warm': options.warm,
+        'machine': {'python': platform.python_version(), 'platform': platform.platform()},
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'routes': results,
+    }
+
+    if options.save:
+        # Se conservan las rutas de la línea base que no se midieron esta vez
+        if os.path.exists(options.baseline):
+            with open(options.baseline) as f:
+                previous = json.load(f)
+            if previous.get('dataset') == dataset and previous.get('warm') == options.warm:
+                report['routes'] = {**previous['routes'], **results}
+        with open(options.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\n💾 Línea base guardada en {options.baseline}")
+        return 0
+
+    if not os.path.exists(options.baseline):
+        print(f"\nℹ️ Sin línea base ({options.baseline}); use --save para crearla")
+        return 0
+    with open(options.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('dataset') != dataset or baseline.get('warm') != options.warm:
+        print(f"\n❌ La línea base es de otro volumen o modo: {baseline.get('dataset')} (warm={baseline.get('warm')})")
+        return 2
+
+    regressions = compare(results, baseline['routes'], options.threshold)
+    if regressions:
+        print(f"\n❌ Regresiones (umbral {options.threshold:.0%}):")
+        for regression in regressions:
+            print(f"   {regression}")
+        return 1
+    print(f"\n✅ Sin regresiones frente a {options.baseline} (umbral {options.threshold:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# benchmarks/bench_serving.py
+"""
+Peticiones/s de la ingesta y del dashboard con el servidor de desarrollo
+(app.run(debug=True), como hasta ahora) frente a gunicorn (gunicorn.conf.py).
+
+Levanta cada servidor en modo combinado sobre una BD temporal con un paciente
+y su pulsera, y lanza N clientes concurrentes con conexiones keep-alive:
+    ingesta    POST /admin/api/sensor-data
+    dashboard  GET  /user/dashboard (sesión iniciada)
+
+Uso:
+    python benchmarks/bench_serving.py --duration 10 --concurrency 16
+    python benchmarks/bench_serving.py --servers gunicorn --workers 4 --threads 4
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEVICE_CODE = 'HR-SENSOR-A1B2-C3D4'
+
+_SEED = """
+from datetime import datetime, timedelta
+from shared.app_factory import create_app
+from shared.commands import initialize_database
+from shared.devices import claim_device
+from shared.models import db, User, SensorData
+app = create_app('combined')
+initialize_database(app)
+with app.app_context():
+    user = User(username='bench', email='bench@example.com', role='user', device_code=%r,
+                age=40, weight=70, height=175, heart_condition='ninguna')
+    user.calculate_safe_limits()
+    user.set_password('bench123')
+    db.session.add(user)
+    claim_device(%r)
+    db.session.commit()
+    now = datetime.utcnow()
+    db.session.execute(SensorData.__table__.insert(), [
+        dict(user_id=user.id, bpm=60 + i %% 40, is_alert=False, timestamp=now - timedelta(seconds=3 * i))
+        for i in range(2000)
+    ])
+    db.session.commit()
+""" % (DEVICE_CODE, DEVICE_CODE)
+
+_DEV_SERVER = """
+import sys
+from shared.app_factory import create_app
+create_app('combined').run(debug=True, use_reloader=False, host='127.0.0.1', port=int(sys.argv[1]))
+"""
+
+
+def start_server(kind, port, env, options):
+    if kind == 'dev':
+        command = [sys.executable, '-c', _DEV_SERVER, str(port)]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+        env = dict(env, PORT=str(port), WEB_WORKERS=str(options.workers), WEB_THREADS=str(options.threads))
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/user/login')
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'El servidor {kind} no arrancó')
+
+
+def login(port):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('GET', '/user/login')
+    response = connection.getresponse()
+    body = response.read().decode()
+    cookie = response.getheader('Set-Cookie', '').split(';')[0]
+    token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', body).group(1)
+    form = f'csrf_token={token}&username=bench&password=bench123'
+    connection.request('POST', '/user/login', body=form, headers={
+        'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': cookie})
+    response = connection.getresponse()
+    response.read()
+    return response.getheader('Set-Cookie', '').split(';')[0] or cookie
+
+
+def run_load(port, scenario, duration, concurrency, cookie):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(index):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        count = 0
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                if scenario == 'ingesta':
+                    payload = json.dumps({'device_code': DEVICE_CODE, 'bpm': 70 + (index + count) % 20})
+                    connection.request('POST', '/admin/api/sensor-data', body=payload,
+                                       headers={'Content-Type': 'application/json'})
+                else:
+                    connection.request('GET', '/user/dashboard', headers={'Cookie': cookie})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise http.client.HTTPException(response.status)
+                local.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            count += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        'errors': errors[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dev server vs gunicorn')
+    parser.add_argument('--servers', nargs='+', default=['dev', 'gunicorn'], choices=['dev', 'gunicorn'])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--port', type=int, default=5099)
+    options = parser.parse_args()
+
+    print(f"CPU: {os.cpu_count()}  clientes: {options.concurrency}  duración: {options.duration}s")
+    for kind in options.servers:
+        with tempfile.TemporaryDirectory() as instance_path:
+            env = dict(os.environ, INSTANCE_PATH=instance_path, APP_ROLE='combined',
+                       PASSWORD_HASH_USER='pbkdf2:sha256:1000')
+            subprocess.run([sys.executable, '-c', _SEED], cwd=ROOT, env=env, check=True,
+                           stdout=subprocess.DEVNULL)
+            if kind == 'gunicorn':
+                # La BD ya está sembrada: el maestro no necesita migrarla
+                env['APP_ROLE'] = 'combined'
+                env['SKIP_DB_INIT'] = '1'
+            process = start_server(kind, options.port, env, options)
+            try:
+                cookie = login(options.port)
+                label = 'dev' if kind == 'dev' else f'gunicorn {options.workers}x{options.threads}'
+                for scenario in ('ingesta', 'dashboard'):
+                    result = run_load(options.port, scenario, options.duration, options.concurrency, cookie)
+                    print(f"{label:<16} {scenario:<10} {result['rps']:8.1f} req/s  "
+                          f"p50 {result['p50_ms']:6.1f} ms  p95 {result['p95_ms']:6.1f} ms  "
+                          f"errores {result['errors']}")
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait(30)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# benchmarks/bench_startup.py
+"""
+Tiempo de arranque y memoria residente de cada modo de la fábrica.
+
+Cada medición corre en un intérprete nuevo: importa ``shared.app_factory``,
+crea la aplicación y reporta el tiempo transcurrido, el pico de RSS, los
+módulos cargados y si se importaron dependencias pesadas opcionales.
+Se usa un directorio de instancia temporal para no tocar la BD real.
+
+Uso:
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['requests', 'smtplib', 'shared.chatbot_config', 'shared.notifications', 'admin.admin_routes']
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+from shared.app_factory import create_app
+create_app(sys.argv[1])
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'elapsed_ms': elapsed * 1000,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'modules': len(sys.modules),
+    'heavy': [name for name in %r if name in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(role, instance_path):
+    env = dict(os.environ, INSTANCE_PATH=instance_path, PYTHONDONTWRITEBYTECODE='1')
+    output = subprocess.run([sys.executable, '-c', _PROBE, role], cwd=ROOT, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arranque y RSS por modo')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--roles', nargs='+', default=['admin', 'user', 'combined'])
+    options = parser.parse_args()
+
+    # Interpreter vacío como referencia
+    baseline = subprocess.run(
+        [sys.executable, '-c', 'import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024)'],
+        check=True, capture_output=True, text=True).stdout
+    print(f"Intérprete vacío: {float(baseline):.1f} MB RSS")
+
+    with tempfile.TemporaryDirectory() as instance_path:
+        for role in options.roles:
+            samples = [measure(role, instance_path) for _ in range(options.runs)]
+            elapsed = statistics.median(s['elapsed_ms'] for s in samples)
+            rss = statistics.median(s['rss_mb'] for s in samples)
+            last = samples[-1]
+            print(f"{role:<9} arranque {elapsed:7.1f} ms  RSS {rss:6.1f} MB  "
+                  f"módulos {last['modules']:4d}  pesados: {', '.join(last['heavy']) or '-'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
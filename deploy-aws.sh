@@ -31,6 +31,10 @@ echo "✅ DuckDNS actualizado: $DOMAIN → $IP"
 # Configurar cron para DuckDNS
 (crontab -l 2>/dev/null; echo "*/5 * * * * /home/ubuntu/update-duckdns.sh >> /home/ubuntu/duckdns.log 2>&1") | crontab -
 
+# Estáticos con hash para nginx (montados desde ./static)
+echo "📦 Generando estáticos..."
+python3 scripts/build_assets.py --prune
+
 # Construir y levantar contenedores
 echo "🐳 Construyendo contenedores..."
 docker-compose down
@@ -0,0 +1,67 @@
+# gunicorn.conf.py - Servidor de producción (sustituye a app.run(debug=True))
+#
+#   APP_ROLE=admin gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Variables de entorno:
+#   APP_ROLE               admin | user | combined
+#   PORT                   puerto (5000 admin/combined, 5001 user)
+#   WEB_WORKERS            procesos worker
+#   WEB_THREADS            hilos por worker
+#   WEB_TIMEOUT            segundos máximos por petición antes de reciclar el worker
+#   WEB_GRACEFUL_TIMEOUT   segundos para terminar las peticiones en curso tras SIGTERM
+#   SKIP_DB_INIT=1         no aplicar migraciones ni sembrar datos al arrancar
+import multiprocessing
+import os
+
+role = os.environ.get('APP_ROLE', 'admin')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001 if role == 'user' else 5000)}"
+
+# El motor de alertas guarda el estado de cada regla (duración sostenida,
+# histéresis) en memoria: la ingesta debe pasar siempre por el mismo proceso.
+# Por eso admin/combinado usan un worker con varios hilos y el portal de
+# usuario escala en procesos; on_starting se niega a arrancar admin/combinado
+# con más de un worker (también si llega por -w en la línea de comandos).
+_default_workers = 1 if role in ('admin', 'combined') else multiprocessing.cpu_count() * 2 + 1
+workers = int(os.environ.get('WEB_WORKERS', _default_workers))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 8))
+
+# Carga la app una vez en el maestro: arranque rápido y memoria compartida (copy-on-write)
+preload_app = True
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 20))
+keepalive = 5
+
+# Acotar el tamaño de las peticiones (la ingesta envía JSON pequeños)
+limit_request_line = 4094
+limit_request_fields = 50
+
+accesslog = os.environ.get('WEB_ACCESS_LOG') or None
+errorlog = '-'
+
+
+def on_starting(server):
+    """Maestro, una sola vez: migrar el esquema antes de crear los workers."""
+    if role in ('admin', 'combined') and server.cfg.workers > 1:
+        server.log.error(f"APP_ROLE={role} con {server.cfg.workers} workers: el estado del motor de "
+                         f"alertas quedaría repartido entre procesos. Usa WEB_WORKERS=1 y WEB_THREADS "
+                         f"para escalar la ingesta.")
+        raise SystemExit(1)
+    if role in ('admin', 'combined') and os.environ.get('SKIP_DB_INIT') != '1':
+        from wsgi import app
+        from shared.commands import initialize_database
+        initialize_database(app)
+
+
+def post_fork(server, worker):
+    from wsgi import app
+    from shared.lifecycle import init_worker
+    init_worker(app)
+
+
+def worker_exit(server, worker):
+    from wsgi import app
+    from shared.lifecycle import shutdown_worker
+    shutdown_worker(app)
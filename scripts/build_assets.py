@@ -0,0 +1,145 @@
+# scripts/build_assets.py
+"""
+Genera los estáticos de producción: nombre con el hash del contenido y
+variantes precomprimidas, para que nginx los sirva desde disco con caché
+inmutable sin pasar por los workers de Python.
+
+    static/css/style.css  ->  static/dist/css/style.<hash>.css
+                              static/dist/css/style.<hash>.css.gz
+                              static/dist/css/style.<hash>.css.br   (con brotli instalado)
+
+El manifiesto static/dist/manifest.json relaciona cada ruta original con la
+versionada; la app lo carga al arrancar (shared/assets.py) y
+``url_for('static', filename=...)`` emite la URL con hash.
+
+Los archivos de versiones anteriores se conservan (páginas ya servidas pueden
+seguir pidiéndolos durante un despliegue); ``--prune`` los elimina.
+
+Uso:
+    python scripts/build_assets.py
+    python scripts/build_assets.py --prune
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli solo se generan las variantes .gz
+    brotli = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(ROOT, 'static')
+DIST_NAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+HASH_LENGTH = 12
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.map', '.txt', '.html'}
+
+
+def iter_sources(static_dir):
+    """Rutas relativas (con '/') de los estáticos originales, sin dist/."""
+    for directory, subdirs, files in os.walk(static_dir):
+        relative_dir = os.path.relpath(directory, static_dir)
+        if relative_dir == '.':
+            subdirs[:] = [name for name in subdirs if name != DIST_NAME]
+        subdirs[:] = sorted(name for name in subdirs if not name.startswith('.'))
+        for name in sorted(files):
+            if not name.startswith('.'):
+                yield os.path.normpath(os.path.join(relative_dir, name)).replace(os.sep, '/')
+
+
+def hashed_name(relative_path, data):
+    stem, extension = os.path.splitext(relative_path)
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return f'{stem}.{digest}{extension}'
+
+
+def _write(path, data):
+    # El contenido depende solo del hash: si ya existe no hace falta reescribirlo
+    if os.path.exists(path):
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+    return True
+
+
+def build(static_dir=STATIC_DIR):
+    """
+    Returns:
+        dict: manifest (original -> dist/versionado), written, bytes, compressed
+    """
+    dist_dir = os.path.join(static_dir, DIST_NAME)
+    manifest = {}
+    stats = {'written': 0, 'bytes': 0, 'gzip_bytes': 0, 'brotli_bytes': 0}
+
+    for relative_path in iter_sources(static_dir):
+        with open(os.path.join(static_dir, relative_path), 'rb') as f:
+            data = f.read()
+        target = hashed_name(relative_path, data)
+        manifest[relative_path] = f'{DIST_NAME}/{target}'
+        target_path = os.path.join(dist_dir, target)
+        stats['written'] += _write(target_path, data)
+        stats['bytes'] += len(data)
+
+        if os.path.splitext(relative_path)[1] not in COMPRESSIBLE:
+            continue
+        # mtime=0: mismo contenido, mismo .gz (builds reproducibles)
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) < len(data):
+            _write(target_path + '.gz', compressed)
+            stats['gzip_bytes'] += len(compressed)
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+            if len(compressed) < len(data):
+                _write(target_path + '.br', compressed)
+                stats['brotli_bytes'] += len(compressed)
+
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest_path = os.path.join(dist_dir, MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    return dict(stats, manifest=manifest)
+
+
+def prune(manifest, static_dir=STATIC_DIR):
+    """Elimina de dist/ los archivos que no pertenecen al manifiesto actual."""
+    dist_dir = os.path.join(static_dir, DIST_NAME)
+    keep = {MANIFEST_NAME}
+    for target in manifest.values():
+        relative = target[len(DIST_NAME) + 1:]
+        keep.update({relative, relative + '.gz', relative + '.br'})
+    removed = 0
+    for directory, _, files in os.walk(dist_dir):
+        for name in files:
+            path = os.path.join(directory, name)
+            if os.path.relpath(path, dist_dir).replace(os.sep, '/') not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Estáticos con hash y precomprimidos')
+    parser.add_argument('--static-dir', default=STATIC_DIR)
+    parser.add_argument('--prune', action='store_true', help='Eliminar versiones anteriores de dist/')
+    options = parser.parse_args()
+
+    result = build(options.static_dir)
+    print(f"📦 {len(result['manifest'])} estáticos ({result['written']} nuevos): "
+          f"{result['bytes']} B, gzip {result['gzip_bytes']} B"
+          + (f", brotli {result['brotli_bytes']} B" if brotli is not None else " (brotli no instalado)"))
+    if options.prune:
+        print(f"🗑️  Archivos antiguos eliminados: {prune(result['manifest'], options.static_dir)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# scripts/llm_stub_server.py
+"""
+Servidor de modelo simulado para probar el backend remoto de CardioBot
+sin depender de un proveedor externo.
+
+Responde en formato text-generation-inference (SSE con ``stream: true``,
+JSON con ``generated_text`` sin él) repitiendo una respuesta fija palabra
+por palabra.
+
+Uso:
+    python scripts/llm_stub_server.py --port 8088 --token-delay 0.05
+    CARDIOBOT_LLM_URL=http://localhost:8088/generate python -m user.app_user
+
+Opciones útiles para probar los caminos de error:
+    --first-token-delay 30   fuerza el timeout de lectura
+    --fail-rate 0.5          responde 503 en la mitad de las peticiones
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = ("💙 Según tus datos recientes tu ritmo cardíaco se mantiene estable. "
+          "Sigue monitoreando y consulta con tu cardiólogo ante cualquier síntoma.")
+
+
+def make_handler(options):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, fmt, *args):
+            if options.verbose:
+                super().log_message(fmt, *args)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+
+            if random.random() < options.fail_rate:
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            time.sleep(options.first_token_delay)
+            words = ANSWER.split(' ')
+
+            if not payload.get('stream'):
+                body = json.dumps([{'generated_text': ANSWER}]).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for index, word in enumerate(words):
+                text = word if index == 0 else ' ' + word
+                self._chunk(f"data: {json.dumps({'token': {'text': text, 'special': False}})}\n\n")
+                time.sleep(options.token_delay)
+            self._chunk('')
+
+        def _chunk(self, text):
+            data = text.encode()
+            self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+            self.wfile.flush()
+
+    return StubHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor de modelo simulado para CardioBot')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8088)
+    parser.add_argument('--token-delay', type=float, default=0.05)
+    parser.add_argument('--first-token-delay', type=float, default=0.2)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--verbose', action='store_true')
+    options = parser.parse_args()
+
+    server = ThreadingHTTPServer((options.host, options.port), make_handler(options))
+    print(f"🤖 Modelo simulado escuchando en http://{options.host}:{options.port}/generate")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
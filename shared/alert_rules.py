@@ -0,0 +1,316 @@
+# shared/alert_rules.py
+"""
+Motor de reglas de alerta evaluado de forma incremental en la ingesta.
+
+Cada regla mantiene un estado O(1) por dispositivo/usuario y agrupa las
+lecturas anómalas en episodios (tabla ``alert_episodes``): un episodio de
+taquicardia de 10 minutos es una sola fila, y una lectura ruidosa aislada
+no abre ninguno.
+
+Si el dispositivo calla más de ``max_gap`` segundos (del motor) las lecturas
+no se consideran continuas: se descarta lo pendiente y el episodio abierto se
+cierra en su última lectura. Los episodios de dispositivos que no vuelven a
+enviar los cierra el trabajo ``close-stale-episodes`` (shared/jobs.py).
+"""
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from shared.models import db, AlertEpisode
+
+AlertEvent = namedtuple('AlertEvent', ['type', 'rule', 'episode'])  # type: 'opened' | 'closed'
+
+
+class _RuleState:
+    """Estado por usuario de una regla (tamaño constante)."""
+    __slots__ = ('pending_since', 'clear_since', 'episode_id', 'extreme',
+                 'samples', 'last_bpm', 'last_timestamp')
+
+    def __init__(self):
+        self.pending_since = None
+        self.clear_since = None
+        self.episode_id = None
+        self.extreme = None
+        self.samples = 0
+        self.last_bpm = None
+        self.last_timestamp = None
+
+
+class AlertRule:
+    """
+    Regla base. Las subclases implementan ``is_triggered`` y ``is_cleared``.
+
+    Args:
+        name (str): Identificador de la regla (se guarda en el episodio)
+        kind (str): Tipo de episodio ('high', 'low', 'rate')
+        min_duration (int): Segundos que la condición debe mantenerse para abrir episodio
+        clear_duration (int): Segundos en zona normal para cerrar el episodio
+    """
+
+    def __init__(self, name, kind, min_duration=0, clear_duration=30):
+        self.name = name
+        self.kind = kind
+        self.min_duration = timedelta(seconds=min_duration)
+        self.clear_duration = timedelta(seconds=clear_duration)
+
+    def accepts(self, timestamp, state):
+        """False si la lectura debe ignorarse sin tocar el estado de la regla."""
+        return True
+
+    def is_triggered(self, user, bpm, timestamp, state):
+        raise NotImplementedError
+
+    def is_cleared(self, user, bpm, timestamp, state):
+        raise NotImplementedError
+
+    def more_extreme(self, a, b):
+        return max(a, b)
+
+
+class SustainedThresholdRule(AlertRule):
+    """
+    Umbral sostenido con histéresis sobre los límites seguros del usuario.
+
+    El episodio se abre cuando el BPM supera el límite durante ``min_duration``
+    y se cierra cuando vuelve a estar al menos ``hysteresis`` BPM dentro del
+    límite durante ``clear_duration``.
+    """
+
+    def __init__(self, name, direction, min_duration=60, clear_duration=30, hysteresis=5):
+        super().__init__(name, direction, min_duration, clear_duration)
+        self.direction = direction
+        self.hysteresis = hysteresis
+
+    def _limit(self, user):
+        if self.direction == 'high':
+            return user.max_safe_bpm or 120
+        return user.min_safe_bpm or 60
+
+    def is_triggered(self, user, bpm, timestamp, state):
+        if self.direction == 'high':
+            return bpm > self._limit(user)
+        return bpm < self._limit(user)
+
+    def is_cleared(self, user, bpm, timestamp, state):
+        if self.direction == 'high':
+            return bpm <= self._limit(user) - self.hysteresis
+        return bpm >= self._limit(user) + self.hysteresis
+
+    def more_extreme(self, a, b):
+        return max(a, b) if self.direction == 'high' else min(a, b)
+
+
+class RateOfChangeRule(AlertRule):
+    """
+    Cambio brusco de BPM entre lecturas consecutivas.
+
+    Args:
+        max_bpm_per_minute (float): Pendiente máxima aceptada
+        max_gap (int): Segundos máximos entre lecturas para comparar
+        min_gap (float): Segundos mínimos entre lecturas; las más cercanas
+            (reintentos, POST duplicados) se ignoran, porque cualquier
+            diferencia daría una pendiente enorme
+    """
+
+    def __init__(self, name, max_bpm_per_minute=400, max_gap=30, clear_duration=60, min_gap=1):
+        super().__init__(name, 'rate', 0, clear_duration)
+        self.max_bpm_per_minute = max_bpm_per_minute
+        self.max_gap = timedelta(seconds=max_gap)
+        self.min_gap = timedelta(seconds=min_gap)
+
+    def accepts(self, timestamp, state):
+        return state.last_timestamp is None or timestamp - state.last_timestamp >= self.min_gap
+
+    def _slope(self, bpm, timestamp, state):
+        if state.last_bpm is None or state.last_timestamp is None:
+            return 0
+        elapsed = timestamp - state.last_timestamp
+        if elapsed > self.max_gap:
+            return 0
+        return abs(bpm - state.last_bpm) * 60 / elapsed.total_seconds()
+
+    def is_triggered(self, user, bpm, timestamp, state):
+        return self._slope(bpm, timestamp, state) > self.max_bpm_per_minute
+
+    def is_cleared(self, user, bpm, timestamp, state):
+        return self._slope(bpm, timestamp, state) <= self.max_bpm_per_minute / 2
+
+
+DEFAULT_RULES = [
+    SustainedThresholdRule('taquicardia_sostenida', 'high', min_duration=60, hysteresis=5),
+    SustainedThresholdRule('bradicardia_sostenida', 'low', min_duration=60, hysteresis=5),
+    RateOfChangeRule('cambio_brusco', max_bpm_per_minute=400),  # ~20 BPM entre lecturas de 3 s
+]
+
+
+class AlertRuleEngine:
+    """
+    Evalúa todas las reglas por cada lectura recibida.
+
+    El estado vive en memoria del proceso de ingesta; los episodios abiertos
+    se recuperan de la BD la primera vez que se ve un usuario tras un reinicio.
+
+    Args:
+        rules (list): Reglas evaluadas (por defecto DEFAULT_RULES)
+        max_gap (int): Segundos sin lecturas tras los que se reinicia el estado
+            y se cierra el episodio abierto
+    """
+
+    def __init__(self, rules=None, max_gap=120):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self.max_gap = timedelta(seconds=max_gap)
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, user_id, rule):
+        key = (user_id, rule.name)
+        state = self._states.get(key)
+        if state is None:
+            state = _RuleState()
+            episode = AlertEpisode.query.filter_by(user_id=user_id, rule=rule.name, ended_at=None)\
+                .order_by(AlertEpisode.started_at.desc())\
+                .first()
+            if episode:
+                state.episode_id = episode.id
+                state.extreme = episode.extreme_bpm
+                state.samples = episode.sample_count
+                state.last_timestamp = episode.last_seen_at
+            self._states[key] = state
+        return state
+
+    def evaluate(self, user, bpm, timestamp):
+        """
+        Procesa una lectura. Los cambios quedan en ``db.session`` y se
+        confirman con el commit de la ingesta.
+
+        Returns:
+            list: Lista de AlertEvent para episodios abiertos o cerrados
+        """
+        events = []
+        with self._lock:
+            for rule in self.rules:
+                state = self._state(user.id, rule)
+                if not rule.accepts(timestamp, state):
+                    continue
+                if state.last_timestamp is not None and timestamp - state.last_timestamp > self.max_gap:
+                    event = self._interrupt(rule, state)
+                    if event:
+                        events.append(event)
+                event = self._step(rule, state, user, bpm, timestamp)
+                if event:
+                    events.append(event)
+                state.last_bpm = bpm
+                state.last_timestamp = timestamp
+        return events
+
+    def _reset(self, state):
+        state.episode_id = None
+        state.pending_since = None
+        state.clear_since = None
+        state.samples = 0
+        state.extreme = None
+
+    def _interrupt(self, rule, state):
+        """Hueco sin lecturas: cierra el episodio abierto en su última lectura."""
+        episode_id = state.episode_id
+        last_seen = state.last_timestamp
+        self._reset(state)
+        state.last_bpm = None
+        if episode_id is None:
+            return None
+        # Puede haberlo cerrado ya close-stale-episodes
+        if not AlertEpisode.query.filter_by(id=episode_id, ended_at=None).update({'ended_at': last_seen}):
+            return None
+        return AlertEvent('closed', rule, db.session.get(AlertEpisode, episode_id))
+
+    def _step(self, rule, state, user, bpm, timestamp):
+        if state.episode_id is None:
+            if not rule.is_triggered(user, bpm, timestamp, state):
+                state.pending_since = None
+                return None
+            if state.pending_since is None:
+                state.pending_since = timestamp
+            if timestamp - state.pending_since < rule.min_duration:
+                return None
+
+            episode = AlertEpisode(
+                user_id=user.id,
+                rule=rule.name,
+                kind=rule.kind,
+                started_at=state.pending_since,
+                last_seen_at=timestamp,
+                extreme_bpm=bpm,
+                sample_count=1
+            )
+            db.session.add(episode)
+            db.session.flush()
+            state.episode_id = episode.id
+            state.extreme = bpm
+            state.samples = 1
+            state.pending_since = None
+            state.clear_since = None
+            return AlertEvent('opened', rule, episode)
+
+        # Episodio abierto: acumular o evaluar cierre
+        state.samples += 1
+        changes = {'last_seen_at': timestamp, 'sample_count': state.samples}
+        closing = False
+
+        if rule.is_cleared(user, bpm, timestamp, state):
+            if state.clear_since is None:
+                state.clear_since = timestamp
+            if timestamp - state.clear_since >= rule.clear_duration:
+                changes['ended_at'] = timestamp
+                closing = True
+        else:
+            state.clear_since = None
+            state.extreme = rule.more_extreme(state.extreme, bpm)
+            changes['extreme_bpm'] = state.extreme
+
+        if not AlertEpisode.query.filter_by(id=state.episode_id, ended_at=None).update(changes):
+            # Cerrado fuera del motor (otro proceso, borrado de lecturas): empezar de cero
+            self._reset(state)
+            return self._step(rule, state, user, bpm, timestamp)
+
+        if not closing:
+            return None
+        episode = db.session.get(AlertEpisode, state.episode_id)
+        self._reset(state)
+        return AlertEvent('closed', rule, episode)
+
+    def forget(self, user_id):
+        """Descarta el estado de un usuario (rollback, borrado de lecturas o de la cuenta)."""
+        with self._lock:
+            for rule in self.rules:
+                self._states.pop((user_id, rule.name), None)
+
+
+def end_open_episodes(user_id):
+    """Cierra en su última lectura los episodios abiertos del usuario. No confirma la sesión."""
+    return AlertEpisode.query.filter_by(user_id=user_id, ended_at=None)\
+        .update({'ended_at': AlertEpisode.last_seen_at}, synchronize_session=False)
+
+
+def close_stale_episodes(max_gap, now=None):
+    """
+    Cierra en su última lectura los episodios sin lecturas desde hace más de
+    ``max_gap`` (dispositivo apagado o sin conexión). No confirma la sesión.
+
+    Returns:
+        list: (regla, id) de los episodios cerrados
+    """
+    cutoff = (now or datetime.utcnow()) - max_gap
+    stale = AlertEpisode.query.with_entities(AlertEpisode.id, AlertEpisode.rule)\
+        .filter(AlertEpisode.ended_at.is_(None), AlertEpisode.last_seen_at < cutoff).all()
+    closed = []
+    for episode_id, rule in stale:
+        # Condicional: la ingesta puede haberlo actualizado entre tanto
+        if AlertEpisode.query.filter(AlertEpisode.id == episode_id, AlertEpisode.ended_at.is_(None),
+                                     AlertEpisode.last_seen_at < cutoff)\
+                .update({'ended_at': AlertEpisode.last_seen_at}, synchronize_session=False):
+            closed.append((rule, episode_id))
+    return closed
+
+
+# Instancia global usada por la ingesta
+alert_engine = AlertRuleEngine()
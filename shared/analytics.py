@@ -0,0 +1,199 @@
+# shared/analytics.py
+"""
+Análisis vectorizado (NumPy) de la serie completa de lecturas de un paciente.
+
+Sobre los arrays de instantes y BPM ordenados por tiempo calcula:
+    - media y mediana móviles (ventana en muestras, ~5 min a una lectura/3 s);
+    - estadísticas tipo VFC sobre diferencias sucesivas: la pulsera da BPM y
+      no intervalos RR, así que se usa RR ≈ 60000 / bpm y se descartan las
+      diferencias entre lecturas separadas más de ``max_gap`` segundos. Son
+      una aproximación (RMSSD, SDNN, pNN50), no una VFC clínica;
+    - anomalías: lecturas a más de ``z_threshold`` desviaciones de la ventana
+      anterior (y a más de ``min_jump`` BPM), contadas como episodios;
+    - cambios de nivel: el nivel medio de la ventana siguiente difiere del
+      de la anterior en más de ``shift_bpm`` (un máximo por tramo);
+    - pulso en reposo: percentil bajo de la mediana móvil.
+
+Lo ejecuta el lote de resúmenes (shared/digests.py) y se guarda en
+``health_digests``; los reportes y CardioBot leen de ahí.
+"""
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import DateTime
+
+WINDOW = 100
+MAX_GAP = 10
+Z_THRESHOLD = 4.0
+MIN_JUMP = 15
+SHIFT_BPM = 15
+RESTING_PERCENTILE = 5
+MEDIAN_CHUNK = 16384
+
+_SERIES_SQL = ('SELECT timestamp, bpm FROM sensor_data '
+               'WHERE user_id = {marker} AND timestamp >= {marker} ORDER BY timestamp')
+
+
+# ==================== VENTANAS MÓVILES ====================
+
+def rolling_mean(values, window):
+    """Media de cada ventana completa de ``window`` muestras (len - window + 1 valores)."""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < window:
+        return np.empty(0)
+    sums = np.cumsum(np.concatenate(([0.0], values)))
+    return (sums[window:] - sums[:-window]) / window
+
+
+def rolling_std(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < window:
+        return np.empty(0)
+    # Centrar antes de acumular evita perder precisión en la resta de sumas grandes
+    centered = values - values.mean()
+    mean = rolling_mean(centered, window)
+    squares = rolling_mean(centered ** 2, window)
+    return np.sqrt(np.maximum(squares - mean ** 2, 0))
+
+
+def rolling_median(values, window, step=1):
+    """
+    Mediana de cada ``step``-ésima ventana; por bloques para no materializar
+    n × window valores.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < window:
+        return np.empty(0)
+    windows = np.lib.stride_tricks.sliding_window_view(values, window)[::step]
+    return np.concatenate([np.median(windows[i:i + MEDIAN_CHUNK], axis=1)
+                           for i in range(0, len(windows), MEDIAN_CHUNK)])
+
+
+def _count_runs(mask):
+    """Número de tramos consecutivos a True."""
+    if len(mask) == 0:
+        return 0
+    return int(mask[0]) + int(np.count_nonzero(mask[1:] & ~mask[:-1]))
+
+
+# ==================== MÉTRICAS ====================
+
+def successive_difference_stats(times, bpm, max_gap=MAX_GAP):
+    """
+    Returns:
+        dict: rmssd_ms, sdnn_ms, pnn50 (None si no hay pares contiguos)
+    """
+    bpm = np.asarray(bpm, dtype=np.float64)
+    rr = 60000.0 / np.maximum(bpm, 1)
+    contiguous = np.diff(times) <= max_gap
+    diffs = np.diff(rr)[contiguous]
+    if len(diffs) == 0:
+        return {'rmssd_ms': None, 'sdnn_ms': None, 'pnn50': None}
+    return {
+        'rmssd_ms': round(float(np.sqrt(np.mean(diffs ** 2))), 1),
+        'sdnn_ms': round(float(np.std(rr)), 1),
+        'pnn50': round(float(np.mean(np.abs(diffs) > 50) * 100), 1),
+    }
+
+
+def zscore_anomalies(bpm, window=WINDOW, z_threshold=Z_THRESHOLD, min_jump=MIN_JUMP):
+    """
+    Lecturas alejadas de la ventana que las precede.
+
+    Returns:
+        ndarray: Máscara booleana del tamaño de ``bpm`` (las primeras ``window`` son False)
+    """
+    bpm = np.asarray(bpm, dtype=np.float64)
+    flags = np.zeros(len(bpm), dtype=bool)
+    if len(bpm) <= window:
+        return flags
+    # Ventana i = bpm[i:i + window] se compara con bpm[i + window]
+    mean = rolling_mean(bpm, window)[:-1]
+    std = rolling_std(bpm, window)[:-1]
+    deviation = np.abs(bpm[window:] - mean)
+    flags[window:] = (deviation > z_threshold * np.maximum(std, 1.0)) & (deviation >= min_jump)
+    return flags
+
+
+def changepoints(bpm, window=WINDOW, shift_bpm=SHIFT_BPM):
+    """
+    Índices donde el nivel medio cambia: media de las ``window`` muestras
+    siguientes frente a las ``window`` anteriores. Se devuelve el punto de
+    mayor salto de cada tramo que supera ``shift_bpm``.
+
+    Returns:
+        ndarray: Índices en ``bpm``
+    """
+    bpm = np.asarray(bpm, dtype=np.float64)
+    if len(bpm) < 2 * window:
+        return np.empty(0, dtype=np.int64)
+    means = rolling_mean(bpm, window)
+    # Posición i (desde window): media de [i - window, i) frente a [i, i + window)
+    shift = np.abs(means[window:] - means[:-window])
+    candidates = shift >= shift_bpm
+    if not candidates.any():
+        return np.empty(0, dtype=np.int64)
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], candidates, [False])).astype(np.int8)))
+    starts, ends = edges[::2], edges[1::2]
+    peaks = np.array([start + np.argmax(shift[start:end]) for start, end in zip(starts, ends)])
+    return peaks + window
+
+
+def resting_rate(bpm, window=WINDOW, percentile=RESTING_PERCENTILE):
+    """Percentil bajo de la mediana móvil: ignora picos y lecturas sueltas bajas."""
+    # Ventanas solapadas al 90%: el percentil apenas cambia y es 10 veces más barato
+    medians = rolling_median(bpm, window, step=max(1, window // 10))
+    if len(medians) == 0:
+        return round(float(np.percentile(bpm, percentile)), 1) if len(bpm) else None
+    return round(float(np.percentile(medians, percentile)), 1)
+
+
+def analyze_series(times, bpm, window=WINDOW):
+    """
+    Args:
+        times (ndarray): Instantes en segundos (epoch), ordenados
+        bpm (ndarray): Lecturas
+
+    Returns:
+        dict: Columnas de análisis de HealthDigest
+    """
+    times = np.asarray(times, dtype=np.float64)
+    bpm = np.asarray(bpm, dtype=np.float64)
+    result = {'resting_bpm': None, 'rmssd_ms': None, 'sdnn_ms': None, 'pnn50': None,
+              'anomaly_count': 0, 'changepoint_count': 0, 'last_anomaly_at': None}
+    if len(bpm) == 0:
+        return result
+
+    result.update(successive_difference_stats(times, bpm))
+    result['resting_bpm'] = resting_rate(bpm, window)
+    anomalies = zscore_anomalies(bpm, window)
+    result['anomaly_count'] = _count_runs(anomalies)
+    if result['anomaly_count']:
+        result['last_anomaly_at'] = datetime.utcfromtimestamp(times[np.flatnonzero(anomalies)[-1]])
+    result['changepoint_count'] = int(len(changepoints(bpm, window)))
+    return result
+
+
+# ==================== CARGA ====================
+
+def load_series(connection, user_id, since):
+    """
+    Returns:
+        tuple: (times epoch float64, bpm float64) ordenados por tiempo
+    """
+    # Cursor del driver: con cientos de miles de filas por paciente, construir
+    # objetos Row de SQLAlchemy cuesta más que la propia consulta
+    dialect = connection.dialect
+    marker = '?' if dialect.paramstyle == 'qmark' else '%s'
+    to_db = DateTime().bind_processor(dialect)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(_SERIES_SQL.format(marker=marker), (user_id, to_db(since) if to_db else since))
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if not rows:
+        return np.empty(0), np.empty(0)
+    # Texto 'YYYY-MM-DD HH:MM:SS.ffffff' (SQLite) o datetime (MySQL): NumPy acepta ambos
+    times = np.array([row[0] for row in rows], dtype='datetime64[us]').astype(np.int64) / 1e6
+    return times, np.array([row[1] for row in rows], dtype=np.float64)
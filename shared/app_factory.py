@@ -0,0 +1,247 @@
+# shared/app_factory.py
+"""
+Fábrica de aplicaciones compartida por los puntos de entrada.
+
+    create_app('admin')     panel de administración e ingesta del ESP32 (/admin)
+    create_app('user')      portal de pacientes (/user)
+    create_app('combined')  ambos blueprints en un solo proceso, para
+                            despliegues pequeños con un único contenedor
+
+Solo se importan los blueprints (y sus dependencias) del rol pedido, de modo
+que el proceso de usuario no carga la ingesta ni las notificaciones y el de
+administración no carga CardioBot.
+
+Uso:
+    python -m admin.app_admin
+    python -m user.app_user
+    python -m shared.app_factory combined --port 5000
+"""
+import os
+
+from flask import Flask, redirect, url_for
+from flask_login import LoginManager, current_user
+
+ROLES = ('admin', 'user', 'combined')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INSTANCE_PATH = os.environ.get('INSTANCE_PATH', os.path.join(PROJECT_ROOT, 'instance'))
+
+# Claves históricas de cada contenedor (SECRET_KEY del entorno tiene prioridad)
+_DEFAULT_SECRET_KEYS = {
+    'admin': 'clave-secreta-admin',
+    'user': 'clave-secreta-user',
+    'combined': 'clave-secreta-admin'
+}
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def build_config(role):
+    """Configuración común más la específica de cada rol."""
+    config = {
+        'SECRET_KEY': os.environ.get('SECRET_KEY', _DEFAULT_SECRET_KEYS[role]),
+        'SQLALCHEMY_DATABASE_URI': os.environ.get(
+            'DATABASE_URL', 'sqlite:///' + os.path.join(INSTANCE_PATH, 'project.db')),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+
+        # Buffer de lecturas recientes compartido entre admin y user (memoria mapeada)
+        'LIVE_BUFFER_PATH': os.path.join(INSTANCE_PATH, 'live_buffer.bin'),
+        'LIVE_BUFFER_SLOTS': 4096,
+        'LIVE_BUFFER_CAPACITY': 256,
+
+        # Histogramas de BPM por franja de edad, condición y hora (shared/population.py)
+        'POPULATION_SKETCH_PATH': os.path.join(INSTANCE_PATH, 'population.bin'),
+        # Horas locales [inicio, fin) del pulso en reposo y zona horaria de los pacientes
+        'POPULATION_RESTING_HOURS': os.environ.get('POPULATION_RESTING_HOURS', '0-6'),
+        'POPULATION_TIMEZONE': os.environ.get('POPULATION_TIMEZONE', 'UTC'),
+
+        # Caché de identidad: versiones de cuenta compartidas entre procesos
+        'IDENTITY_VERSIONS_PATH': os.path.join(INSTANCE_PATH, 'account_versions.bin'),
+        'IDENTITY_CACHE_TTL': 30,
+
+        # Caché de fragmentos de reportes: versiones de datos por usuario compartidas
+        'FRAGMENT_VERSIONS_PATH': os.path.join(INSTANCE_PATH, 'data_versions.bin'),
+        'FRAGMENT_CACHE_SIZE': _env_int('FRAGMENT_CACHE_SIZE', 256),
+        'FRAGMENT_CACHE_TTL': 300,
+        'FRAGMENT_CACHE_BYTES': _env_int('FRAGMENT_CACHE_BYTES', 64 * 1024 * 1024),
+        'FRAGMENT_GLOBAL_WINDOW': _env_int('FRAGMENT_GLOBAL_WINDOW', 60),
+
+        # Hash de contraseñas: método de werkzeug por rol y pool de verificación
+        'PASSWORD_HASH_ADMIN': os.environ.get('PASSWORD_HASH_ADMIN', 'pbkdf2:sha256:600000'),
+        'PASSWORD_HASH_USER': os.environ.get('PASSWORD_HASH_USER', 'pbkdf2:sha256:600000'),
+        'PASSWORD_HASH_WORKERS': _env_int('PASSWORD_HASH_WORKERS', 2),
+        # Logins admitidos a la vez; sin valor, WEB_THREADS - 2 (hilos libres para el resto)
+        'PASSWORD_HASH_MAX_PENDING': _env_int('PASSWORD_HASH_MAX_PENDING', 0),
+        'WEB_THREADS': _env_int('WEB_THREADS', 8),
+
+        # Estáticos con hash (scripts/build_assets.py); sin manifiesto, URLs sin versionar
+        'ASSET_MANIFEST_PATH': os.path.join(PROJECT_ROOT, 'static', 'dist', 'manifest.json'),
+
+        # Métricas Prometheus (GET /metrics); una instantánea por worker en METRICS_DIR
+        'METRICS_ENABLED': os.environ.get('METRICS_ENABLED', '1') == '1',
+        'METRICS_DIR': os.path.join(INSTANCE_PATH, 'metrics', role),
+        'METRICS_TOKEN': os.environ.get('METRICS_TOKEN', ''),
+        'METRICS_FLUSH_INTERVAL': 5,
+
+        # Perfilador SQL de desarrollo (N+1, consultas lentas, SCAN de sensor_data)
+        'SQL_PROFILER': os.environ.get('SQL_PROFILER') == '1',
+        'SQL_PROFILER_REPEAT': _env_int('SQL_PROFILER_REPEAT', 5),
+        'SQL_PROFILER_SLOW_MS': _env_float('SQL_PROFILER_SLOW_MS', 100),
+        'SQL_PROFILER_STRICT': os.environ.get('SQL_PROFILER_STRICT') == '1',
+
+        # Planificador de trabajos en segundo plano (shared/scheduler.py), uno por worker
+        'SCHEDULER_ENABLED': os.environ.get('SCHEDULER_ENABLED', '1') == '1',
+        'SCHEDULER_WORKERS': _env_int('SCHEDULER_WORKERS', 2),
+        'SCHEDULER_POLL_INTERVAL': _env_float('SCHEDULER_POLL_INTERVAL', 5),
+        'SCHEDULER_LEASE': _env_int('SCHEDULER_LEASE', 60),
+
+        # Reparto de sensor_data en N archivos SQLite por user_id (shared/shards.py); 0/1 = una sola BD
+        'SENSOR_SHARDS': _env_int('SENSOR_SHARDS', 0),
+        'SENSOR_SHARD_DIR': os.environ.get('SENSOR_SHARD_DIR', os.path.join(INSTANCE_PATH, 'shards')),
+
+        # Configuración de sesión
+        'SESSION_PERMANENT': True,
+        'PERMANENT_SESSION_LIFETIME': 3600,
+        'SESSION_COOKIE_SECURE': False,
+        'SESSION_COOKIE_HTTPONLY': True,
+        'SESSION_COOKIE_SAMESITE': 'Lax',
+    }
+
+    if role in ('admin', 'combined'):
+        # Notificaciones de alerta (vacío = canal deshabilitado)
+        config.update({
+            'NOTIFY_SMTP_HOST': os.environ.get('NOTIFY_SMTP_HOST', ''),
+            'NOTIFY_SMTP_PORT': _env_int('NOTIFY_SMTP_PORT', 25),
+            'NOTIFY_SMTP_SENDER': os.environ.get('NOTIFY_SMTP_SENDER', 'alertas@hearttone.local'),
+            'NOTIFY_SMTP_USER': os.environ.get('NOTIFY_SMTP_USER'),
+            'NOTIFY_SMTP_PASSWORD': os.environ.get('NOTIFY_SMTP_PASSWORD'),
+            'NOTIFY_SMTP_TLS': os.environ.get('NOTIFY_SMTP_TLS') == '1',
+            'NOTIFY_WEBHOOK_URL': os.environ.get('NOTIFY_WEBHOOK_URL', ''),
+            'NOTIFY_WORKERS': _env_int('NOTIFY_WORKERS', 2),
+
+            # Procesos del pool del resumen diario lanzado por el planificador
+            'SCHEDULER_DIGEST_WORKERS': _env_int('SCHEDULER_DIGEST_WORKERS', 2),
+
+            # Reportes descargables (shared/reports.py): archivos por contenido
+            'REPORT_DIR': os.path.join(INSTANCE_PATH, 'reports'),
+            'REPORT_RETENTION_DAYS': _env_int('REPORT_RETENTION_DAYS', 7),
+        })
+
+    if role in ('user', 'combined'):
+        # Modelo remoto opcional para CardioBot (vacío = solo lógica programada)
+        config.update({
+            'CARDIOBOT_LLM_URL': os.environ.get('CARDIOBOT_LLM_URL', ''),
+            'CARDIOBOT_LLM_TOKEN': os.environ.get('CARDIOBOT_LLM_TOKEN', ''),
+            'CARDIOBOT_LLM_READ_TIMEOUT': _env_float('CARDIOBOT_LLM_READ_TIMEOUT', 10),
+            'CARDIOBOT_LLM_TOTAL_TIMEOUT': _env_float('CARDIOBOT_LLM_TOTAL_TIMEOUT', 20),
+            'CARDIOBOT_LLM_MAX_CONCURRENCY': _env_int('CARDIOBOT_LLM_MAX_CONCURRENCY', 4),
+        })
+
+    return config
+
+
+def create_app(role, overrides=None):
+    """
+    Args:
+        role (str): 'admin', 'user' o 'combined'
+        overrides (dict): Claves de configuración que sustituyen a las por defecto
+
+    Returns:
+        Flask
+    """
+    if role not in ROLES:
+        raise ValueError(f'Rol desconocido: {role}')
+
+    from shared.models import db, User
+    from shared.passwords import configure_password_hasher
+    from shared.identity import init_identity_cache, load_identity
+    from shared.assets import init_assets
+    from shared.fragments import init_fragment_cache
+    from shared.metrics import init_metrics
+    from shared.sql_profiler import init_sql_profiler
+    from shared.shards import init_shards
+
+    app = Flask(__name__,
+                template_folder=os.path.join(PROJECT_ROOT, 'templates'),
+                static_folder=os.path.join(PROJECT_ROOT, 'static'))
+    app.config.from_mapping(build_config(role))
+    app.config['APP_ROLE'] = role
+    if overrides:
+        app.config.update(overrides)
+
+    db.init_app(app)
+    init_shards(app)
+    configure_password_hasher(app.config)
+    init_identity_cache(app, db, User)
+    init_fragment_cache(app)
+    init_assets(app)
+    init_metrics(app)
+    init_sql_profiler(app, db)
+
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    # Cada blueprint redirige a su propio login (en modo combinado conviven)
+    login_manager.login_view = 'admin.admin_login' if role == 'admin' else 'user.user_login'
+    login_manager.blueprint_login_views = {}
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return load_identity(User, int(user_id))
+
+    if role in ('admin', 'combined'):
+        from admin.admin_routes import admin_bp
+        app.register_blueprint(admin_bp, url_prefix='/admin')
+        login_manager.blueprint_login_views['admin'] = 'admin.admin_login'
+        print("✅ Blueprint de admin registrado correctamente en /admin")
+
+    if role in ('user', 'combined'):
+        from user.user_routes import user_bp
+        from shared.chatbot_config import chatbot_manager
+        app.register_blueprint(user_bp, url_prefix='/user')
+        login_manager.blueprint_login_views['user'] = 'user.user_login'
+        chatbot_manager.configure_backend(app.config)
+        print("✅ Blueprint de usuario registrado correctamente en /user")
+
+    if role in ('admin', 'combined'):
+        from shared.commands import register_commands
+        from shared.population import init_population
+        init_population(app)
+        register_commands(app)
+
+    @app.route('/')
+    def index():
+        if current_user.is_authenticated and current_user.role == 'admin' and role != 'user':
+            return redirect(url_for('admin.admin_dashboard'))
+        if current_user.is_authenticated and current_user.role == 'user' and role != 'admin':
+            return redirect(url_for('user.dashboard'))
+        if role == 'admin':
+            return redirect(url_for('admin.admin_login'))
+        return redirect(url_for('user.user_login'))
+
+    return app
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Servidor de desarrollo por rol')
+    parser.add_argument('role', choices=ROLES)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    options = parser.parse_args()
+
+    application = create_app(options.role)
+    if options.role != 'user':
+        from shared.commands import initialize_database
+        from shared.notifications import start_notification_dispatcher
+        initialize_database(application)
+        start_notification_dispatcher(application)
+    from shared.scheduler import start_scheduler
+    start_scheduler(application)
+    application.run(debug=True, host=options.host, port=options.port)
@@ -0,0 +1,52 @@
+# shared/assets.py
+"""
+URLs versionadas de los estáticos.
+
+Si existe el manifiesto generado por scripts/build_assets.py,
+``url_for('static', filename='css/style.css')`` devuelve la copia con hash
+(``/static/dist/css/style.<hash>.css``), que nginx sirve desde disco con caché
+inmutable. Sin manifiesto (desarrollo) las URLs no cambian.
+"""
+import json
+import os
+
+from flask import request
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def load_manifest(path):
+    """Returns: dict ruta original -> ruta con hash (vacío si no hay build)."""
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Manifiesto de estáticos no válido ({path}): {e}")
+        return {}
+
+
+def init_assets(app):
+    manifest = load_manifest(app.config.get('ASSET_MANIFEST_PATH'))
+    app.extensions['asset_manifest'] = manifest
+    if not manifest:
+        return
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static':
+            filename = values.get('filename')
+            if filename in manifest:
+                values['filename'] = manifest[filename]
+
+    # Sin nginx delante (modo combinado) Flask sirve dist/ con la misma caché
+    @app.after_request
+    def immutable_static_cache(response):
+        if request.endpoint == 'static' and response.status_code == 200 \
+                and request.view_args.get('filename', '').startswith('dist/'):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
@@ -1,10 +1,11 @@
 # shared/auth.py
 """
 Módulo de autenticación y validación de dispositivos.
-Contiene los códigos válidos de dispositivos y funciones de validación.
+La tabla ``devices`` es la fuente de verdad (ver shared/devices.py); esta lista
+solo siembra el lote inicial en ``initialize_database``.
 """
 
-# ✅ LISTA DE CÓDIGOS SEGUROS DE DISPOSITIVOS (20 dispositivos)
+# ✅ LOTE INICIAL DE CÓDIGOS SEGUROS DE DISPOSITIVOS (20 dispositivos)
 SECURE_DEVICE_CODES = [
     "HR-SENSOR-A1B2-C3D4",
     "HR-SENSOR-E5F6-G7H8", 
@@ -30,13 +31,13 @@ SECURE_DEVICE_CODES = [
 
 def is_valid_device_code(code):
     """
-    Verifica si un código de dispositivo es válido.
+    Verifica si un código de dispositivo está en el registro.
     
     Args:
-        code (str): Código del dispositivo a validar (debe estar en mayúsculas)
+        code (str): Código del dispositivo a validar
         
     Returns:
-        bool: True si el código existe en la lista de códigos válidos
+        bool: True si el código existe en la tabla de dispositivos
         
     Example:
         >>> is_valid_device_code("HR-SENSOR-A1B2-C3D4")
@@ -44,22 +45,25 @@ def is_valid_device_code(code):
         >>> is_valid_device_code("INVALID-CODE")
         False
     """
-    return code in SECURE_DEVICE_CODES
+    from shared.devices import find_device
+    return find_device(code) is not None
 
 def get_available_devices_count():
     """
-    Retorna el número total de dispositivos disponibles en el sistema.
+    Retorna el número de dispositivos registrados y libres.
     
     Returns:
-        int: Cantidad total de códigos de dispositivos configurados
+        int: Cantidad de dispositivos sin asignar
     """
-    return len(SECURE_DEVICE_CODES)
+    from shared.models import Device
+    return Device.query.filter_by(is_used=False).count()
 
 def get_all_device_codes():
     """
-    Retorna una copia de la lista de todos los códigos de dispositivos.
+    Retorna los códigos de todos los dispositivos registrados.
     
     Returns:
         list: Lista con todos los códigos de dispositivos válidos
     """
-    return SECURE_DEVICE_CODES.copy()
\ No newline at end of file
+    from shared.models import Device
+    return [code for code, in Device.query.with_entities(Device.device_code).order_by(Device.device_code)]
\ No newline at end of file
@@ -0,0 +1,100 @@
+# shared/cache.py
+"""
+Caché en memoria de tamaño acotado con expiración (LRU + TTL).
+Segura entre hilos; cada proceso tiene la suya.
+
+Con ``weigher`` el límite también puede expresarse en peso (p.ej. bytes):
+se expulsan las entradas menos usadas hasta quedar por debajo de ``max_weight``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Args:
+        maxsize (int): Entradas máximas; al superarlo se expulsa la menos usada
+        ttl (float): Segundos de validez de cada entrada
+        max_weight (int): Peso total máximo (requiere ``weigher``)
+        weigher (callable): ``weigher(value)`` -> peso de una entrada
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, max_weight=None, weigher=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self._data = OrderedDict()
+        self._weight = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _pop(self, key):
+        entry = self._data.pop(key)
+        self._weight -= entry[2]
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < now:
+                if entry is not _MISSING:
+                    self._pop(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        weight = self.weigher(value) if self.weigher else 0
+        if self.max_weight is not None and weight > self.max_weight:
+            # Nunca cabría: no expulsar todo lo demás por ella
+            self.delete(key)
+            return
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (expires, value, weight)
+            self._weight += weight
+            while len(self._data) > self.maxsize or \
+                    (self.max_weight is not None and self._weight > self.max_weight):
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def invalidate(self, predicate):
+        """Elimina las entradas cuya clave cumple ``predicate(key)``. Retorna cuántas."""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                self._pop(key)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weight = 0
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+            if self.weigher:
+                stats.update(weight=self._weight, max_weight=self.max_weight)
+            return stats
@@ -1,12 +1,78 @@
 # shared/chatbot_config.py
-import requests
 import json
+import unicodedata
 from datetime import datetime
+from shared.cache import TTLCache
+from shared.llm_backend import LLMUnavailable
+
+def fold_text(text):
+    """Minúsculas y sin acentos: 'Cómo ESTOY' -> 'como estoy'."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+# Intenciones en orden de prioridad (la primera que aparezca en el mensaje gana)
+INTENTS = [
+    ('salud', ['cómo estoy', 'mi estado', 'análisis', 'salud']),
+    ('emergencia', ['alerta', 'emergencia', 'peligro', 'urgencia']),
+    ('consejo', ['consejo', 'recomendación', 'qué hacer', 'sugerencia']),
+    ('ritmo', ['ritmo', 'bpm', 'latidos', 'cardíaco']),
+    ('medicamentos', ['medicina', 'medicamento', 'pastilla', 'tratamiento']),
+    ('sintomas', ['síntoma', 'dolor', 'mareo', 'molestia']),
+]
+
+class IntentMatcher:
+    """
+    Índice de intenciones preparado una sola vez sobre texto sin acentos.
+
+    Las palabras clave se guardan ya normalizadas en una lista plana en orden
+    de prioridad: la primera que aparece como subcadena decide la intención,
+    igual que la cadena de ``any(word in message ...)``. La búsqueda de
+    subcadenas en C es más rápida que una regex combinada con lookahead para
+    mensajes de chat cortos.
+    """
+    
+    def __init__(self, intents):
+        self._keywords = [(fold_text(keyword), intent) for intent, keywords in intents for keyword in keywords]
+    
+    def match(self, folded_message):
+        """
+        Args:
+            folded_message (str): Mensaje ya pasado por fold_text
+        
+        Returns:
+            tuple: (intención o None, palabras clave de esa intención encontradas)
+        """
+        for keyword, intent in self._keywords:
+            if keyword in folded_message:
+                return intent, [k for k, i in self._keywords if i == intent and k in folded_message]
+        return None, []
+
+intent_matcher = IntentMatcher(INTENTS)
+
+# Intenciones cuya respuesta depende del texto exacto y no solo de los datos
+MESSAGE_DEPENDENT_INTENTS = {'sintomas', None}
+
+INTERRUPTED_NOTICE = "\n\n_(Respuesta interrumpida, intenta nuevamente)_"
 
 class ChatbotManager:
     def __init__(self):
         self.huggingface_token = ""  # Opcional para más requests
         self.context = self._get_base_context()
+        self.response_cache = TTLCache(maxsize=2048, ttl=120)
+        self.backend = None  # Modelo remoto opcional (ver configure_backend)
+    
+    def configure_backend(self, config):
+        """Activa el modelo remoto si la app define CARDIOBOT_LLM_URL."""
+        from shared.llm_backend import build_backend
+        self.backend = build_backend(config)
+        if self.backend:
+            print(f"✅ CardioBot usando modelo remoto: {self.backend.url}")
+    
+    def _build_prompt(self, user_message, user_data):
+        user_context = json.dumps(user_data, ensure_ascii=False, default=str) if user_data else 'Sin datos'
+        return self.context.format(user_context=user_context, user_message=user_message)
     
     def _get_base_context(self):
         return """Eres CardioBot, un asistente médico especializado en cardiología. 
@@ -26,41 +92,118 @@ class ChatbotManager:
         Respuesta:"""
     
     def get_response(self, user_message, user_data=None):
+        if self.backend:
+            try:
+                return self.backend.generate(self._build_prompt(user_message, user_data))
+            except LLMUnavailable as e:
+                print(f"⚠️ Modelo remoto no disponible, usando lógica programada: {e}")
+        
+        return self._get_rule_based(user_message, user_data)
+    
+    def stream_response(self, user_message, user_data=None):
+        """
+        Genera la respuesta por fragmentos. Si el modelo falla antes del primer
+        fragmento se envía la respuesta programada completa; si falla a mitad,
+        se cierra el mensaje con un aviso.
+        """
+        if self.backend:
+            sent_any = False
+            try:
+                for chunk in self.backend.stream(self._build_prompt(user_message, user_data)):
+                    sent_any = True
+                    yield chunk
+                return
+            except LLMUnavailable as e:
+                print(f"⚠️ Modelo remoto no disponible, usando lógica programada: {e}")
+                if sent_any:
+                    yield INTERRUPTED_NOTICE
+                    return
+        
+        yield self._get_rule_based(user_message, user_data)
+    
+    def _get_rule_based(self, user_message, user_data):
         try:
             # Usar respuesta inteligente programada (gratuita)
             return self._get_smart_response(user_message, user_data)
-            
         except Exception as e:
             print(f"Error en chatbot: {e}")
             return self._get_fallback_response(user_message, user_data)
     
+    def get_cached_response(self, user_message, user_id, fingerprint, load_user_data):
+        """
+        Respuesta servida desde caché cuando la intención, el usuario y la
+        huella de sus estadísticas no han cambiado.
+        
+        Args:
+            user_message (str): Pregunta del usuario
+            user_id (int): ID del usuario
+            fingerprint (tuple): Huella barata de sus lecturas y datos médicos
+            load_user_data (callable): Construye el contexto completo (solo en fallo de caché)
+        """
+        key = self._cache_key(user_message, user_id, fingerprint)
+        response = self.response_cache.get(key)
+        if response is None:
+            response = self.get_response(user_message, load_user_data())
+            self.response_cache.set(key, response)
+        return response
+    
+    def stream_cached_response(self, user_message, user_id, fingerprint, load_user_data):
+        """Igual que get_cached_response pero por fragmentos; solo cachea respuestas completas."""
+        key = self._cache_key(user_message, user_id, fingerprint)
+        response = self.response_cache.get(key)
+        if response is not None:
+            yield response
+            return
+        
+        chunks = []
+        for chunk in self.stream_response(user_message, load_user_data()):
+            chunks.append(chunk)
+            yield chunk
+        if chunks and chunks[-1] is not INTERRUPTED_NOTICE:
+            self.response_cache.set(key, ''.join(chunks))
+    
+    def _cache_key(self, user_message, user_id, fingerprint):
+        folded_message = fold_text(user_message)
+        intent, _ = intent_matcher.match(folded_message)
+        # Con modelo remoto la respuesta depende siempre del texto de la pregunta
+        if self.backend or intent in MESSAGE_DEPENDENT_INTENTS:
+            discriminator = folded_message.strip()
+        else:
+            discriminator = ''
+        return (intent, user_id, fingerprint, discriminator)
+    
+    def invalidate_user(self, user_id):
+        """Descarta las respuestas de un usuario (nuevas lecturas o datos médicos)."""
+        return self.response_cache.invalidate(lambda key: key[1] == user_id)
+    
     def _get_smart_response(self, user_message, user_data):
         """Respuesta inteligente con lógica programada"""
-        user_message_lower = user_message.lower()
+        folded_message = fold_text(user_message)
+        intent, _ = intent_matcher.match(folded_message)
         
         # Análisis de salud
-        if any(word in user_message_lower for word in ['cómo estoy', 'mi estado', 'análisis', 'salud']):
+        if intent == 'salud':
             return self._analyze_health(user_data) if user_data else self._get_health_analysis_placeholder()
         
         # Alertas y emergencias
-        elif any(word in user_message_lower for word in ['alerta', 'emergencia', 'peligro', 'urgencia']):
+        elif intent == 'emergencia':
             return self._handle_emergency_query(user_data)
         
         # Recomendaciones
-        elif any(word in user_message_lower for word in ['consejo', 'recomendación', 'qué hacer', 'sugerencia']):
+        elif intent == 'consejo':
             return self._get_personalized_advice(user_data)
         
         # Ritmo cardíaco específico
-        elif any(word in user_message_lower for word in ['ritmo', 'bpm', 'latidos', 'cardíaco']):
+        elif intent == 'ritmo':
             return self._analyze_heart_rate(user_data)
         
         # Medicamentos
-        elif any(word in user_message_lower for word in ['medicina', 'medicamento', 'pastilla', 'tratamiento']):
+        elif intent == 'medicamentos':
             return "💊 **Sobre medicamentos:** Siempre consulta con tu médico sobre medicamentos. Nunca modifiques tu tratamiento sin supervisión médica profesional."
         
         # Síntomas
-        elif any(word in user_message_lower for word in ['síntoma', 'dolor', 'mareo', 'molestia']):
-            return self._handle_symptoms_query(user_message_lower)
+        elif intent == 'sintomas':
+            return self._handle_symptoms_query(folded_message)
         
         # General
         else:
@@ -156,7 +299,15 @@ class ChatbotManager:
         analysis += f"• 📊 **Promedio:** {stats['avg_bpm']} BPM\n"
         analysis += f"• 📈 **Máximo:** {stats['max_bpm']} BPM\n"
         analysis += f"• 📉 **Mínimo:** {stats['min_bpm']} BPM\n"
-        analysis += f"• 🔄 **Variabilidad:** {stats['variability']} BPM\n\n"
+        analysis += f"• 🔄 **Variabilidad:** {stats['variability']} BPM\n"
+        
+        analytics = user_data.get('analytics')
+        if analytics:
+            analysis += f"• 🛌 **Reposo estimado:** {analytics['resting_bpm']} BPM\n"
+            if analytics['rmssd_ms'] is not None:
+                analysis += f"• 〰️ **RMSSD aproximado:** {analytics['rmssd_ms']} ms\n"
+            analysis += f"• ⚡ **Cambios bruscos:** {analytics['anomaly_count']} (resumen del {analytics['digest_date']})\n"
+        analysis += "\n"
         
         # Interpretación
         if stats['avg_bpm'] < 60:
@@ -171,9 +322,9 @@ class ChatbotManager:
     def _handle_symptoms_query(self, user_message):
         if 'pecho' in user_message:
             return "💔 **Dolor de pecho:** Si el dolor es intenso, se extiende al brazo o cuello, o viene con dificultad para respirar, busca atención médica inmediata."
-        elif 'mareo' in user_message or 'vértigo' in user_message:
+        elif 'mareo' in user_message or 'vertigo' in user_message:
             return "🌀 **Mareos:** Pueden relacionarse con presión arterial o ritmo cardíaco. Si son frecuentes o intensos, consulta con tu médico."
-        elif 'palpitación' in user_message:
+        elif 'palpitacion' in user_message:
             return "💓 **Palpitaciones:** Sensación de latidos fuertes o irregulares. Si son frecuentes o vienen con otros síntomas, es importante evaluación médica."
         else:
             return "🤒 **Síntomas:** Cualquier síntoma persistente o que cause preocupación debe ser evaluado por un profesional de la salud."
@@ -0,0 +1,219 @@
+# shared/commands.py
+"""
+Inicialización de la base de datos y comandos de mantenimiento (flask CLI)
+de los roles admin y combinado.
+"""
+import sys
+
+import click
+from flask import current_app
+
+from shared.models import db, User, Device
+from shared.migrations import run_migrations
+from shared.passwords import PasswordVerifierBusy
+
+
+def initialize_database(app, reset=False):
+    """
+    Prepara la BD al arrancar: aplica las migraciones pendientes y siembra el
+    admin principal y los dispositivos iniciales solo si faltan. Los datos
+    existentes se conservan.
+
+    Args:
+        reset (bool): Borrar todas las tablas antes (``flask init-db --reset``)
+    """
+    with app.app_context():
+        try:
+            if reset:
+                print("🗑️  Eliminando tablas existentes...")
+                db.drop_all()  # Incluye schema_version: se vuelve a migrar desde 0
+                
+                # El buffer en vivo refleja la BD anterior: vaciarlo
+                from shared.live_buffer import get_live_buffer
+                live_buffer = get_live_buffer()
+                if live_buffer:
+                    live_buffer.reset()
+                
+                # Los ids se reutilizan: invalidar identidades cacheadas
+                from shared.identity import reset_identities
+                from shared.fragments import reset_fragments
+                from shared.population import reset_population
+                from shared.shards import reset_shards
+                reset_identities()
+                reset_fragments()
+                reset_population()
+                reset_shards()
+            
+            run_migrations(db.engine)
+            
+            # Con SENSOR_SHARDS > 1 las lecturas viven en sus propios archivos
+            from shared.shards import create_shard_schema
+            create_shard_schema()
+            
+            # Crear admin principal
+            if not User.query.filter_by(username='admin').first():
+                admin = User(
+                    username='admin',
+                    email='admin@system.com',
+                    role='admin'
+                )
+                try:
+                    admin.set_password('admin123')
+                except PasswordVerifierBusy:
+                    admin = None
+                    print("⚠️ Pool de hash saturado: el admin principal se creará en el próximo arranque")
+                if admin is not None:
+                    db.session.add(admin)
+                    db.session.commit()
+                    print("✅ Admin principal creado: usuario='admin', contraseña='admin123'")
+            
+            # Sembrar el lote inicial de dispositivos solo en un registro vacío
+            if db.session.query(Device.id).first() is None:
+                from shared.auth import SECURE_DEVICE_CODES
+                from shared.devices import provision_devices
+                result = provision_devices(SECURE_DEVICE_CODES, batch='inicial')
+                print(f"  + Dispositivos registrados: {result['inserted']}")
+            
+            print("🎉 Base de datos lista")
+            
+        except Exception as e:
+            print(f"❌ Error crítico: {e}")
+            import traceback
+            traceback.print_exc()
+
+
+def register_commands(app):
+    @app.cli.command('generate-digests')
+    @click.option('--workers', type=int, default=None, help='Procesos del pool (por defecto, núcleos)')
+    @click.option('--budget', type=float, default=None, help='Tiempo máximo en segundos')
+    @click.option('--chunk-size', type=int, default=200, help='Usuarios por tarea')
+    @click.option('--analytics/--no-analytics', default=True,
+                  help='Calcular el análisis de la serie completa (VFC, anomalías, reposo)')
+    def generate_digests_command(workers, budget, chunk_size, analytics):
+        """Genera el resumen diario de salud de todos los pacientes activos."""
+        from shared.digests import run_digest_batch
+        from shared.shards import shard_urls
+        result = run_digest_batch(current_app.config['SQLALCHEMY_DATABASE_URI'],
+                                  workers=workers, chunk_size=chunk_size, time_budget=budget,
+                                  analytics=analytics, shard_uris=shard_urls())
+        print(f"📊 Resúmenes: {result['stored']}/{result['users']} usuarios en {result['elapsed']}s "
+              f"({result['throughput']} usuarios/s)")
+        if not result['complete']:
+            print("⚠️ Presupuesto de tiempo agotado: resumen incompleto")
+            sys.exit(1)
+
+    @app.cli.command('provision-devices')
+    @click.argument('source', type=click.File('r', encoding='utf-8'))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+                  help='Formato del archivo (por defecto, según la extensión)')
+    @click.option('--batch', default=None, help='Lote asignado a los registros que no traen uno')
+    @click.option('--batch-size', type=int, default=1000, help='Filas por INSERT')
+    def provision_devices_command(source, fmt, batch, batch_size):
+        """Registra dispositivos desde un CSV o NDJSON (device_code, firmware_version, batch)."""
+        from shared.devices import detect_format, parse_device_records, provision_devices
+        fmt = fmt or detect_format(source.name)
+        result = provision_devices(parse_device_records(source, fmt), batch=batch, batch_size=batch_size)
+        print(f"📦 Dispositivos: {result['inserted']} nuevos, {result['duplicates']} duplicados, "
+              f"{result['invalid']} inválidos de {result['received']}")
+
+    @app.cli.command('seed-readings')
+    @click.option('--patients', type=int, default=0, help='Crear este número de pacientes sintéticos')
+    @click.option('--user-id', 'user_ids', type=int, multiple=True, help='Pacientes existentes (repetible)')
+    @click.option('--days', type=float, default=7, help='Días de lecturas hasta ahora')
+    @click.option('--interval', type=float, default=3, help='Segundos entre lecturas')
+    @click.option('--seed', type=int, default=None, help='Semilla para resultados reproducibles')
+    def seed_readings_command(patients, user_ids, days, interval, seed):
+        """Genera lecturas sintéticas realistas y las carga en bloque en sensor_data."""
+        from shared.synthetic import create_patients, seed_readings
+        from shared.fragments import mark_data_changed
+        from shared.live_buffer import get_live_buffer
+
+        ids = list(user_ids)
+        if patients:
+            ids += create_patients(patients, seed=seed)
+            print(f"👥 Pacientes sintéticos creados: {patients}")
+        query = User.query.filter_by(role='user', is_deleted=False)
+        if ids:
+            query = query.filter(User.id.in_(ids))
+        targets = query.order_by(User.id).all()
+        if not targets:
+            print("⚠️ No hay pacientes a los que generar lecturas")
+            return
+
+        result = seed_readings(targets, days=days, interval=interval, seed=seed)
+        changed = [patient.id for patient in targets]
+        mark_data_changed(changed)
+        live_buffer = get_live_buffer()
+        if live_buffer:
+            for user_id in changed:
+                live_buffer.discard(user_id)
+        print(f"💓 Lecturas: {result['rows']:,} de {result['patients']} pacientes "
+              f"({result['alerts']:,} alertas) en {result['elapsed']}s "
+              f"({result['rows_per_second']:,} filas/s)")
+
+    @app.cli.command('build-population')
+    @click.option('--days', type=float, default=30, help='Días de lecturas incluidos')
+    def build_population_command(days):
+        """Reconstruye los histogramas de BPM de la población desde sensor_data."""
+        from shared.population import get_population, rebuild_population
+
+        if get_population() is None:
+            print("⚠️ Histogramas de población no disponibles (POPULATION_SKETCH_PATH)")
+            sys.exit(1)
+        result = rebuild_population(days)
+        print(f"👥 Población: {result['readings']:,} lecturas de {result['patients']} pacientes en "
+              f"{result['elapsed']:.1f}s")
+
+    @app.cli.command('shard-readings')
+    @click.option('--chunk-size', type=int, default=20000, help='Lecturas por bloque')
+    def shard_readings_command(chunk_size):
+        """Mueve las lecturas de la BD principal a sus shards (SENSOR_SHARDS > 1), con la ingesta detenida."""
+        from shared.shards import get_router, distribute_readings
+
+        if get_router() is None:
+            print("⚠️ Reparto desactivado: define SENSOR_SHARDS > 1")
+            sys.exit(1)
+        result = distribute_readings(chunk_size=chunk_size)
+        print(f"🧩 Lecturas movidas: {result['rows']:,} de {result['patients']} pacientes "
+              f"en {result['elapsed']}s (VACUUM en la BD principal para recuperar el espacio)")
+
+    @app.cli.command('jobs')
+    def jobs_command():
+        """Muestra el estado de los trabajos del planificador."""
+        from shared.models import ScheduledJob
+        rows = ScheduledJob.query.order_by(ScheduledJob.interval_seconds.is_(None),
+                                           ScheduledJob.next_run_at.desc()).limit(50).all()
+        for row in rows:
+            last = f"{row.last_outcome} {row.last_duration:.1f}s" if row.last_outcome else 'sin ejecutar'
+            print(f"{row.name:<40} {row.status:<10} próxima {row.next_run_at:%Y-%m-%d %H:%M} UTC  "
+                  f"última: {last}")
+
+    @app.cli.command('run-job')
+    @click.argument('name')
+    @click.option('--payload', default=None, help='Argumentos del trabajo en JSON')
+    def run_job_command(name, payload):
+        """Ejecuta ahora un trabajo del planificador en este proceso y espera a que termine."""
+        import json
+        from shared.scheduler import create_scheduler
+
+        scheduler = create_scheduler(current_app._get_current_object())
+        if name not in scheduler.definitions:
+            print(f"❌ Trabajo desconocido: {name} (disponibles: {', '.join(sorted(scheduler.definitions))})")
+            sys.exit(1)
+        result = scheduler.run_inline(name, json.loads(payload) if payload else None)
+        if result is None:
+            print(f"⚠️ {name} ya se está ejecutando en otro proceso")
+            sys.exit(1)
+        print(f"⏱️ {result.name}: {result.status} en {result.last_duration:.1f}s "
+              f"{result.last_result or result.last_error or ''}")
+        if result.status != 'succeeded':
+            sys.exit(1)
+
+    @app.cli.command('init-db')
+    @click.option('--reset', is_flag=True, help='Borra todas las tablas y sus datos antes de crearlas')
+    @click.option('--yes', is_flag=True, help='No pedir confirmación con --reset')
+    def init_db_command(reset, yes):
+        """Aplica las migraciones pendientes y siembra los datos iniciales que falten."""
+        if reset and not yes:
+            click.confirm('Se borrarán TODOS los datos (usuarios, lecturas, alertas). ¿Continuar?', abort=True)
+        initialize_database(current_app._get_current_object(), reset=reset)
@@ -0,0 +1,171 @@
+# shared/devices.py
+"""
+Registro de dispositivos: la tabla ``devices`` es la fuente de verdad de los
+códigos válidos.
+
+El aprovisionamiento masivo acepta CSV (columna ``device_code`` y opcionales
+``firmware_version`` y ``batch``) o NDJSON (un objeto por línea con las mismas
+claves) y los inserta por lotes con ``ON CONFLICT DO NOTHING``: un código ya
+registrado se cuenta como duplicado sin abortar el resto.
+
+Uso:
+    flask --app admin.app_admin provision-devices pulseras.csv --batch lote-2025-03
+    curl -X POST -H 'Content-Type: application/x-ndjson' --data-binary @pulseras.ndjson \\
+         http://localhost:5000/admin/api/devices/provision
+"""
+import csv
+import io
+import json
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from shared.models import db, Device
+
+DEVICE_CODE_PATTERN = re.compile(r'^[A-Z0-9][A-Z0-9-]{3,49}$')
+FIRMWARE_MAX_LENGTH = 32
+
+# Frecuencia máxima con la que la ingesta actualiza last_seen_at
+LAST_SEEN_INTERVAL = timedelta(seconds=60)
+
+# Último (last_seen_at, firmware) escrito por este proceso para cada código
+_recent_touches = {}
+
+
+def normalize_device_code(code):
+    return (code or '').strip().upper()
+
+
+def find_device(code):
+    """Busca un código en el registro (índice único sobre device_code)."""
+    return Device.query.filter_by(device_code=normalize_device_code(code)).first()
+
+
+def parse_device_records(lines, fmt):
+    """
+    Args:
+        lines (iterable): Líneas de texto del archivo
+        fmt (str): 'csv' o 'ndjson'
+
+    Yields:
+        dict: device_code, firmware_version, batch (sin validar)
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(lines):
+            yield row
+    elif fmt == 'ndjson':
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = {}
+            yield record if isinstance(record, dict) else {}
+    else:
+        raise ValueError(f'Formato no soportado: {fmt}')
+
+
+def detect_format(filename='', content_type=''):
+    if filename.endswith(('.ndjson', '.jsonl')) or 'ndjson' in content_type or 'jsonl' in content_type:
+        return 'ndjson'
+    return 'csv'
+
+
+def provision_devices(records, batch=None, batch_size=1000):
+    """
+    Inserta dispositivos nuevos por lotes. Debe llamarse dentro de un
+    contexto de aplicación.
+
+    Args:
+        records (iterable): Dicts con device_code (o strings con el código)
+        batch (str): Lote por defecto para registros que no traen uno
+        batch_size (int): Filas por INSERT
+
+    Returns:
+        dict: received, inserted, duplicates, invalid
+    """
+    stats = {'received': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0}
+    statement = sqlite_insert(Device.__table__).on_conflict_do_nothing(index_elements=['device_code'])
+    now = datetime.utcnow()
+    pending = []
+    seen = set()
+
+    def flush():
+        if pending:
+            result = db.session.execute(statement, pending)
+            inserted = max(result.rowcount, 0)
+            stats['inserted'] += inserted
+            stats['duplicates'] += len(pending) - inserted
+            pending.clear()
+
+    for record in records:
+        stats['received'] += 1
+        if isinstance(record, str):
+            record = {'device_code': record}
+        code = normalize_device_code(record.get('device_code'))
+        firmware = (record.get('firmware_version') or '').strip() or None
+        if not DEVICE_CODE_PATTERN.match(code) or (firmware and len(firmware) > FIRMWARE_MAX_LENGTH):
+            stats['invalid'] += 1
+            continue
+        if code in seen:
+            stats['duplicates'] += 1
+            continue
+        seen.add(code)
+        pending.append({
+            'device_code': code,
+            'is_used': False,
+            'created_at': now,
+            'firmware_version': firmware,
+            'batch': (record.get('batch') or batch or None)
+        })
+        if len(pending) >= batch_size:
+            flush()
+
+    flush()
+    db.session.commit()
+    return stats
+
+
+def claim_device(code):
+    """
+    Marca el dispositivo como asignado si existe y está libre. Es un UPDATE
+    condicional: dos registros simultáneos no pueden quedarse el mismo.
+
+    Returns:
+        bool: True si se asignó
+    """
+    return Device.query.filter_by(device_code=normalize_device_code(code), is_used=False).update(
+        {'is_used': True, 'assigned_at': datetime.utcnow()}, synchronize_session=False
+    ) == 1
+
+
+def touch_device(code, firmware_version=None, now=None):
+    """
+    Actualiza last_seen_at (como mucho una vez por LAST_SEEN_INTERVAL) y el
+    firmware cuando cambia. No confirma: va en la transacción de la ingesta.
+
+    Si este proceso ya lo escribió dentro del intervalo no lanza el UPDATE:
+    aunque no cambie ninguna fila, en SQLite toma el bloqueo de escritura de
+    la BD principal hasta el commit (con sensor_data repartida, la mayoría de
+    las ingestas no escriben entonces nada en ella).
+    """
+    now = now or datetime.utcnow()
+    code = normalize_device_code(code)
+    if firmware_version:
+        firmware_version = str(firmware_version)[:FIRMWARE_MAX_LENGTH]
+    recent = _recent_touches.get(code)
+    if recent and now - recent[0] < LAST_SEEN_INTERVAL and firmware_version in (None, '', recent[1]):
+        return
+    stale = or_(Device.last_seen_at.is_(None), Device.last_seen_at < now - LAST_SEEN_INTERVAL)
+    changes = {'last_seen_at': now}
+    if firmware_version:
+        stale = or_(stale, Device.firmware_version.is_(None), Device.firmware_version != firmware_version)
+        changes['firmware_version'] = firmware_version
+    Device.query.filter(Device.device_code == code, stale).update(
+        changes, synchronize_session=False
+    )
+    _recent_touches[code] = (now, firmware_version or (recent[1] if recent else None))
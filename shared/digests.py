@@ -0,0 +1,211 @@
+# shared/digests.py
+"""
+Generación por lotes de los resúmenes diarios de salud de cada paciente.
+
+Los usuarios activos se reparten en bloques entre un pool de procesos. Cada
+proceso abre su propia conexión y calcula el resumen con una sola consulta
+agregada por usuario (sobre el índice user_id + timestamp), sin cargar las
+lecturas en Python. El proceso principal guarda los resultados por lotes en
+``health_digests``; las páginas de administración solo leen esa tabla.
+
+Con ``sensor_data`` repartida (shared/shards.py) cada bloque contiene
+pacientes de un solo shard y el proceso lo calcula sobre ese archivo, así que
+los shards se leen en paralelo.
+
+Uso:
+    flask --app admin.app_admin generate-digests --workers 4 --budget 300
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from itertools import zip_longest
+from types import SimpleNamespace
+
+from sqlalchemy import DateTime, bindparam, create_engine, text
+
+from shared.health import classify_status, generate_health_analysis
+
+_STATS_SQL = text("""
+    SELECT COUNT(id) AS total,
+           COALESCE(SUM(CASE WHEN is_alert THEN 1 ELSE 0 END), 0) AS alerts,
+           AVG(bpm) AS avg_bpm,
+           MAX(bpm) AS max_bpm,
+           MIN(bpm) AS min_bpm,
+           MAX(timestamp) AS last_reading,
+           AVG(CASE WHEN timestamp >= :recent_since THEN bpm END) AS recent_avg,
+           AVG(CASE WHEN timestamp < :recent_since THEN bpm END) AS older_avg
+    FROM sensor_data
+    WHERE user_id = :user_id AND timestamp >= :since
+""").bindparams(
+    bindparam('since', type_=DateTime),
+    bindparam('recent_since', type_=DateTime)
+).columns(last_reading=DateTime)
+
+_worker_engines = []
+
+
+def _init_worker(database_uris):
+    global _worker_engines
+    _worker_engines = [create_engine(uri) for uri in database_uris]
+
+
+def compute_digest(connection, user, now, analytics=True):
+    """
+    Calcula el resumen de 7 días de un usuario.
+
+    Args:
+        connection: Conexión SQLAlchemy
+        user (dict): id y heart_condition del usuario
+        now (datetime): Instante de referencia (UTC)
+        analytics (bool): Añadir el análisis de la serie (shared/analytics.py)
+
+    Returns:
+        dict: Columnas de HealthDigest
+    """
+    row = connection.execute(_STATS_SQL, {
+        'user_id': user['id'],
+        'since': now - timedelta(days=7),
+        'recent_since': now - timedelta(days=3)
+    }).mappings().one()
+
+    total = row['total'] or 0
+    alerts = row['alerts'] or 0
+    avg_bpm = row['avg_bpm'] or 0
+    max_bpm = row['max_bpm'] or 0
+    min_bpm = row['min_bpm'] or 0
+    variability = max_bpm - min_bpm if total else 0
+    recent_avg = row['recent_avg'] or 0
+    older_avg = row['older_avg'] or 0
+    trend = "mejorando" if recent_avg < older_avg else "estable" if recent_avg == older_avg else "empeorando"
+
+    series = {}
+    if analytics and total:
+        from shared.analytics import analyze_series, load_series
+        series = analyze_series(*load_series(connection, user['id'], now - timedelta(days=7)))
+
+    alert_percentage = (alerts / total * 100) if total > 0 else 0
+    status, status_class = classify_status(total, alerts)
+    messages, tips = generate_health_analysis(
+        [], SimpleNamespace(heart_condition=user['heart_condition']),
+        alert_percentage, avg_bpm, variability=variability, analytics=series
+    )
+
+    return {
+        **series,
+        'user_id': user['id'],
+        'total_readings': total,
+        'alert_readings': alerts,
+        'avg_bpm': round(avg_bpm, 1),
+        'max_bpm': max_bpm,
+        'min_bpm': min_bpm,
+        'variability': variability,
+        'trend': trend,
+        'last_reading_at': row['last_reading'],
+        'status': status,
+        'status_class': status_class,
+        'messages': json.dumps(messages, ensure_ascii=False),
+        'tips': json.dumps(tips, ensure_ascii=False)
+    }
+
+
+def _digest_chunk(users, now, analytics, shard=0):
+    with _worker_engines[shard].connect() as connection:
+        return [compute_digest(connection, user, now, analytics) for user in users]
+
+
+def _store_digests(digests, digest_date, generated_at):
+    from shared.models import db, HealthDigest
+    from shared.fragments import mark_data_changed
+
+    user_ids = [d['user_id'] for d in digests]
+    HealthDigest.query.filter(
+        HealthDigest.digest_date == digest_date,
+        HealthDigest.user_id.in_(user_ids)
+    ).delete(synchronize_session=False)
+    db.session.execute(
+        HealthDigest.__table__.insert(),
+        [dict(d, digest_date=digest_date, generated_at=generated_at) for d in digests]
+    )
+    db.session.commit()
+    # El listado de reportes usa los resúmenes
+    mark_data_changed()
+
+
+def run_digest_batch(database_uri, workers=None, chunk_size=200, time_budget=None, now=None, analytics=True,
+                     mp_context=None, shard_uris=None):
+    """
+    Genera los resúmenes de todos los pacientes activos. Debe llamarse dentro
+    de un contexto de aplicación.
+
+    Args:
+        database_uri (str): URI de la BD (cada proceso abre su propio engine)
+        workers (int): Procesos del pool (por defecto, núcleos disponibles)
+        chunk_size (int): Usuarios por tarea
+        time_budget (float): Segundos máximos; al agotarse no se reparten más bloques
+        now (datetime): Instante de referencia (UTC)
+        analytics (bool): Calcular también el análisis de la serie
+        mp_context: Contexto de multiprocessing del pool (por defecto, el del sistema)
+        shard_uris (list): URIs de los shards de sensor_data (shared.shards.shard_urls)
+
+    Returns:
+        dict: users, stored, elapsed, throughput (usuarios/s), complete
+    """
+    from shared.models import User
+    from shared.shards import shard_index
+
+    now = now or datetime.utcnow()
+    started = time.monotonic()
+    deadline = started + time_budget if time_budget else None
+
+    users = [
+        {'id': user_id, 'heart_condition': heart_condition}
+        for user_id, heart_condition in User.query.with_entities(User.id, User.heart_condition)
+        .filter_by(role='user', is_active=True, is_deleted=False)
+        .order_by(User.id)
+    ]
+    database_uris = list(shard_uris) if shard_uris else [database_uri]
+    shards = {}
+    for user in users:
+        shards.setdefault(shard_index(user['id'], len(database_uris)), []).append(user)
+    # Bloques alternando shards: los procesos leen archivos distintos a la vez
+    per_shard = [[(shard, group[i:i + chunk_size]) for i in range(0, len(group), chunk_size)]
+                 for shard, group in sorted(shards.items())]
+    chunks = [chunk for round_ in zip_longest(*per_shard) for chunk in round_ if chunk]
+    workers = workers or os.cpu_count() or 1
+
+    stored = 0
+    complete = True
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                             initargs=(database_uris,)) as pool:
+        # Como mucho 2 bloques en vuelo por proceso: así el presupuesto de
+        # tiempo corta el reparto sin dejar cientos de tareas encoladas
+        pending = set()
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            out_of_time = deadline is not None and time.monotonic() > deadline
+            while not out_of_time and next_chunk < len(chunks) and len(pending) < workers * 2:
+                shard, chunk = chunks[next_chunk]
+                pending.add(pool.submit(_digest_chunk, chunk, now, analytics, shard))
+                next_chunk += 1
+            if out_of_time and next_chunk < len(chunks):
+                complete = False
+                next_chunk = len(chunks)
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                digests = future.result()
+                if digests:
+                    _store_digests(digests, now.date(), now)
+                    stored += len(digests)
+
+    elapsed = time.monotonic() - started
+    return {
+        'users': len(users),
+        'stored': stored,
+        'elapsed': round(elapsed, 2),
+        'throughput': round(stored / elapsed, 1) if elapsed > 0 else 0,
+        'complete': complete and stored == len(users)
+    }
@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, FloatField, IntegerField, SelectField, SubmitField
-from wtforms.validators import DataRequired, Length, NumberRange, Optional
+from wtforms.validators import DataRequired, Email, Length, NumberRange, Optional
 
 class LoginForm(FlaskForm):
     username = StringField('Usuario', validators=[DataRequired(), Length(min=3, max=80)])
@@ -34,4 +34,6 @@ class MedicalDataForm(FlaskForm):
     height = FloatField('Altura (m)', validators=[DataRequired(), NumberRange(min=0.5, max=2.5)])
     age = IntegerField('Edad', validators=[DataRequired(), NumberRange(min=1, max=120)])
     heart_condition = SelectField('Condición Cardíaca', validators=[Optional()])
+    caregiver_email = StringField('Email del Cuidador (notificaciones de alerta)',
+                                  validators=[Optional(), Email(), Length(max=120)])
     submit = SubmitField('Guardar Datos Médicos')
\ No newline at end of file
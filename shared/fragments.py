@@ -0,0 +1,204 @@
+# shared/fragments.py
+"""
+Caché de fragmentos renderizados de las páginas de reportes.
+
+Se guardan los bloques ``content`` y ``scripts`` ya renderizados de la
+plantilla; en una visita repetida no se consulta la BD ni se vuelve a
+renderizar la tabla, solo el esqueleto de base.html (menú, mensajes flash).
+
+Cada entrada se valida contra la versión de datos de los usuarios que
+muestra: un contador por usuario en memoria compartida (mismo formato que las
+versiones de cuenta, ver shared/identity.py) que se incrementa al confirmar
+lecturas nuevas o borradas y cambios del perfil. El proceso de usuario ve así
+al instante las lecturas que ingiere el admin.
+
+El slot 0 es la versión global (ningún usuario tiene id 0; los ids múltiplos
+de ``slots`` comparten ese slot, lo que solo provoca recargas de más) y la
+usan las páginas que agregan a todos. Cambia con los usuarios (altas, bajas,
+perfiles) y las escrituras masivas, no con cada lectura ingerida: con un
+sensor enviando cada pocos segundos nunca se acertaría. Esas páginas añaden a
+su clave un tramo de FRAGMENT_GLOBAL_WINDOW segundos (``time_bucket``), que
+acota lo desfasados que pueden quedar sus agregados de lecturas.
+
+Uso en una vista:
+    return render_cached_page('admin/user_detailed_report.html', key=user.id,
+                              user_ids=[user.id], build=lambda: contexto(user))
+"""
+import time
+
+from flask import current_app, render_template
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from shared.cache import TTLCache
+from shared.identity import AccountVersions
+
+GLOBAL_VERSION = 0
+FRAGMENT_BLOCKS = ('content', 'scripts')
+
+_SESSION_KEY = 'fragment_changed_ids'
+_USERS_KEY = 'fragment_users_changed'
+
+
+def render_blocks(template_name, context):
+    """Renderiza solo los bloques de la plantilla (sin la plantilla base)."""
+    template = current_app.jinja_env.get_template(template_name)
+    current_app.update_template_context(context)
+    template_context = template.new_context(context)
+    return {name: Markup(''.join(template.blocks[name](template_context)))
+            for name in FRAGMENT_BLOCKS if name in template.blocks}
+
+
+def _fragment_size(entry):
+    return sum(len(html) for html in entry[1].values())
+
+
+class FragmentCache:
+    """
+    Args:
+        versions (AccountVersions): Versiones de datos compartidas
+        maxsize (int): Fragmentos retenidos por proceso
+        ttl (float): Segundos máximos de vida de una entrada
+        max_bytes (int): Tamaño total de los fragmentos (se expulsan los menos usados)
+    """
+
+    def __init__(self, versions, maxsize=256, ttl=300, max_bytes=64 * 1024 * 1024):
+        self.versions = versions
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, max_weight=max_bytes, weigher=_fragment_size)
+
+    def stamp(self, user_ids):
+        return tuple(self.versions.stamp(user_id) for user_id in user_ids)
+
+    def blocks(self, template_name, key, user_ids, build):
+        """
+        Bloques renderizados de ``template_name``; ``build()`` (consultas y
+        contexto) solo se llama si la entrada falta o quedó obsoleta.
+        """
+        # La versión se lee antes de consultar (igual que la caché de identidad)
+        stamp = self.stamp(user_ids)
+        cache_key = (template_name, key)
+        entry = self.cache.get(cache_key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+
+        blocks = render_blocks(template_name, build())
+        self.cache.set(cache_key, (stamp, blocks))
+        return blocks
+
+    def mark_changed(self, user_ids, global_change=True):
+        self.versions.bump(list(user_ids) + ([GLOBAL_VERSION] if global_change else []))
+
+
+_fragment_cache = None
+
+
+def init_fragment_cache(app):
+    """
+    Returns:
+        FragmentCache | None: None si el archivo de versiones no está disponible
+    """
+    global _fragment_cache
+    path = app.config.get('FRAGMENT_VERSIONS_PATH')
+    if not path:
+        return None
+    try:
+        versions = AccountVersions(path, slots=app.config.get('FRAGMENT_VERSIONS_SLOTS', 65536))
+    except OSError as e:
+        print(f"⚠️ Caché de fragmentos no disponible: {e}")
+        return None
+    _fragment_cache = FragmentCache(versions,
+                                    maxsize=app.config.get('FRAGMENT_CACHE_SIZE', 256),
+                                    ttl=app.config.get('FRAGMENT_CACHE_TTL', 300),
+                                    max_bytes=app.config.get('FRAGMENT_CACHE_BYTES', 64 * 1024 * 1024))
+    _track_changes()
+    return _fragment_cache
+
+
+def get_fragment_cache():
+    return _fragment_cache
+
+
+def release_fragment_cache():
+    """Cierra el archivo de versiones del proceso (antes de reabrirlo tras un fork)."""
+    global _fragment_cache
+    if _fragment_cache is not None:
+        _fragment_cache.versions.close()
+        _fragment_cache = None
+
+
+def reset_fragments():
+    if _fragment_cache is not None:
+        _fragment_cache.cache.clear()
+        _fragment_cache.versions.reset()
+
+
+def render_cached_page(template_name, key, user_ids, build):
+    """
+    Args:
+        template_name (str): Plantilla que extiende base.html
+        key: Parámetros de la página (filtros, quién la ve) además de la plantilla
+        user_ids (list): Usuarios cuyos datos muestra; [GLOBAL_VERSION] para todos
+        build (callable): Retorna el contexto de la plantilla
+    """
+    if _fragment_cache is None:
+        return render_template(template_name, **build())
+    blocks = _fragment_cache.blocks(template_name, key, user_ids, build)
+    return render_template('_fragment_page.html', fragment=blocks)
+
+
+def mark_data_changed(user_ids=()):
+    """
+    Para escrituras que no pasan por la sesión ORM (DELETE/INSERT masivos,
+    lote de resúmenes). Cambia siempre la versión global; sin usuarios, solo esa.
+    """
+    if _fragment_cache is not None:
+        _fragment_cache.mark_changed(user_ids)
+
+
+def time_bucket(seconds=None):
+    """Tramo de tiempo actual, para la clave de las páginas con la versión global."""
+    seconds = seconds or current_app.config.get('FRAGMENT_GLOBAL_WINDOW', 60)
+    return int(time.time() // max(1, seconds))
+
+
+_tracking = False
+
+
+def _track_changes():
+    global _tracking
+    if _tracking:
+        return
+    _tracking = True
+
+    from shared.models import User, SensorData
+
+    @event.listens_for(Session, 'after_flush')
+    def collect_changed_data(session, flush_context):
+        # En after_flush los objetos nuevos ya tienen id
+        changed = set()
+        users_changed = False
+        dirty = [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+        for obj in list(session.new) + dirty + list(session.deleted):
+            if isinstance(obj, User):
+                changed.add(obj.id)
+                users_changed = True
+            elif isinstance(obj, SensorData):
+                changed.add(obj.user_id)
+        if changed:
+            session.info.setdefault(_SESSION_KEY, set()).update(changed)
+        if users_changed:
+            session.info[_USERS_KEY] = True
+
+    @event.listens_for(Session, 'after_commit')
+    def bump_changed_data(session):
+        changed = session.info.pop(_SESSION_KEY, None)
+        # Las lecturas solo cambian la versión de su usuario
+        global_change = session.info.pop(_USERS_KEY, False)
+        if changed and _fragment_cache is not None:
+            _fragment_cache.mark_changed(changed, global_change=global_change)
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def forget_changed_data(session, previous_transaction):
+        session.info.pop(_SESSION_KEY, None)
+        session.info.pop(_USERS_KEY, None)
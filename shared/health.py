@@ -0,0 +1,113 @@
+# shared/health.py
+"""
+Análisis de salud compartido por los reportes del usuario, los reportes de
+administración y los resúmenes diarios (shared/digests.py).
+"""
+
+def classify_status(total_readings, alert_readings):
+    """
+    Estado general según la proporción de alertas.
+    
+    Returns:
+        tuple: (texto del estado, clase CSS de Bootstrap)
+    """
+    if total_readings == 0:
+        return "Sin datos", "secondary"
+    elif alert_readings / total_readings < 0.1:
+        return "Excelente", "success"
+    elif alert_readings / total_readings < 0.3:
+        return "Estable", "warning"
+    else:
+        return "Necesita atención", "danger"
+
+def generate_health_analysis(recent_data, user, alert_percentage, avg_bpm, variability=None, analytics=None):
+    """
+    Mensajes y consejos del reporte de salud.
+    
+    Args:
+        recent_data (list): Lecturas del periodo (solo se usa su .bpm)
+        user: Objeto con ``heart_condition`` (modelo User o fila)
+        alert_percentage (float): Porcentaje de lecturas en alerta
+        avg_bpm (float): BPM promedio del periodo
+        variability (int): max - min ya calculado (p.ej. por SQL); si es None
+            se calcula a partir de recent_data
+        analytics (dict): Resultado de shared.analytics.analyze_series (opcional)
+    
+    Returns:
+        tuple: (messages, tips)
+    """
+    messages = []
+    tips = []
+    
+    if alert_percentage < 10:
+        messages.append("🎉 ¡Excelente! Tu ritmo cardíaco se mantiene muy estable.")
+        tips.append("Continúa con tus buenos hábitos de salud.")
+    elif alert_percentage < 30:
+        messages.append("👍 Buen trabajo, tu ritmo cardíaco es mayormente estable.")
+        tips.append("Mantén un estilo de vida saludable y monitorea regularmente.")
+    else:
+        messages.append("⚠️ Se han detectado varias anomalías. Es importante prestar atención.")
+        tips.append("Considera consultar con un especialista para una evaluación completa.")
+    
+    if user.heart_condition:
+        if user.heart_condition == 'taquicardia':
+            if avg_bpm > 100:
+                messages.append("🔴 Se detectan valores consistentemente altos. Recomendamos:")
+                tips.extend([
+                    "Evita el consumo de cafeína y estimulantes",
+                    "Practica técnicas de relajación y respiración",
+                    "Mantén una hidratación adecuada"
+                ])
+            else:
+                messages.append("💚 Buen control de la taquicardia")
+                tips.append("Sigue las recomendaciones de tu cardiólogo")
+                
+        elif user.heart_condition == 'bradicardia':
+            if avg_bpm < 50:
+                messages.append("🔵 Se detectan valores consistentemente bajos. Recomendamos:")
+                tips.extend([
+                    "Realiza actividad física moderada regularmente",
+                    "Mantén una alimentación balanceada",
+                    "Consulta sobre posibles ajustes medicamentosos"
+                ])
+            else:
+                messages.append("💚 Buen control de la bradicardia")
+                tips.append("Continúa con tu seguimiento médico regular")
+                
+        elif user.heart_condition == 'arritmia':
+            if variability is None:
+                bpms = [d.bpm for d in recent_data]
+                variability = max(bpms) - min(bpms) if bpms else 0
+            
+            if variability > 50:
+                messages.append("🔄 Alta variabilidad detectada. Recomendamos:")
+                tips.extend([
+                    "Evita situaciones de estrés intenso",
+                    "Mantén un horario regular de sueño",
+                    "Registra los episodios para compartir con tu médico"
+                ])
+            else:
+                messages.append("💚 Buena estabilidad del ritmo cardíaco")
+                tips.append("Sigue tomando tus medicamentos según indicación")
+                
+        elif user.heart_condition == 'hipertension':
+            messages.append("🩺 Para tu condición de hipertensión:")
+            tips.extend([
+                "Controla tu consumo de sal",
+                "Realiza ejercicio aeróbico regular",
+                "Mide tu presión arterial regularmente"
+            ])
+    
+    if analytics and analytics.get('anomaly_count'):
+        messages.append(f"📈 Se detectaron {analytics['anomaly_count']} cambios bruscos "
+                        f"respecto a tu ritmo de los minutos anteriores.")
+        tips.append("Anota qué estabas haciendo en esos momentos para comentarlo con tu médico")
+    if analytics and analytics.get('resting_bpm') and analytics['resting_bpm'] > 90:
+        tips.append("💡 Tu pulso en reposo es alto: consúltalo en tu próxima revisión")
+    
+    if avg_bpm > 90:
+        tips.append("💡 Considera incorporar meditación o yoga para reducir el estrés")
+    elif avg_bpm < 55:
+        tips.append("💡 La actividad física moderada puede ayudar a aumentar tu ritmo cardíaco en reposo")
+    
+    return messages, tips
@@ -0,0 +1,208 @@
+# shared/identity.py
+"""
+Caché de identidad para ``load_user``.
+
+Flask-Login carga el usuario en cada petición autenticada (incluidos los
+sondeos de monitoreo cada 3 s). Aquí se guardan las columnas de cada usuario
+en una caché en memoria con TTL corto, validada contra un contador de versión
+por cuenta en memoria compartida: cualquier commit que modifique o borre un
+User incrementa su contador, de modo que desactivaciones, cambios de rol y
+de contraseña se ven al instante en todos los procesos (admin y user).
+
+Estructura del archivo de versiones:
+    cabecera:  magic(4s) version(I) slots(I) epoch(I)
+    slot:      versión(I) por ``user_id % slots``
+
+Dos usuarios que comparten slot solo provocan recargas de más, nunca datos
+obsoletos. ``epoch`` cambia al reinicializar la BD (los ids se reutilizan).
+"""
+import struct
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from shared.cache import TTLCache
+from shared.shm import SharedMapping
+
+MAGIC = b'HTAV'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<4sIII')
+_COUNTER = struct.Struct('<I')
+
+_SESSION_KEY = 'identity_changed_ids'
+
+
+class AccountVersions:
+    """
+    Args:
+        path (str): Archivo mapeado (volumen compartido)
+        slots (int): Contadores disponibles
+    """
+
+    def __init__(self, path, slots=65536):
+        self.slots = slots
+        self._map = SharedMapping(path, _HEADER.size + slots * _COUNTER.size,
+                                  initializer=self._write_header,
+                                  is_valid=self._header_matches)
+
+    def _write_header(self, buf):
+        _HEADER.pack_into(buf, 0, MAGIC, FORMAT_VERSION, self.slots, 0)
+
+    def _header_matches(self, buf):
+        return _HEADER.unpack_from(buf, 0)[:3] == (MAGIC, FORMAT_VERSION, self.slots)
+
+    def _offset(self, user_id):
+        return _HEADER.size + (user_id % self.slots) * _COUNTER.size
+
+    def stamp(self, user_id):
+        """(epoch, versión) actual de la cuenta. Lectura sin bloqueo (4 bytes alineados)."""
+        buf = self._map.buf
+        return _HEADER.unpack_from(buf, 0)[3], _COUNTER.unpack_from(buf, self._offset(user_id))[0]
+
+    def bump(self, user_ids):
+        with self._map.locked() as buf:
+            for user_id in set(user_ids):
+                offset = self._offset(user_id)
+                _COUNTER.pack_into(buf, offset, (_COUNTER.unpack_from(buf, offset)[0] + 1) & 0xFFFFFFFF)
+
+    def close(self):
+        self._map.close()
+
+    def reset(self):
+        """Nueva época: invalida todas las identidades cacheadas."""
+        with self._map.locked() as buf:
+            epoch = _HEADER.unpack_from(buf, 0)[3]
+            buf[_HEADER.size:] = bytes(len(buf) - _HEADER.size)
+            _HEADER.pack_into(buf, 0, MAGIC, FORMAT_VERSION, self.slots, (epoch + 1) & 0xFFFFFFFF)
+
+
+class IdentityCache:
+    """
+    Args:
+        model: Clase User
+        session: Sesión (scoped) donde se adjuntan los usuarios
+        versions (AccountVersions): Contadores compartidos
+        ttl (float): Segundos máximos de vida de una entrada
+        maxsize (int): Usuarios retenidos por proceso
+    """
+
+    def __init__(self, model, session, versions, ttl=30, maxsize=4096):
+        self.model = model
+        self.session = session
+        self.versions = versions
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._columns = [column.key for column in model.__mapper__.column_attrs]
+
+    def load(self, user_id):
+        stamp = self.versions.stamp(user_id)
+        entry = self.cache.get(user_id)
+        if entry is not None and entry[0] == stamp:
+            return self._attach(entry[1])
+
+        # La versión se lee antes de consultar: si otro proceso confirma un
+        # cambio entre medias, la próxima petición verá otra versión y recargará
+        user = self.session.get(self.model, user_id)
+        if user is None:
+            self.cache.delete(user_id)
+            return None
+        self.cache.set(user_id, (stamp, {key: getattr(user, key) for key in self._columns}))
+        return user
+
+    def _attach(self, values):
+        user = self.model()
+        for key, value in values.items():
+            set_committed_value(user, key, value)
+        make_transient_to_detached(user)
+        # load=False: se adjunta como persistente sin SELECT
+        return self.session.merge(user, load=False)
+
+    def invalidate(self, user_ids):
+        for user_id in user_ids:
+            self.cache.delete(user_id)
+        self.versions.bump(user_ids)
+
+
+_identity_cache = None
+
+
+def init_identity_cache(app, db, model):
+    """
+    Activa la caché para la app y registra el seguimiento de cambios de User.
+
+    Returns:
+        IdentityCache | None: None si el archivo de versiones no está disponible
+    """
+    global _identity_cache
+    path = app.config.get('IDENTITY_VERSIONS_PATH')
+    if not path:
+        return None
+    try:
+        versions = AccountVersions(path, slots=app.config.get('IDENTITY_VERSIONS_SLOTS', 65536))
+    except OSError as e:
+        print(f"⚠️ Caché de identidad no disponible: {e}")
+        return None
+    _identity_cache = IdentityCache(model, db.session, versions,
+                                    ttl=app.config.get('IDENTITY_CACHE_TTL', 30))
+    _track_changes(model)
+    return _identity_cache
+
+
+def get_identity_cache():
+    return _identity_cache
+
+
+def load_identity(model, user_id):
+    """Para ``user_loader``: usa la caché si está activa y si no consulta la BD."""
+    if _identity_cache is None:
+        return model.query.get(user_id)
+    return _identity_cache.load(user_id)
+
+
+def mark_identities_changed(user_ids):
+    """Para DELETE/UPDATE masivos de User, que no pasan por los eventos de la sesión."""
+    if _identity_cache is not None and user_ids:
+        _identity_cache.invalidate(user_ids)
+
+
+def release_identity_cache():
+    """Cierra el archivo de versiones del proceso (antes de reabrirlo tras un fork)."""
+    global _identity_cache
+    if _identity_cache is not None:
+        _identity_cache.versions.close()
+        _identity_cache = None
+
+
+def reset_identities():
+    if _identity_cache is not None:
+        _identity_cache.cache.clear()
+        _identity_cache.versions.reset()
+
+
+_tracking = False
+
+
+def _track_changes(model):
+    global _tracking
+    if _tracking:
+        return
+    _tracking = True
+
+    @event.listens_for(Session, 'before_flush')
+    def collect_changed_users(session, flush_context, instances):
+        changed = [obj.id for obj in session.dirty
+                   if isinstance(obj, model) and session.is_modified(obj, include_collections=False)]
+        changed += [obj.id for obj in session.deleted if isinstance(obj, model)]
+        if changed:
+            session.info.setdefault(_SESSION_KEY, set()).update(changed)
+
+    @event.listens_for(Session, 'after_commit')
+    def bump_changed_users(session):
+        changed = session.info.pop(_SESSION_KEY, None)
+        if changed and _identity_cache is not None:
+            _identity_cache.invalidate(changed)
+
+    @event.listens_for(Session, 'after_soft_rollback')
+    def forget_changed_users(session, previous_transaction):
+        session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,94 @@
+# shared/jobs.py
+"""
+Trabajos de mantenimiento y análisis del planificador (shared/scheduler.py).
+
+    generate-digests      cada día   resúmenes de salud (admin/combinado)
+    build-population      cada día   histogramas de la población (admin/combinado)
+    purge-notifications   cada 6 h   outbox enviada o fallida antigua (admin/combinado)
+    close-stale-episodes  cada 5 min episodios de dispositivos que dejaron de enviar (admin/combinado)
+    prune-jobs            cada día   historial de trabajos puntuales (ambas apps)
+    prune-reports         cada día   reportes descargables sin usar (admin/combinado)
+    patient-report        puntual    reporte descargable de un paciente (shared/reports.py)
+
+Los periódicos se pueden adelantar desde /admin/jobs y cualquiera se lanza con
+``flask run-job``.
+"""
+import multiprocessing
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from shared.models import db, NotificationOutbox, ScheduledJob
+from shared.scheduler import job
+
+ADMIN_ROLES = ('admin', 'combined')
+
+
+@job('generate-digests', every=timedelta(days=1), roles=ADMIN_ROLES)
+def generate_digests(analytics=True, time_budget=None):
+    """Resúmenes diarios de salud de todos los pacientes activos."""
+    from shared.digests import run_digest_batch
+    from shared.shards import shard_urls
+    # 'spawn': el proceso web tiene hilos y un fork podría heredar locks tomados por ellos
+    return run_digest_batch(current_app.config['SQLALCHEMY_DATABASE_URI'],
+                            workers=current_app.config.get('SCHEDULER_DIGEST_WORKERS', 2),
+                            time_budget=time_budget, analytics=analytics,
+                            mp_context=multiprocessing.get_context('spawn'), shard_uris=shard_urls())
+
+
+@job('build-population', every=timedelta(days=1), roles=ADMIN_ROLES)
+def build_population(days=30):
+    """Reconstruye los histogramas de BPM de la población."""
+    from shared.population import rebuild_population
+    return rebuild_population(days)
+
+
+@job('purge-notifications', every=timedelta(hours=6), roles=ADMIN_ROLES)
+def purge_notifications(days=30):
+    """Borra de la outbox las notificaciones enviadas o fallidas hace más de ``days`` días."""
+    deleted = NotificationOutbox.query.filter(
+        NotificationOutbox.status.in_(('sent', 'failed')),
+        NotificationOutbox.updated_at < datetime.utcnow() - timedelta(days=days)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return {'deleted': deleted}
+
+
+@job('close-stale-episodes', every=timedelta(minutes=5), roles=ADMIN_ROLES)
+def close_stale_episodes():
+    """Cierra los episodios abiertos sin lecturas desde hace más del hueco máximo del motor."""
+    from shared import metrics
+    from shared.alert_rules import alert_engine, close_stale_episodes as close_episodes
+    closed = close_episodes(alert_engine.max_gap)
+    db.session.commit()
+    for rule, _ in closed:
+        metrics.alert_episodes.inc(rule, 'closed')
+    return {'closed': len(closed)}
+
+
+@job('prune-jobs', every=timedelta(days=1))
+def prune_jobs(days=7):
+    """Borra los trabajos puntuales terminados hace más de ``days`` días."""
+    deleted = ScheduledJob.query.filter(
+        ScheduledJob.interval_seconds.is_(None),
+        ScheduledJob.status.in_(('succeeded', 'failed')),
+        ScheduledJob.last_finished_at < datetime.utcnow() - timedelta(days=days)
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return {'deleted': deleted}
+
+
+@job('prune-reports', every=timedelta(days=1), roles=ADMIN_ROLES)
+def prune_reports(days=None):
+    """Borra los reportes descargables que nadie ha pedido en ``days`` días."""
+    from shared.reports import get_store
+    removed, freed = get_store().prune(days or current_app.config.get('REPORT_RETENTION_DAYS', 7))
+    return {'removed': removed, 'freed_bytes': freed}
+
+
+# Hasta 2 reportes a la vez entre todos los procesos: son consultas largas sobre sensor_data
+@job('patient-report', roles=ADMIN_ROLES, concurrency=2, max_attempts=2)
+def patient_report(user_id, start, end):
+    """Reporte descargable de un paciente en un rango de fechas."""
+    from shared.reports import generate_report
+    return generate_report(user_id, start, end)
@@ -0,0 +1,71 @@
+# shared/lifecycle.py
+"""
+Ciclo de vida de los procesos worker en producción (gunicorn con la app
+precargada en el proceso maestro).
+
+Tras el fork cada worker necesita sus propios recursos: las conexiones del
+pool de SQLAlchemy, los hilos de los pools y los descriptores de los archivos
+mapeados (flock se comparte entre procesos que heredan el mismo descriptor,
+así que hay que reabrirlos para que el bloqueo funcione entre workers).
+
+Al recibir SIGTERM gunicorn deja de aceptar conexiones, espera a que terminen
+las peticiones en curso (incluidas las ingestas, que confirman en la misma
+petición) y luego llama a ``shutdown_worker``, que envía las notificaciones
+encoladas por esas últimas lecturas antes de salir. Los trabajos del
+planificador en curso tienen unos segundos para terminar; si no, liberan su
+arrendamiento y otro worker los repite.
+"""
+
+
+def init_worker(app):
+    """Se llama en cada worker justo después del fork."""
+    from shared.models import db, User
+    from shared.passwords import configure_password_hasher
+    from shared.identity import init_identity_cache, release_identity_cache
+    from shared.live_buffer import release_live_buffer
+    from shared.fragments import init_fragment_cache, release_fragment_cache
+    from shared.scheduler import start_scheduler
+    from shared.shards import release_shards
+
+    with app.app_context():
+        # Las conexiones abiertas en el maestro no se deben usar en el hijo
+        db.engine.dispose(close=False)
+    release_shards(close=False)
+
+    configure_password_hasher(app.config)
+    release_identity_cache()
+    init_identity_cache(app, db, User)
+    release_fragment_cache()
+    init_fragment_cache(app)
+    release_live_buffer()
+
+    if app.config.get('APP_ROLE') in ('admin', 'combined'):
+        from shared.notifications import start_notification_dispatcher
+        from shared.population import init_population, release_population
+        release_population()
+        init_population(app)
+        start_notification_dispatcher(app)
+
+    # Cada worker reclama trabajos por su cuenta: los arrendamientos en la BD
+    # evitan que dos procesos ejecuten el mismo
+    start_scheduler(app)
+
+
+def shutdown_worker(app):
+    """Libera los recursos del proceso; se llama al terminar cada worker."""
+    from shared.models import db
+    from shared.notifications import stop_notification_dispatcher
+    from shared.scheduler import stop_scheduler
+    from shared.shards import release_shards
+    from shared import passwords
+    from shared.metrics import registry
+
+    stop_scheduler()
+    stop_notification_dispatcher(drain=True)
+    registry.flush(force=True)  # Sus contadores siguen sumando en /metrics
+    passwords.password_hasher.shutdown()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    release_shards()
+    print("👋 Worker detenido ordenadamente")
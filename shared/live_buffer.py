@@ -0,0 +1,258 @@
+# shared/live_buffer.py
+"""
+Buffer circular de lecturas recientes en memoria compartida.
+
+La ingesta (proceso admin) escribe cada lectura en el slot del usuario y las
+vistas en vivo (proceso user y admin) leen desde aquí sin tocar SQLite.
+Si el usuario no tiene slot (reinicio, borrado, desalojo) el lector recibe
+``None`` y debe consultar la base de datos.
+
+Cada usuario puede ocupar uno de PROBES slots consecutivos a partir de
+``user_id % slots`` (sondeo lineal), así que dos pacientes activos con el
+mismo resto no se desalojan entre sí. Si los PROBES están ocupados por otros
+se desaloja el que lleva más tiempo sin lecturas (métrica
+``live_buffer_evictions_total``): el buffer retiene como mucho ``slots``
+pacientes y, cerca de ese límite, conviene subir LIVE_BUFFER_SLOTS.
+
+Estructura del archivo:
+    cabecera:  magic(4s) version(I) slots(I) capacity(I)
+    slot:      seq(I) user_id(i) head(I) count(I) + capacity * entrada
+    entrada:   timestamp(d) bpm(H) is_alert(B) pad(x)
+"""
+import struct
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from shared.shm import SharedMapping
+
+MAGIC = b'HTLB'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<4sIII')
+_SLOT_HEADER = struct.Struct('<IiII')
+_ENTRY = struct.Struct('<dHBx')
+
+_EPOCH = datetime(1970, 1, 1)
+
+PROBES = 4
+
+LiveReading = namedtuple('LiveReading', ['timestamp', 'bpm', 'is_alert'])
+
+
+def _to_epoch(dt):
+    return (dt - _EPOCH).total_seconds()
+
+
+def _from_epoch(seconds):
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+class LiveReadingBuffer:
+    """
+    Ring buffer de tamaño fijo por dispositivo/usuario.
+
+    Args:
+        path (str): Archivo mapeado (debe estar en un volumen compartido)
+        slots (int): Número de slots; el usuario ocupa uno de los PROBES a partir de ``user_id % slots``
+        capacity (int): Lecturas retenidas por usuario
+    """
+
+    def __init__(self, path, slots=4096, capacity=256):
+        self.slots = slots
+        self.capacity = capacity
+        self.slot_size = _SLOT_HEADER.size + capacity * _ENTRY.size
+        size = _HEADER.size + slots * self.slot_size
+        self._map = SharedMapping(path, size,
+                                  initializer=self._write_header,
+                                  is_valid=self._header_matches)
+
+    # ---------- cabecera ----------
+
+    def _write_header(self, buf):
+        _HEADER.pack_into(buf, 0, MAGIC, FORMAT_VERSION, self.slots, self.capacity)
+
+    def _header_matches(self, buf):
+        return _HEADER.unpack_from(buf, 0) == (MAGIC, FORMAT_VERSION, self.slots, self.capacity)
+
+    def _candidates(self, user_id):
+        """Offsets de los slots que puede ocupar el usuario, en orden de sondeo."""
+        return [_HEADER.size + ((user_id + i) % self.slots) * self.slot_size
+                for i in range(min(PROBES, self.slots))]
+
+    def _owned(self, buf, user_id):
+        for base in self._candidates(user_id):
+            if _SLOT_HEADER.unpack_from(buf, base)[1] == user_id:
+                return base
+        return None
+
+    def _last_timestamp(self, buf, base):
+        _, _, head, count = _SLOT_HEADER.unpack_from(buf, base)
+        offset = base + _SLOT_HEADER.size + ((head - 1) % self.capacity) * _ENTRY.size
+        return _ENTRY.unpack_from(buf, offset)[0] if count else 0.0
+
+    def _claim(self, buf, user_id):
+        """
+        Slot para el usuario: el suyo, uno libre o el menos reciente de los demás.
+
+        Returns:
+            tuple: (offset, id del usuario desalojado o 0)
+        """
+        candidates = self._candidates(user_id)
+        base = self._owned(buf, user_id)
+        if base is not None:
+            return base, 0
+        for base in candidates:
+            _, owner, _, count = _SLOT_HEADER.unpack_from(buf, base)
+            if owner == 0 or count == 0:
+                return base, 0
+        base = min(candidates, key=lambda candidate: self._last_timestamp(buf, candidate))
+        return base, _SLOT_HEADER.unpack_from(buf, base)[1]
+
+    # ---------- escritura (solo ingesta) ----------
+
+    def _write_entry(self, buf, base, index, timestamp, bpm, is_alert):
+        offset = base + _SLOT_HEADER.size + index * _ENTRY.size
+        _ENTRY.pack_into(buf, offset, _to_epoch(timestamp), bpm, 1 if is_alert else 0)
+
+    def seed(self, user_id, readings):
+        """
+        Reclama un slot para el usuario y lo carga con lecturas de la BD.
+
+        Args:
+            user_id (int): ID del usuario
+            readings (list): Tuplas (timestamp, bpm, is_alert) en orden ascendente
+
+        Returns:
+            int: Usuario desalojado para hacer sitio (0 si no hubo que desalojar)
+        """
+        readings = list(readings)[-self.capacity:]
+        with self._map.locked() as buf:
+            base, evicted = self._claim(buf, user_id)
+            seq = _SLOT_HEADER.unpack_from(buf, base)[0]
+            _SLOT_HEADER.pack_into(buf, base, seq + 1, user_id, 0, 0)
+            for index, (timestamp, bpm, is_alert) in enumerate(readings):
+                self._write_entry(buf, base, index, timestamp, bpm, is_alert)
+            head = len(readings) % self.capacity
+            _SLOT_HEADER.pack_into(buf, base, seq + 2, user_id, head, len(readings))
+        return evicted
+
+    def append(self, user_id, timestamp, bpm, is_alert):
+        """
+        Agrega una lectura al slot del usuario.
+
+        Returns:
+            bool: False si el slot no pertenece al usuario (hay que llamar a seed)
+        """
+        with self._map.locked() as buf:
+            base = self._owned(buf, user_id)
+            if base is None:
+                return False
+            seq, owner, head, count = _SLOT_HEADER.unpack_from(buf, base)
+            if count == 0:
+                return False
+            _SLOT_HEADER.pack_into(buf, base, seq + 1, owner, head, count)
+            self._write_entry(buf, base, head, timestamp, bpm, is_alert)
+            head = (head + 1) % self.capacity
+            count = min(count + 1, self.capacity)
+            _SLOT_HEADER.pack_into(buf, base, seq + 2, owner, head, count)
+        return True
+
+    def discard(self, user_id):
+        """Libera el slot del usuario (p.ej. tras borrar sus lecturas)."""
+        with self._map.locked() as buf:
+            base = self._owned(buf, user_id)
+            if base is not None:
+                seq = _SLOT_HEADER.unpack_from(buf, base)[0]
+                _SLOT_HEADER.pack_into(buf, base, seq + 2, 0, 0, 0)
+
+    def reset(self):
+        """Vacía todos los slots (p.ej. cuando se recrea la base de datos)."""
+        with self._map.locked() as buf:
+            buf[_HEADER.size:] = bytes(len(buf) - _HEADER.size)
+
+    def close(self):
+        self._map.close()
+
+    # ---------- lectura (sin bloqueo, seqlock) ----------
+
+    def _snapshot(self, user_id):
+        for base in self._candidates(user_id):
+            readings = self._snapshot_at(base, user_id)
+            if readings is not None:
+                return readings
+        return None
+
+    def _snapshot_at(self, base, user_id):
+        buf = self._map.buf
+        for _ in range(100):
+            seq, owner, head, count = _SLOT_HEADER.unpack_from(buf, base)
+            if seq % 2:
+                continue
+            if owner != user_id or count == 0:
+                return None
+            raw = bytes(buf[base + _SLOT_HEADER.size:base + self.slot_size])
+            if _SLOT_HEADER.unpack_from(buf, base)[0] != seq:
+                continue
+            start = (head - count) % self.capacity
+            readings = []
+            for i in range(count):
+                timestamp, bpm, is_alert = _ENTRY.unpack_from(raw, ((start + i) % self.capacity) * _ENTRY.size)
+                readings.append(LiveReading(_from_epoch(timestamp), bpm, bool(is_alert)))
+            return readings
+        return None
+
+    def latest(self, user_id):
+        """Última lectura del usuario o None si no está en el buffer."""
+        readings = self._snapshot(user_id)
+        return readings[-1] if readings else None
+
+    def window(self, user_id, since):
+        """
+        Lecturas con timestamp >= since, en orden ascendente.
+
+        Returns:
+            list | None: None si el buffer no cubre todo el intervalo pedido
+        """
+        readings = self._snapshot(user_id)
+        if readings is None:
+            return None
+        if len(readings) == self.capacity and readings[0].timestamp > since:
+            return None
+        return [r for r in readings if r.timestamp >= since]
+
+
+_live_buffer = None
+
+
+def get_live_buffer():
+    """
+    Retorna el buffer compartido configurado en la app actual.
+
+    Returns:
+        LiveReadingBuffer | None: None si está deshabilitado o no se pudo abrir
+    """
+    global _live_buffer
+    if _live_buffer is None:
+        from flask import current_app
+        path = current_app.config.get('LIVE_BUFFER_PATH')
+        if not path:
+            return None
+        try:
+            _live_buffer = LiveReadingBuffer(
+                path,
+                slots=current_app.config.get('LIVE_BUFFER_SLOTS', 4096),
+                capacity=current_app.config.get('LIVE_BUFFER_CAPACITY', 256)
+            )
+        except OSError as e:
+            print(f"⚠️ Buffer en vivo no disponible: {e}")
+            current_app.config['LIVE_BUFFER_PATH'] = None
+            return None
+    return _live_buffer
+
+
+def release_live_buffer():
+    """Cierra el mapeo del proceso; se reabre bajo demanda (p.ej. tras un fork)."""
+    global _live_buffer
+    if _live_buffer is not None:
+        _live_buffer.close()
+        _live_buffer = None
@@ -0,0 +1,147 @@
+# shared/llm_backend.py
+"""
+Backend de modelo de lenguaje remoto para CardioBot.
+
+Usa una sesión HTTP con keep-alive y pool de conexiones compartida por todos
+los hilos, timeouts estrictos y un semáforo que limita las llamadas
+concurrentes: si el modelo está saturado o tarda, ChatbotManager responde con
+la lógica programada en lugar de bloquear el worker.
+
+El servidor debe aceptar el formato de text-generation-inference:
+    POST {"inputs": prompt, "parameters": {...}, "stream": true}
+y responder con líneas SSE ``data: {"token": {"text": "..."}}`` o, sin
+streaming, con ``[{"generated_text": "..."}]``.
+"""
+import json
+import threading
+import time
+
+
+class LLMUnavailable(Exception):
+    """El backend no puede atender la petición (saturado, error HTTP o de red)."""
+
+
+class LLMTimeout(LLMUnavailable):
+    """La generación superó el tiempo máximo permitido."""
+
+
+class LLMBackend:
+    """Interfaz: ``stream`` produce fragmentos de texto, ``generate`` el texto completo."""
+
+    def stream(self, prompt):
+        raise NotImplementedError
+
+    def generate(self, prompt):
+        return ''.join(self.stream(prompt))
+
+
+class HTTPModelBackend(LLMBackend):
+    """
+    Args:
+        url (str): Endpoint de generación
+        token (str): Token Bearer opcional (p.ej. Hugging Face)
+        connect_timeout (float): Segundos para conectar
+        read_timeout (float): Segundos máximos entre fragmentos recibidos
+        total_timeout (float): Segundos máximos de la generación completa
+        max_concurrency (int): Llamadas simultáneas al modelo por proceso
+        acquire_timeout (float): Espera máxima por un hueco antes de desistir
+        pool_size (int): Conexiones keep-alive reutilizables
+        max_new_tokens (int): Límite de tokens generados
+    """
+
+    def __init__(self, url, token='', connect_timeout=2, read_timeout=10, total_timeout=20,
+                 max_concurrency=4, acquire_timeout=0.5, pool_size=8, max_new_tokens=300):
+        self.url = url
+        self.token = token
+        self.timeout = (connect_timeout, read_timeout)
+        self.total_timeout = total_timeout
+        self.acquire_timeout = acquire_timeout
+        self.pool_size = pool_size
+        self.max_new_tokens = max_new_tokens
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    def _get_session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    if self.token:
+                        session.headers['Authorization'] = f'Bearer {self.token}'
+                    self._session = session
+        return self._session
+
+    def stream(self, prompt):
+        import requests
+
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise LLMUnavailable('Demasiadas peticiones simultáneas al modelo')
+        try:
+            deadline = time.monotonic() + self.total_timeout
+            payload = {
+                'inputs': prompt,
+                'parameters': {'max_new_tokens': self.max_new_tokens},
+                'stream': True
+            }
+            try:
+                response = self._get_session().post(self.url, json=payload, stream=True, timeout=self.timeout)
+                # Con stream=True la conexión queda tomada hasta cerrar la respuesta,
+                # también si el modelo contesta con un error
+                with response:
+                    response.raise_for_status()
+                    for line in response.iter_lines(decode_unicode=True):
+                        if time.monotonic() > deadline:
+                            raise LLMTimeout(f'Generación excedió {self.total_timeout}s')
+                        text = self._parse_line(line)
+                        if text:
+                            yield text
+            except requests.Timeout as e:
+                raise LLMTimeout(str(e)) from e
+            except requests.RequestException as e:
+                raise LLMUnavailable(str(e)) from e
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _parse_line(line):
+        if not line:
+            return None
+        if line.startswith('data:'):
+            line = line[5:].strip()
+        if line == '[DONE]':
+            return None
+        try:
+            data = json.loads(line)
+        except ValueError:
+            return None
+        if isinstance(data, list) and data:
+            data = data[0]
+        if not isinstance(data, dict):
+            return None
+        token = data.get('token')
+        if isinstance(token, dict):
+            if token.get('special'):
+                return None
+            return token.get('text')
+        return data.get('generated_text')
+
+
+def build_backend(config):
+    """Crea el backend configurado o None para usar solo la lógica programada."""
+    url = config.get('CARDIOBOT_LLM_URL')
+    if not url:
+        return None
+    return HTTPModelBackend(
+        url,
+        token=config.get('CARDIOBOT_LLM_TOKEN', ''),
+        connect_timeout=float(config.get('CARDIOBOT_LLM_CONNECT_TIMEOUT', 2)),
+        read_timeout=float(config.get('CARDIOBOT_LLM_READ_TIMEOUT', 10)),
+        total_timeout=float(config.get('CARDIOBOT_LLM_TOTAL_TIMEOUT', 20)),
+        max_concurrency=int(config.get('CARDIOBOT_LLM_MAX_CONCURRENCY', 4))
+    )
@@ -0,0 +1,341 @@
+# shared/metrics.py
+"""
+Métricas de ambas apps en formato de texto de Prometheus (GET /metrics).
+
+    http_requests_total{endpoint,method,status}     peticiones atendidas
+    http_request_duration_seconds{endpoint,method}  histograma de latencia
+    http_request_db_queries{endpoint}               consultas SQL por petición
+    http_request_db_seconds{endpoint}               tiempo en la BD por petición
+    ingest_readings_total{alert}                    lecturas aceptadas (rate = ingesta/s)
+    ingest_rejected_total{reason}                   lecturas rechazadas por motivo
+    alert_episodes_total{rule,event}                episodios abiertos/cerrados
+    monitoring_active_sessions                      pacientes con el monitoreo abierto
+    live_buffer_evictions_total                     pacientes desalojados del buffer en vivo
+    scheduler_job_runs_total{job,outcome}           ejecuciones de trabajos en segundo plano
+    scheduler_job_duration_seconds{job}             duración de cada ejecución
+
+Cada colector guarda sus valores en un dict protegido por su propio lock:
+registrar una observación es una búsqueda en el dict y una suma.
+
+Con varios workers de gunicorn cada proceso tiene sus contadores. Cada uno
+vuelca una instantánea en METRICS_DIR/<pid>.json (como mucho cada
+METRICS_FLUSH_INTERVAL segundos, al terminar una petición, y al salir) y el
+que atiende /metrics suma las de todos los workers del servidor actual. Las
+de workers ya terminados se siguen sumando para que los contadores no bajen;
+las de arranques anteriores se descartan.
+
+Ejemplo de scrape:
+    curl -s http://localhost:5000/metrics | grep receive_sensor_data
+"""
+import bisect
+import json
+import os
+import threading
+import time
+
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+JOB_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# ==================== COLECTORES ====================
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    @staticmethod
+    def merge(snapshots):
+        merged = {}
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                merged[tuple(key)] = merged.get(tuple(key), 0) + value
+        return merged
+
+    def render(self, merged):
+        for key, value in sorted(merged.items()):
+            yield f'{self.name}{_labels(self.labels, key)} {_number(value)}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                # [cuentas por cubo (+Inf al final), suma]
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(counts), total] for key, (counts, total) in self._values.items()]
+
+    @staticmethod
+    def merge(snapshots):
+        merged = {}
+        for snapshot in snapshots:
+            for key, counts, total in snapshot:
+                entry = merged.setdefault(tuple(key), [[0] * len(counts), 0.0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+        return merged
+
+    def render(self, merged):
+        for key, (counts, total) in sorted(merged.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                yield f'{self.name}_bucket{_labels(self.labels + ("le",), key + (le,))} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, key)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.labels, key)} {cumulative}'
+
+
+class ActiveSessions:
+    """Gauge: ids distintos vistos en los últimos ``window`` segundos."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, window=60):
+        self.name = name
+        self.documentation = documentation
+        self.window = window
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def touch(self, session_id):
+        with self._lock:
+            self._seen[session_id] = time.time()
+
+    def snapshot(self):
+        cutoff = time.time() - self.window
+        with self._lock:
+            for key in [key for key, seen in self._seen.items() if seen < cutoff]:
+                del self._seen[key]
+            return {str(key): seen for key, seen in self._seen.items()}
+
+    def merge(self, snapshots):
+        # Un paciente puede sondear contra varios workers: unión, no suma
+        cutoff = time.time() - self.window
+        return {key for snapshot in snapshots for key, seen in snapshot.items() if seen >= cutoff}
+
+    def render(self, merged):
+        yield f'{self.name} {len(merged)}'
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ==================== REGISTRO ====================
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+        self.directory = None
+        self.flush_interval = 5
+        self.started_at = time.time()
+        self._last_flush = 0
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'{pid}.json')
+
+    def flush(self, force=False):
+        """Vuelca la instantánea del proceso (limitado a una vez por intervalo)."""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            self._last_flush = now
+            path = self._path(os.getpid())
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar la instantánea de métricas: {e}")
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Instantáneas de todos los workers de este arranque (o solo la propia)."""
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush(force=True)
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < self.started_at and not _alive(int(name[:-5])):
+                    os.remove(path)  # De un arranque anterior
+                    continue
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def render(self):
+        snapshots = self.collect()
+        lines = []
+        for metric in self.metrics:
+            merged = metric.merge([s[metric.name] for s in snapshots if metric.name in s])
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render(merged))
+        return '\n'.join(lines) + '\n'
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.register(Counter(
+    'http_requests_total', 'Peticiones HTTP atendidas', ('endpoint', 'method', 'status')))
+request_latency = registry.register(Histogram(
+    'http_request_duration_seconds', 'Latencia de las peticiones', ('endpoint', 'method')))
+request_queries = registry.register(Histogram(
+    'http_request_db_queries', 'Consultas SQL por petición', ('endpoint',), QUERY_BUCKETS))
+request_db_time = registry.register(Histogram(
+    'http_request_db_seconds', 'Tiempo en la BD por petición', ('endpoint',)))
+ingest_readings = registry.register(Counter(
+    'ingest_readings_total', 'Lecturas del ESP32 aceptadas', ('alert',)))
+ingest_rejected = registry.register(Counter(
+    'ingest_rejected_total', 'Lecturas del ESP32 rechazadas', ('reason',)))
+alert_episodes = registry.register(Counter(
+    'alert_episodes_total', 'Episodios de alerta abiertos y cerrados', ('rule', 'event')))
+monitoring_sessions = registry.register(ActiveSessions(
+    'monitoring_active_sessions', 'Pacientes con el monitoreo abierto (sondeo en el último minuto)'))
+live_buffer_evictions = registry.register(Counter(
+    'live_buffer_evictions_total', 'Pacientes desalojados del buffer en vivo por falta de slots'))
+job_runs = registry.register(Counter(
+    'scheduler_job_runs_total', 'Ejecuciones de trabajos en segundo plano', ('job', 'outcome')))
+job_duration = registry.register(Histogram(
+    'scheduler_job_duration_seconds', 'Duración de los trabajos en segundo plano', ('job',), JOB_BUCKETS))
+
+
+# ==================== INTEGRACIÓN CON FLASK ====================
+
+def init_metrics(app):
+    """Instrumenta las peticiones de la app y registra GET /metrics."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    registry.directory = app.config.get('METRICS_DIR')
+    # En gunicorn se ejecuta en el maestro: los workers heredan el instante de arranque
+    registry.started_at = time.time()
+    registry.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 5)
+    if registry.directory:
+        os.makedirs(registry.directory, exist_ok=True)
+    _track_queries()
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_db = [0, 0.0]
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'not_found'
+        http_requests.inc(endpoint, request.method, str(response.status_code))
+        request_latency.observe(time.perf_counter() - started, endpoint, request.method)
+        queries, db_time = g.pop('metrics_db', (0, 0.0))
+        request_queries.observe(queries, endpoint)
+        request_db_time.observe(db_time, endpoint)
+        registry.flush()
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        token = app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+_tracking = False
+
+
+def _track_queries():
+    global _tracking
+    if _tracking:
+        return
+    _tracking = True
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context():
+            return
+        counters = g.get('metrics_db')
+        if counters is not None:
+            counters[0] += 1
+            counters[1] += time.perf_counter() - context._metrics_started
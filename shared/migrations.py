@@ -0,0 +1,149 @@
+# shared/migrations.py
+"""
+Migraciones versionadas del esquema, aplicadas al arrancar (admin/combinado).
+
+La versión aplicada se guarda en la tabla ``schema_version``. Al arrancar:
+    - si la versión ya es la última, basta con una consulta y no se toca nada;
+    - si no, se crean las tablas que falten (completas, con sus índices) y se
+      aplican en orden las migraciones pendientes, registrando cada una.
+
+Cada migración es idempotente (comprueba antes de cambiar), así que una BD
+anterior al versionado (versión 0) o una migración interrumpida se resuelven
+volviendo a arrancar.
+
+Solo se usan operaciones que no reescriben tablas en SQLite:
+    - ``ALTER TABLE ... ADD COLUMN`` de columnas que admiten NULL y sin
+      valor por defecto: solo modifica el esquema en sqlite_master, las filas
+      existentes leen NULL sin tocarse;
+    - ``CREATE INDEX IF NOT EXISTS``: recorre la tabla una vez para construir
+      el índice, sin copiar ni reescribir sus filas.
+Cambios que exijan reescribir ``sensor_data`` (tipos, NOT NULL) no deben
+añadirse aquí sin una estrategia aparte.
+
+Para añadir una migración: declarar el cambio en shared/models.py y añadir al
+final de MIGRATIONS una entrada (versión siguiente, descripción, función).
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, select, func
+from sqlalchemy.schema import CreateIndex
+
+from shared.models import db
+
+schema_version = db.Table(
+    'schema_version',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('name', db.String(120), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+
+# ==================== OPERACIONES ====================
+
+def add_columns(connection, table_name, *column_names):
+    """Añade las columnas del modelo que falten en la tabla. Retorna las añadidas."""
+    table = db.metadata.tables[table_name]
+    existing = {column['name'] for column in inspect(connection).get_columns(table_name)}
+    added = []
+    for name in column_names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        if not column.nullable or column.server_default is not None:
+            raise ValueError(f'{table_name}.{name}: solo columnas NULL sin valor por defecto')
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.exec_driver_sql(f'ALTER TABLE {table_name} ADD COLUMN {name} {column_type}')
+        added.append(name)
+    return added
+
+
+def create_indexes(connection, table_name, *index_names):
+    """Crea los índices del modelo indicados que no existan todavía."""
+    # IF NOT EXISTS en vez de checkfirst: la reflexión no ve los índices sobre expresiones (lower(...))
+    indexes = {index.name: index for index in db.metadata.tables[table_name].indexes}
+    for name in index_names:
+        connection.execute(CreateIndex(indexes[name], if_not_exists=True))
+
+
+# ==================== MIGRACIONES ====================
+
+def _sensor_data_user_index(connection):
+    create_indexes(connection, 'sensor_data', 'ix_sensor_data_user_timestamp')
+
+
+def _caregiver_email(connection):
+    add_columns(connection, 'users', 'caregiver_email')
+
+
+def _device_registry(connection):
+    add_columns(connection, 'devices', 'assigned_at', 'last_seen_at', 'firmware_version', 'batch')
+
+
+def _listing_indexes(connection):
+    create_indexes(connection, 'users',
+                   'ix_users_role_deleted_created', 'ix_users_deleted_deleted_at',
+                   'ix_users_role_deleted_username', 'ix_users_role_deleted_email',
+                   'ix_users_deleted_username')
+    create_indexes(connection, 'devices', 'ix_devices_created', 'ix_devices_used_created')
+
+
+def _digest_analytics(connection):
+    add_columns(connection, 'health_digests', 'resting_bpm', 'rmssd_ms', 'sdnn_ms', 'pnn50',
+                'anomaly_count', 'changepoint_count', 'last_anomaly_at')
+
+
+def _scheduled_jobs(connection):
+    # Tabla nueva: run_migrations ya la crea con create_all, esto la asegura
+    db.metadata.tables['scheduled_jobs'].create(connection, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, 'sensor_data: índice (user_id, timestamp)', _sensor_data_user_index),
+    (2, 'users: caregiver_email', _caregiver_email),
+    (3, 'devices: columnas del registro', _device_registry),
+    (4, 'users/devices: índices de listados', _listing_indexes),
+    (5, 'health_digests: análisis de la serie', _digest_analytics),
+    (6, 'scheduled_jobs: planificador de trabajos', _scheduled_jobs),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ==================== EJECUCIÓN ====================
+
+def current_version(connection):
+    if not inspect(connection).has_table('schema_version'):
+        return 0
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def run_migrations(engine):
+    """
+    Lleva el esquema a LATEST_VERSION. Debe ejecutarlo un solo proceso
+    (el maestro de gunicorn o el servidor de desarrollo del admin).
+
+    Returns:
+        list: Versiones aplicadas en esta llamada
+    """
+    with engine.connect() as connection:
+        version = current_version(connection)
+    if version >= LATEST_VERSION:
+        print(f"✅ Esquema al día (versión {version})")
+        return []
+
+    # Tablas nuevas (o BD vacía): se crean ya con el esquema actual
+    db.metadata.create_all(engine)
+
+    applied = []
+    for number, name, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(schema_version.insert().values(
+                version=number, name=name, applied_at=datetime.utcnow()))
+        applied.append(number)
+        print(f"  🔧 Migración {number}: {name}")
+
+    print(f"✅ Esquema actualizado de la versión {version} a la {LATEST_VERSION}")
+    return applied
@@ -1,13 +1,21 @@
 # shared/models.py - VERIFICAR LINEA POR LINEA
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from shared import passwords
 from datetime import datetime
 
 db = SQLAlchemy()
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        # Listados paginados por cursor y búsqueda por prefijo (shared/pagination.py)
+        db.Index('ix_users_role_deleted_created', 'role', 'is_deleted', 'created_at', 'id'),
+        db.Index('ix_users_deleted_deleted_at', 'is_deleted', 'deleted_at', 'id'),
+        db.Index('ix_users_role_deleted_username', 'role', 'is_deleted', db.text('lower(username)'), 'id'),
+        db.Index('ix_users_role_deleted_email', 'role', 'is_deleted', db.text('lower(email)'), 'id'),
+        db.Index('ix_users_deleted_username', 'is_deleted', db.text('lower(username)'), 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -30,15 +38,25 @@ class User(UserMixin, db.Model):
     age = db.Column(db.Integer)
     max_safe_bpm = db.Column(db.Integer, default=120)
     min_safe_bpm = db.Column(db.Integer, default=60)
+    caregiver_email = db.Column(db.String(120))  # Destinatario de notificaciones de alerta
     
     # Relación
     created_users = db.relationship('User', backref=db.backref('creator', remote_side=[id]))
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        # El coste depende del rol: asignar role antes de llamar a este método
+        self.password_hash = passwords.password_hasher.hash(password, self.role or 'user')
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # Puede lanzar PasswordVerifierBusy si el pool de verificación está lleno
+        return passwords.password_hasher.verify(self.password_hash, password)
+    
+    def rehash_password_if_needed(self, password):
+        """Regenera el hash tras un login correcto si cambió la configuración. Retorna True si lo hizo."""
+        if not passwords.password_hasher.needs_rehash(self.password_hash, self.role or 'user'):
+            return False
+        self.set_password(password)
+        return True
     
     def calculate_safe_limits(self):
         if self.age and self.heart_condition:
@@ -76,6 +94,7 @@ class User(UserMixin, db.Model):
             device = Device.query.filter_by(device_code=self.device_code).first()
             if device:
                 device.is_used = False
+                device.assigned_at = None
 
     def reactivate_account(self):
         self.is_active = True
@@ -85,6 +104,7 @@ class User(UserMixin, db.Model):
             device = Device.query.filter_by(device_code=self.device_code).first()
             if device:
                 device.is_used = True
+                device.assigned_at = datetime.utcnow()
 
     @property
     def is_authenticated(self):
@@ -99,14 +119,27 @@ class User(UserMixin, db.Model):
 
 class Device(db.Model):
     __tablename__ = 'devices'
+    __table_args__ = (
+        db.Index('ix_devices_created', 'created_at', 'id'),
+        db.Index('ix_devices_used_created', 'is_used', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    device_code = db.Column(db.String(50), unique=True, nullable=False)
+    device_code = db.Column(db.String(50), unique=True, nullable=False)  # Índice único: búsqueda O(log n)
     is_used = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Estado en el registro
+    assigned_at = db.Column(db.DateTime)
+    last_seen_at = db.Column(db.DateTime)
+    firmware_version = db.Column(db.String(32))
+    batch = db.Column(db.String(50))  # Lote de aprovisionamiento
 
 class SensorData(db.Model):
     __tablename__ = 'sensor_data'
+    __table_args__ = (
+        db.Index('ix_sensor_data_user_timestamp', 'user_id', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -114,4 +147,128 @@ class SensorData(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     is_alert = db.Column(db.Boolean, default=False)
     
-    user = db.relationship('User', backref=db.backref('sensor_data', lazy=True))
\ No newline at end of file
+    user = db.relationship('User', backref=db.backref('sensor_data', lazy=True))
+
+class AlertEpisode(db.Model):
+    __tablename__ = 'alert_episodes'
+    __table_args__ = (
+        db.Index('ix_alert_episodes_user_started', 'user_id', 'started_at'),
+        db.Index('ix_alert_episodes_open', 'ended_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    rule = db.Column(db.String(50), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # 'high', 'low', 'rate'
+    started_at = db.Column(db.DateTime, nullable=False)
+    last_seen_at = db.Column(db.DateTime, nullable=False)
+    ended_at = db.Column(db.DateTime)  # NULL mientras el episodio sigue abierto
+    extreme_bpm = db.Column(db.Integer, nullable=False)
+    sample_count = db.Column(db.Integer, default=1, nullable=False)
+    
+    user = db.relationship('User', backref=db.backref('alert_episodes', lazy=True))
+    
+    @property
+    def is_open(self):
+        return self.ended_at is None
+
+
+class NotificationOutbox(db.Model):
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.Index('ix_notification_outbox_due', 'status', 'next_attempt_at'),
+        db.Index('ix_notification_outbox_coalesce', 'coalesce_key', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    channel = db.Column(db.String(20), nullable=False)  # 'email', 'webhook'
+    recipient = db.Column(db.String(255), nullable=False)
+    coalesce_key = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    event_count = db.Column(db.Integer, default=1, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime)
+
+class HealthDigest(db.Model):
+    __tablename__ = 'health_digests'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'digest_date', name='uq_health_digests_user_date'),
+        db.Index('ix_health_digests_date', 'digest_date'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    digest_date = db.Column(db.Date, nullable=False)
+    generated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Estadísticas de los últimos 7 días (mismas que get_user_health_context)
+    total_readings = db.Column(db.Integer, default=0, nullable=False)
+    alert_readings = db.Column(db.Integer, default=0, nullable=False)
+    avg_bpm = db.Column(db.Float, default=0, nullable=False)
+    max_bpm = db.Column(db.Integer, default=0, nullable=False)
+    min_bpm = db.Column(db.Integer, default=0, nullable=False)
+    variability = db.Column(db.Integer, default=0, nullable=False)
+    trend = db.Column(db.String(20))
+    last_reading_at = db.Column(db.DateTime)
+    
+    # Resultado de generate_health_analysis (listas en JSON)
+    status = db.Column(db.String(30), nullable=False)
+    status_class = db.Column(db.String(20), nullable=False)
+    messages = db.Column(db.Text, default='[]', nullable=False)
+    tips = db.Column(db.Text, default='[]', nullable=False)
+    
+    # Análisis de la serie completa (shared/analytics.py); NULL si no se calculó
+    resting_bpm = db.Column(db.Float)
+    rmssd_ms = db.Column(db.Float)
+    sdnn_ms = db.Column(db.Float)
+    pnn50 = db.Column(db.Float)
+    anomaly_count = db.Column(db.Integer)
+    changepoint_count = db.Column(db.Integer)
+    last_anomaly_at = db.Column(db.DateTime)
+    
+    user = db.relationship('User', backref=db.backref('health_digests', lazy=True))
+    
+    @property
+    def alert_percentage(self):
+        return (self.alert_readings / self.total_readings * 100) if self.total_readings > 0 else 0
+
+class ScheduledJob(db.Model):
+    __tablename__ = 'scheduled_jobs'
+    __table_args__ = (
+        db.Index('ix_scheduled_jobs_due', 'status', 'next_run_at'),
+        db.Index('ix_scheduled_jobs_job_status', 'job', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), unique=True, nullable=False)  # Periódico: el del trabajo
+    job = db.Column(db.String(80), nullable=False)  # Definición registrada (shared/scheduler.py)
+    interval_seconds = db.Column(db.Integer)  # NULL en los trabajos puntuales
+    payload = db.Column(db.Text)  # Argumentos en JSON
+    status = db.Column(db.String(20), default='scheduled', nullable=False)  # scheduled, running, succeeded, failed
+    next_run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Arrendamiento: solo el proceso dueño lo ejecuta mientras no venza
+    lease_owner = db.Column(db.String(120))
+    lease_expires_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    
+    # Última ejecución
+    run_count = db.Column(db.Integer, default=0, nullable=False)
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    last_duration = db.Column(db.Float)
+    last_outcome = db.Column(db.String(20))  # succeeded, failed
+    last_error = db.Column(db.Text)
+    last_result = db.Column(db.Text)  # JSON devuelto por el trabajo
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    @property
+    def is_periodic(self):
+        return self.interval_seconds is not None
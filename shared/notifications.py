@@ -0,0 +1,325 @@
+# shared/notifications.py
+"""
+Notificaciones de alerta a cuidadores.
+
+La ingesta solo inserta filas en ``notification_outbox`` dentro de su propia
+transacción; el envío lo hace ``NotificationDispatcher`` en hilos de fondo,
+así un servidor SMTP o webhook lento nunca añade latencia al ESP32.
+
+Canales disponibles:
+    email:   SMTP (smtplib)
+    webhook: POST JSON a una URL configurada
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from shared.models import db, NotificationOutbox
+
+# Ventana en la que nuevos episodios se agregan a una notificación pendiente
+COALESCE_WINDOW = timedelta(minutes=5)
+
+
+# ==================== CANALES ====================
+
+class NotificationChannel:
+    """Canal de entrega. ``send`` recibe todas las notificaciones de un destinatario."""
+    name = None
+
+    def send(self, recipient, notifications):
+        raise NotImplementedError
+
+
+class SMTPChannel(NotificationChannel):
+    name = 'email'
+
+    def __init__(self, host, port=25, sender='alertas@hearttone.local',
+                 username=None, password=None, use_tls=False, timeout=10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+
+    def send(self, recipient, notifications):
+        # Importación diferida: smtplib/email solo cuando hay correo que enviar
+        import smtplib
+        from email.message import EmailMessage
+
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = recipient
+        if len(notifications) == 1:
+            message['Subject'] = notifications[0].subject
+        else:
+            message['Subject'] = f'🚨 {len(notifications)} avisos de alerta cardíaca'
+        message.set_content('\n\n'.join(n.body for n in notifications))
+
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+
+class WebhookChannel(NotificationChannel):
+    name = 'webhook'
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+        self._session = None
+
+    def send(self, recipient, notifications):
+        if self._session is None:
+            import requests
+            self._session = requests.Session()
+        payload = {
+            'notifications': [
+                {
+                    'id': n.id,
+                    'user_id': n.user_id,
+                    'subject': n.subject,
+                    'body': n.body,
+                    'event_count': n.event_count,
+                    'created_at': n.created_at.isoformat()
+                }
+                for n in notifications
+            ]
+        }
+        response = self._session.post(recipient, data=json.dumps(payload),
+                                      headers={'Content-Type': 'application/json'},
+                                      timeout=self.timeout)
+        response.raise_for_status()
+
+
+def build_channels(config):
+    """Crea los canales habilitados según la configuración de la app."""
+    channels = {}
+    if config.get('NOTIFY_SMTP_HOST'):
+        channels['email'] = SMTPChannel(
+            host=config['NOTIFY_SMTP_HOST'],
+            port=int(config.get('NOTIFY_SMTP_PORT', 25)),
+            sender=config.get('NOTIFY_SMTP_SENDER', 'alertas@hearttone.local'),
+            username=config.get('NOTIFY_SMTP_USER'),
+            password=config.get('NOTIFY_SMTP_PASSWORD'),
+            use_tls=bool(config.get('NOTIFY_SMTP_TLS'))
+        )
+    if config.get('NOTIFY_WEBHOOK_URL'):
+        channels['webhook'] = WebhookChannel()
+    return channels
+
+
+# ==================== OUTBOX ====================
+
+def _alert_text(user, event):
+    episode = event.episode
+    kinds = {'high': 'Taquicardia sostenida', 'low': 'Bradicardia sostenida', 'rate': 'Cambio brusco de ritmo'}
+    subject = f'🚨 Alerta cardíaca: {user.username}'
+    body = (f"Episodio detectado: {kinds.get(episode.kind, episode.kind)}\n"
+            f"Paciente: {user.username}\n"
+            f"Inicio: {episode.started_at.strftime('%d/%m/%Y %H:%M:%S')} UTC\n"
+            f"BPM: {episode.extreme_bpm} (límites {user.min_safe_bpm}-{user.max_safe_bpm})")
+    return subject, body
+
+
+def enqueue_alert_notifications(user, events, config):
+    """
+    Agrega a la outbox los avisos de los episodios abiertos. Se llama antes
+    del commit de la ingesta para que la notificación sea durable.
+
+    Si ya hay una notificación pendiente para el mismo destinatario y usuario
+    dentro de ``COALESCE_WINDOW``, el episodio se agrega a ella.
+    """
+    opened = [event for event in events if event.type == 'opened']
+    if not opened:
+        return
+
+    recipients = []
+    if user.caregiver_email and config.get('NOTIFY_SMTP_HOST'):
+        recipients.append(('email', user.caregiver_email))
+    if config.get('NOTIFY_WEBHOOK_URL'):
+        recipients.append(('webhook', config['NOTIFY_WEBHOOK_URL']))
+
+    now = datetime.utcnow()
+    texts = [_alert_text(user, event) for event in opened]
+    for channel, recipient in recipients:
+        coalesce_key = f'{channel}:{recipient}:{user.id}'
+        body = '\n\n'.join(text for _, text in texts)
+        pending = NotificationOutbox.query.filter(
+            NotificationOutbox.coalesce_key == coalesce_key,
+            NotificationOutbox.status == 'pending',
+            NotificationOutbox.attempts == 0,
+            NotificationOutbox.created_at >= now - COALESCE_WINDOW
+        ).first()
+
+        # Actualización condicional: si el despachador ya la reclamó, se crea otra
+        if pending and NotificationOutbox.query.filter_by(id=pending.id, status='pending').update({
+            'body': NotificationOutbox.body + '\n\n' + body,
+            'event_count': NotificationOutbox.event_count + len(texts),
+            'updated_at': now
+        }, synchronize_session=False):
+            continue
+
+        db.session.add(NotificationOutbox(
+            user_id=user.id,
+            channel=channel,
+            recipient=recipient,
+            coalesce_key=coalesce_key,
+            subject=texts[0][0],
+            body=body,
+            event_count=len(texts),
+            next_attempt_at=now
+        ))
+
+
+# ==================== DESPACHADOR ====================
+
+class NotificationDispatcher:
+    """
+    Reparte la outbox entre un pool de hilos de envío.
+
+    Args:
+        app: Aplicación Flask (para el contexto de BD)
+        channels (dict): Canales por nombre
+        workers (int): Hilos de envío
+        batch_size (int): Notificaciones reclamadas por ciclo
+        poll_interval (float): Segundos entre ciclos sin trabajo
+        max_attempts (int): Intentos antes de marcar 'failed'
+        backoff_base (int): Segundos del primer reintento (se duplica en cada intento)
+    """
+
+    def __init__(self, app, channels, workers=2, batch_size=50, poll_interval=2,
+                 max_attempts=6, backoff_base=30, backoff_max=3600):
+        self.app = app
+        self.channels = channels
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notify')
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='notify-dispatcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=10, drain=False):
+        """
+        Deja de reclamar trabajo y espera a que terminen los envíos en curso.
+        Con ``drain`` hace una última pasada para enviar lo encolado por las
+        últimas lecturas antes de salir.
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if drain:
+            try:
+                self.dispatch_once()
+            except Exception as e:
+                print(f"❌ Error vaciando notificaciones pendientes: {e}")
+        self._pool.shutdown(wait=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self.dispatch_once()
+            except Exception as e:
+                print(f"❌ Error en despachador de notificaciones: {e}")
+                claimed = 0
+            if not claimed:
+                self._stop.wait(self.poll_interval)
+
+    def dispatch_once(self):
+        """Reclama un lote, lo agrupa por destinatario y lo envía. Retorna el número reclamado."""
+        with self.app.app_context():
+            batches = self._claim()
+        futures = [self._pool.submit(self._deliver, key, ids) for key, ids in batches.items()]
+        for future in futures:
+            future.result()
+        return sum(len(ids) for ids in batches.values())
+
+    def _claim(self):
+        now = datetime.utcnow()
+        stale = now - timedelta(minutes=5)
+        candidates = NotificationOutbox.query.filter(
+            db.or_(
+                db.and_(NotificationOutbox.status == 'pending', NotificationOutbox.next_attempt_at <= now),
+                db.and_(NotificationOutbox.status == 'sending', NotificationOutbox.updated_at < stale)
+            )
+        ).order_by(NotificationOutbox.next_attempt_at).limit(self.batch_size).all()
+
+        batches = {}
+        for notification in candidates:
+            # Reclamo atómico: otro proceso/hilo puede estar leyendo las mismas filas
+            claimed = NotificationOutbox.query.filter_by(
+                id=notification.id, status=notification.status, updated_at=notification.updated_at
+            ).update({'status': 'sending', 'updated_at': now}, synchronize_session=False)
+            if claimed:
+                batches.setdefault((notification.channel, notification.recipient), []).append(notification.id)
+        db.session.commit()
+        return batches
+
+    def _deliver(self, key, ids):
+        channel_name, recipient = key
+        with self.app.app_context():
+            notifications = NotificationOutbox.query.filter(NotificationOutbox.id.in_(ids))\
+                .order_by(NotificationOutbox.created_at).all()
+            now = datetime.utcnow()
+            try:
+                channel = self.channels.get(channel_name)
+                if channel is None:
+                    raise RuntimeError(f'Canal no configurado: {channel_name}')
+                channel.send(recipient, notifications)
+            except Exception as e:
+                for notification in notifications:
+                    notification.attempts += 1
+                    notification.last_error = str(e)[:1000]
+                    notification.updated_at = now
+                    if notification.attempts >= self.max_attempts:
+                        notification.status = 'failed'
+                    else:
+                        delay = min(self.backoff_base * 2 ** (notification.attempts - 1), self.backoff_max)
+                        notification.status = 'pending'
+                        notification.next_attempt_at = now + timedelta(seconds=delay)
+                print(f"⚠️ Fallo enviando {len(notifications)} notificación(es) por {channel_name}: {e}")
+            else:
+                for notification in notifications:
+                    notification.status = 'sent'
+                    notification.sent_at = now
+                    notification.updated_at = now
+                print(f"📨 {len(notifications)} notificación(es) enviadas por {channel_name} a {recipient}")
+            db.session.commit()
+
+
+_dispatcher = None
+
+
+def start_notification_dispatcher(app):
+    """Arranca el despachador de la app (una vez por proceso)."""
+    global _dispatcher
+    if _dispatcher is None:
+        channels = build_channels(app.config)
+        if not channels:
+            print("ℹ️ Notificaciones deshabilitadas: no hay canales configurados")
+            return None
+        _dispatcher = NotificationDispatcher(
+            app, channels,
+            workers=app.config.get('NOTIFY_WORKERS', 2)
+        ).start()
+        print(f"✅ Despachador de notificaciones iniciado: {', '.join(channels)}")
+    return _dispatcher
+
+
+def stop_notification_dispatcher(drain=False):
+    global _dispatcher
+    if _dispatcher is not None:
+        _dispatcher.stop(drain=drain)
+        _dispatcher = None
@@ -0,0 +1,168 @@
+# shared/pagination.py
+"""
+Paginación por cursor (keyset) y búsqueda por prefijo para los listados de
+administración.
+
+En lugar de OFFSET, cada página continúa desde la clave de ordenación de la
+última fila vista: ``WHERE (orden, id) > (:valor, :id) ORDER BY orden, id
+LIMIT n + 1``. Con un índice sobre (filtros..., orden, id) el coste de cada
+página depende del tamaño de página y no del de la tabla; la fila extra solo
+indica si hay página siguiente, sin COUNT(*).
+
+La búsqueda por prefijo se traduce a un rango ``>= q AND < q + U+FFFF`` sobre
+``lower(columna)``, que SQLite resuelve con el índice de expresión
+correspondiente (LIKE no lo usaría con la colación por defecto).
+"""
+import base64
+import json
+import string
+from datetime import datetime
+
+from sqlalchemy import DateTime, func, tuple_
+from sqlalchemy.sql.functions import FunctionElement
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+_PREFIX_END = '\uffff'
+
+# lower() de SQLite solo convierte ASCII: los cursores deben coincidir con él
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def sql_lower(text):
+    return text.translate(_ASCII_LOWER)
+
+
+class InvalidCursor(ValueError):
+    """El cursor recibido no se puede decodificar."""
+
+
+def encode_cursor(values):
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(value) if value is not None and isinstance(column.type, DateTime) else value
+            for value, column in zip(values, columns)
+        ]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e)) from e
+
+
+def prefix_filter(column, prefix, case_insensitive=True):
+    """
+    Condición indexable "empieza por ``prefix``". Con ``case_insensitive``
+    compara sobre ``lower(column)`` (requiere índice de expresión).
+    """
+    expression = column
+    if case_insensitive:
+        prefix = sql_lower(prefix)
+        expression = func.lower(column)
+    return expression >= prefix, expression < prefix + _PREFIX_END
+
+
+class KeysetPage:
+    """
+    Args:
+        items (list): Filas de la página en el orden pedido
+        next_cursor (str): Cursor para la página siguiente o None
+        prev_cursor (str): Cursor para la página anterior o None
+        per_page (int): Tamaño de página aplicado
+    """
+
+    def __init__(self, items, next_cursor, prev_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def to_dict(self, serialize):
+        return {
+            'items': [serialize(item) for item in self.items],
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+            'per_page': self.per_page
+        }
+
+
+def keyset_paginate(query, order_columns, descending=False, after=None, before=None, per_page=DEFAULT_PER_PAGE):
+    """
+    Args:
+        query: Query de SQLAlchemy ya filtrada (sin ORDER BY)
+        order_columns (list): Columnas de ordenación; la última debe ser única (id)
+        descending (bool): Orden descendente
+        after (str): Cursor de la última fila de la página anterior
+        before (str): Cursor de la primera fila de la página siguiente (retroceder)
+        per_page (int): Filas por página (acotado a MAX_PER_PAGE)
+
+    Returns:
+        KeysetPage
+
+    Raises:
+        InvalidCursor: Si el cursor no es válido
+    """
+    per_page = max(1, min(int(per_page or DEFAULT_PER_PAGE), MAX_PER_PAGE))
+    unfiltered = query
+    key = tuple_(*order_columns)
+    backwards = before is not None and after is None
+
+    # Al retroceder se recorre el índice en sentido contrario y se invierte
+    reverse = descending != backwards
+    cursor = after if after is not None else before
+    if cursor is not None:
+        values = decode_cursor(cursor, order_columns)
+        lead, lead_value = order_columns[0], values[0]
+        # La cota sobre la primera columna permite a SQLite acotar el rango del
+        # índice; la comparación de tuplas por sí sola no siempre lo consigue
+        if reverse:
+            query = query.filter(lead <= lead_value, key < tuple_(*values))
+        else:
+            query = query.filter(lead >= lead_value, key > tuple_(*values))
+
+    ordering = [column.desc() if reverse else column.asc() for column in order_columns]
+    rows = query.order_by(*ordering).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor_of(row):
+        return encode_cursor([_row_value(row, column) for column in order_columns])
+
+    if not rows and backwards:
+        # Nada antes del cursor (filas borradas o cambio de filtro): la página
+        # anterior es la primera, con su cursor siguiente para seguir avanzando
+        return keyset_paginate(unfiltered, order_columns, descending, per_page=per_page)
+    if not rows:
+        return KeysetPage([], None, None, per_page)
+
+    if backwards:
+        next_cursor = cursor_of(rows[-1])
+        prev_cursor = cursor_of(rows[0]) if more else None
+    else:
+        next_cursor = cursor_of(rows[-1]) if more else None
+        prev_cursor = cursor_of(rows[0]) if after is not None else None
+    return KeysetPage(rows, next_cursor, prev_cursor, per_page)
+
+
+def _row_value(row, column):
+    """Valor de la clave de ordenación en la fila (columna o lower(columna))."""
+    if isinstance(column, FunctionElement):
+        return sql_lower(getattr(row, list(column.clauses)[0].key))
+    return getattr(row, column.key)
@@ -0,0 +1,133 @@
+# shared/passwords.py
+"""
+Hash de contraseñas configurable por rol y verificación fuera del hilo de la
+petición.
+
+PBKDF2 consume CPU durante decenas de milisegundos; hashlib libera el GIL
+mientras calcula, así que un pool de hilos pequeño acota cuántos núcleos se
+dedican a los logins. Cada login admitido bloquea su hilo de petición hasta
+tener el resultado, así que la admisión (en cálculo + en cola) se acota por
+debajo de los hilos de gunicorn (WEB_THREADS - 2 por defecto): el resto se
+rechaza al instante con ``PasswordVerifierBusy`` (503) y siempre quedan hilos
+libres para las páginas que no requieren login.
+
+Los métodos siguen el formato de werkzeug con todos los parámetros, p.ej.
+``pbkdf2:sha256:600000`` o ``scrypt:32768:8:1``: el prefijo del hash guardado
+se compara con el configurado para decidir si hay que regenerarlo. Con el
+mismo algoritmo solo se regenera hacia arriba: bajar las iteraciones de un
+rol (p.ej. para aliviar CPU) afecta a las contraseñas nuevas, pero no
+debilita en el siguiente login los hashes ya guardados.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_HASH_METHODS = {
+    'admin': 'pbkdf2:sha256:600000',
+    'user': 'pbkdf2:sha256:600000',
+}
+
+
+def _split_method(parts):
+    """['pbkdf2', 'sha256', '600000'] -> (('pbkdf2', 'sha256'), (600000,))"""
+    name = tuple(part for part in parts if not part.isdigit())
+    cost = tuple(int(part) for part in parts if part.isdigit())
+    return name, cost
+
+
+class PasswordVerifierBusy(Exception):
+    """Demasiados cálculos de hash en curso o en cola."""
+
+
+class PasswordHasher:
+    """
+    Args:
+        methods (dict): Método de werkzeug por rol
+        workers (int): Hilos que calculan hashes en paralelo
+        max_pending (int): Cálculos admitidos a la vez (en curso + en cola) antes de rechazar
+        timeout (float): Segundos máximos esperando un resultado
+    """
+
+    def __init__(self, methods=None, workers=2, max_pending=6, timeout=10):
+        self.methods = dict(DEFAULT_HASH_METHODS, **(methods or {}))
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pwhash')
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+
+    def method_for(self, role):
+        return self.methods.get(role, self.methods['user'])
+
+    def needs_rehash(self, password_hash, role):
+        """True si el hash usa otro algoritmo o un coste menor que el configurado."""
+        stored = password_hash.split('$', 1)[0].split(':')
+        wanted = self.method_for(role).split(':')
+        stored_name, stored_cost = _split_method(stored)
+        wanted_name, wanted_cost = _split_method(wanted)
+        if stored_name != wanted_name or len(stored_cost) != len(wanted_cost):
+            return True
+        return any(have < want for have, want in zip(stored_cost, wanted_cost))
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordVerifierBusy()
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordVerifierBusy()
+
+    def hash(self, password, role):
+        return self._run(generate_password_hash, password, self.method_for(role))
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher()
+
+
+def admission_limit(config):
+    """Logins admitidos a la vez: PASSWORD_HASH_MAX_PENDING o WEB_THREADS - 2 (al menos 1)."""
+    explicit = config.get('PASSWORD_HASH_MAX_PENDING')
+    if explicit:
+        return max(1, int(explicit))
+    return max(1, int(config.get('WEB_THREADS', 8)) - 2)
+
+
+def configure_password_hasher(config):
+    """Reconstruye el hasher global con PASSWORD_HASH_* de la configuración."""
+    global password_hasher
+    previous = password_hasher
+    password_hasher = PasswordHasher(
+        methods={
+            'admin': config.get('PASSWORD_HASH_ADMIN', DEFAULT_HASH_METHODS['admin']),
+            'user': config.get('PASSWORD_HASH_USER', DEFAULT_HASH_METHODS['user'])
+        },
+        workers=int(config.get('PASSWORD_HASH_WORKERS', 2)),
+        max_pending=admission_limit(config)
+    )
+    previous.shutdown()
+    return password_hasher
+
+
+def rehash_after_login(user, password):
+    """
+    Actualiza el hash tras un login correcto si los parámetros del rol
+    cambiaron. Si el pool está saturado se deja para el próximo login.
+    """
+    from shared.models import db
+
+    try:
+        if user.rehash_password_if_needed(password):
+            db.session.commit()
+    except PasswordVerifierBusy:
+        db.session.rollback()
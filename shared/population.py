@@ -0,0 +1,319 @@
+# shared/population.py
+"""
+Histogramas de BPM de la población para comparar a un paciente con su grupo
+("su pulso en reposo está en el percentil 95 de su franja de edad y
+condición") sin recorrer ``sensor_data``.
+
+Hay un histograma por (franja de edad, condición, hora UTC del día) con un
+contador por cada BPM entero de 30 a 220 (191 cubetas): es un resumen exacto,
+no aproximado, porque el dominio es pequeño, y se combina sumando. Los
+percentiles de un grupo suman las horas pedidas (24 × 191 enteros) y buscan
+en el acumulado: microsegundos.
+
+Todos los histogramas (~770 KB de uint32) viven en un archivo mapeado del
+volumen compartido, como el buffer en vivo: la ingesta de cualquier worker
+suma la lectura nueva bajo flock y las páginas de admin leen sin bloqueo. El
+lote ``flask build-population`` los reconstruye desde la BD (p.ej. los
+últimos 30 días, cada noche); las lecturas que lleguen durante el lote
+pueden contarse dos veces o ninguna, lo que no mueve un percentil.
+
+El percentil en reposo suma las horas de POPULATION_RESTING_HOURS (por
+defecto ``0-6``, de 00:00 a 05:59), que son horas locales de
+POPULATION_TIMEZONE (p.ej. ``America/Guayaquil``; por defecto UTC). Se pasan
+a horas UTC con el desfase vigente al consultar, así que tras un cambio de
+horario las lecturas del último mes quedan desplazadas una hora como mucho;
+en zonas con desfase de media hora se redondea hacia abajo.
+
+El planificador (shared/jobs.py) lo reconstruye cada noche; a mano:
+    flask --app admin.app_admin build-population --days 30
+"""
+import struct
+from datetime import datetime, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+from shared.shm import SharedMapping
+
+BPM_MIN = 30
+BPM_MAX = 220
+BINS = BPM_MAX - BPM_MIN + 1
+
+# Límite inferior de cada franja; la última cubre a los pacientes sin edad
+AGE_BANDS = ((0, '<30'), (30, '30-44'), (45, '45-59'), (60, '60-74'), (75, '75+'))
+UNKNOWN_AGE = len(AGE_BANDS)
+CONDITIONS = ('', 'arritmia', 'taquicardia', 'bradicardia', 'hipertension', 'cardiopatia', 'otra')
+HOURS = 24
+
+# Horas locales [inicio, fin) con las que se compara el pulso en reposo
+DEFAULT_RESTING_HOURS = (0, 6)
+
+MAGIC = b'HTPS'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sIII')  # magic, versión, cubetas, generación
+SHAPE = (len(AGE_BANDS) + 1, len(CONDITIONS), HOURS, BINS)
+
+
+def age_band(age):
+    """Índice de franja de edad (UNKNOWN_AGE si falta)."""
+    if not age:
+        return UNKNOWN_AGE
+    band = 0
+    for index, (lower, _) in enumerate(AGE_BANDS):
+        if age >= lower:
+            band = index
+    return band
+
+
+def age_band_label(age):
+    band = age_band(age)
+    return 'sin edad' if band == UNKNOWN_AGE else AGE_BANDS[band][1]
+
+
+def condition_index(heart_condition):
+    heart_condition = heart_condition or ''
+    return CONDITIONS.index(heart_condition) if heart_condition in CONDITIONS else len(CONDITIONS) - 1
+
+
+def _bin(bpm):
+    return min(max(int(bpm), BPM_MIN), BPM_MAX) - BPM_MIN
+
+
+class PopulationSketches:
+    """
+    Args:
+        path (str): Archivo mapeado (volumen compartido)
+    """
+
+    def __init__(self, path):
+        self._map = SharedMapping(path, _HEADER.size + int(np.prod(SHAPE)) * 4,
+                                  initializer=self._write_header,
+                                  is_valid=self._header_matches)
+        self.counts = np.ndarray(SHAPE, dtype=np.uint32, buffer=self._map.buf, offset=_HEADER.size)
+
+    def _write_header(self, buf):
+        _HEADER.pack_into(buf, 0, MAGIC, FORMAT_VERSION, BINS, 0)
+
+    def _header_matches(self, buf):
+        return _HEADER.unpack_from(buf, 0)[:3] == (MAGIC, FORMAT_VERSION, BINS)
+
+    @property
+    def generation(self):
+        """Número de reconstrucciones completas."""
+        return _HEADER.unpack_from(self._map.buf, 0)[3]
+
+    def add(self, age, heart_condition, timestamp, bpm):
+        """Suma una lectura (ingesta)."""
+        key = (age_band(age), condition_index(heart_condition), timestamp.hour, _bin(bpm))
+        with self._map.locked():
+            self.counts[key] += 1
+
+    def replace(self, counts):
+        """Sustituye todos los histogramas (reconstrucción por lotes)."""
+        with self._map.locked() as buf:
+            self.counts[...] = counts
+            magic, version, bins, generation = _HEADER.unpack_from(buf, 0)
+            _HEADER.pack_into(buf, 0, magic, version, bins, (generation + 1) & 0xFFFFFFFF)
+
+    def histogram(self, age, heart_condition, hours=None):
+        """
+        Histograma combinado del grupo (suma de las horas pedidas).
+
+        Returns:
+            ndarray: BINS contadores (int64)
+        """
+        group = self.counts[age_band(age), condition_index(heart_condition)]
+        if hours is None:
+            return group.sum(axis=0, dtype=np.int64)
+        return group[list(hours)].sum(axis=0, dtype=np.int64)
+
+    def percentile_rank(self, bpm, age, heart_condition, hours=None):
+        """
+        Porcentaje de lecturas del grupo por debajo de ``bpm`` (la mitad de
+        las iguales cuenta como por debajo).
+
+        Returns:
+            float | None: None si el grupo no tiene lecturas
+        """
+        histogram = self.histogram(age, heart_condition, hours)
+        total = int(histogram.sum())
+        if total == 0:
+            return None
+        index = _bin(round(bpm))
+        below = int(histogram[:index].sum())
+        return round((below + histogram[index] / 2) / total * 100, 1)
+
+    def quantile(self, q, age, heart_condition, hours=None):
+        """BPM del cuantil ``q`` (0-1) del grupo, o None sin lecturas."""
+        cumulative = np.cumsum(self.histogram(age, heart_condition, hours))
+        if cumulative[-1] == 0:
+            return None
+        return int(np.searchsorted(cumulative, q * cumulative[-1])) + BPM_MIN
+
+    def close(self):
+        # El mmap no se puede cerrar mientras el array de NumPy lo referencie
+        self.counts = None
+        self._map.close()
+
+
+# ==================== RECONSTRUCCIÓN ====================
+
+def build_counts(connection, patients, since):
+    """
+    Histogramas de las lecturas desde ``since`` de los pacientes dados.
+
+    Args:
+        patients (iterable): Tuplas (id, age, heart_condition)
+
+    Returns:
+        tuple: (counts con forma SHAPE, lecturas contadas)
+    """
+    from shared.analytics import load_series
+
+    counts = np.zeros(SHAPE, dtype=np.uint32)
+    total = 0
+    for user_id, age, heart_condition in patients:
+        times, bpm = load_series(connection, user_id, since)
+        if len(bpm) == 0:
+            continue
+        hours = ((times // 3600) % HOURS).astype(np.intp)
+        bins = np.clip(bpm.astype(np.intp), BPM_MIN, BPM_MAX) - BPM_MIN
+        # Un bincount sobre (hora, cubeta) del paciente y se suma a su grupo
+        group = np.bincount(hours * BINS + bins, minlength=HOURS * BINS).reshape(HOURS, BINS)
+        counts[age_band(age), condition_index(heart_condition)] += group.astype(np.uint32)
+        total += len(bpm)
+    return counts, total
+
+
+def rebuild_population(days=30):
+    """
+    Reconstruye los histogramas del proceso con las lecturas de los últimos
+    ``days`` días de los pacientes activos. Requiere contexto de aplicación.
+    Con ``sensor_data`` repartida cada shard se cuenta en paralelo y se suman.
+
+    Returns:
+        dict: patients, readings, elapsed
+    """
+    import time
+    from datetime import datetime, timedelta
+    from shared.models import User
+    from shared.shards import scatter
+
+    if _sketches is None:
+        raise RuntimeError('Histogramas de población no disponibles (POPULATION_SKETCH_PATH)')
+    started = time.perf_counter()
+    patients = User.query.with_entities(User.id, User.age, User.heart_condition)\
+        .filter_by(role='user', is_deleted=False).order_by(User.id).all()
+    since = datetime.utcnow() - timedelta(days=days)
+    partials = scatter(lambda connection, group: build_counts(connection, group, since),
+                       patients, key=lambda patient: patient[0])
+    counts = np.zeros(SHAPE, dtype=np.uint32)
+    total = 0
+    for shard_counts, shard_total in partials:
+        counts += shard_counts
+        total += shard_total
+    _sketches.replace(counts)
+    return {'patients': len(patients), 'readings': total, 'elapsed': round(time.perf_counter() - started, 2)}
+
+
+# ==================== HORAS DE REPOSO ====================
+
+def parse_hour_range(text):
+    """
+    '0-6' -> (0, 6); '22-6' cruza la medianoche. Horas de 0 a 24, fin excluido.
+
+    Raises:
+        ValueError: Si el formato no es 'inicio-fin' o las horas no son válidas
+    """
+    start, end = (int(part) for part in text.split('-'))
+    if not (0 <= start < HOURS and 0 <= end <= HOURS) or start == end % HOURS:
+        raise ValueError(f'Rango de horas inválido: {text}')
+    return start, end
+
+
+def resting_hours_utc(timezone=None, hours=DEFAULT_RESTING_HOURS, now=None):
+    """Horas UTC del histograma que corresponden a las horas locales de reposo."""
+    start, end = hours
+    local = range(start, end) if start < end else list(range(start, HOURS)) + list(range(0, end))
+    offset = 0
+    if timezone is not None:
+        offset = int((now or datetime.utcnow()).replace(tzinfo=dt_timezone.utc)
+                     .astimezone(timezone).utcoffset().total_seconds() // 3600)
+    return tuple((hour - offset) % HOURS for hour in local)
+
+
+# ==================== INSTANCIA DEL PROCESO ====================
+
+_sketches = None
+_timezone = None
+_resting_hours = DEFAULT_RESTING_HOURS
+
+
+def init_population(app):
+    """
+    Returns:
+        PopulationSketches | None: None si el archivo no está disponible
+    """
+    global _sketches, _timezone, _resting_hours
+    path = app.config.get('POPULATION_SKETCH_PATH')
+    if not path:
+        return None
+    try:
+        _timezone = ZoneInfo(app.config.get('POPULATION_TIMEZONE') or 'UTC')
+        _resting_hours = parse_hour_range(app.config.get('POPULATION_RESTING_HOURS') or '0-6')
+    except (ValueError, ZoneInfoNotFoundError) as e:
+        print(f"⚠️ Configuración de horas de reposo inválida, se usan 0-6 UTC: {e}")
+        _timezone, _resting_hours = None, DEFAULT_RESTING_HOURS
+    try:
+        _sketches = PopulationSketches(path)
+    except OSError as e:
+        print(f"⚠️ Histogramas de población no disponibles: {e}")
+        return None
+    return _sketches
+
+
+def get_population():
+    return _sketches
+
+
+def release_population():
+    """Cierra el mapeo del proceso (antes de reabrirlo tras un fork)."""
+    global _sketches
+    if _sketches is not None:
+        _sketches.close()
+        _sketches = None
+
+
+def reset_population():
+    if _sketches is not None:
+        _sketches.replace(np.zeros(SHAPE, dtype=np.uint32))
+
+
+def record_reading(user, sensor_data):
+    """Suma la lectura de la ingesta al histograma de su grupo."""
+    if _sketches is not None:
+        _sketches.add(user.age, user.heart_condition, sensor_data.timestamp, sensor_data.bpm)
+
+
+def compare_to_population(user, avg_bpm, resting_bpm=None):
+    """
+    Percentiles del paciente dentro de su franja de edad y condición.
+
+    Returns:
+        dict | None: group, avg_percentile, resting_percentile, median_bpm
+    """
+    if _sketches is None:
+        return None
+    avg_percentile = _sketches.percentile_rank(avg_bpm, user.age, user.heart_condition) if avg_bpm else None
+    if avg_percentile is None:
+        return None
+    resting_percentile = None
+    if resting_bpm:
+        resting_percentile = _sketches.percentile_rank(resting_bpm, user.age, user.heart_condition,
+                                                       resting_hours_utc(_timezone, _resting_hours))
+    return {
+        'group': f"{age_band_label(user.age)} · {user.heart_condition or 'sin condición'}",
+        'avg_percentile': avg_percentile,
+        'resting_percentile': resting_percentile,
+        'median_bpm': _sketches.quantile(0.5, user.age, user.heart_condition),
+    }
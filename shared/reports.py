@@ -0,0 +1,347 @@
+# shared/reports.py
+"""
+Reportes descargables por paciente sobre un rango de fechas arbitrario.
+
+El contenido es el del reporte detallado del admin (perfil, estadísticas,
+evolución, posición frente a su grupo) más los episodios de alerta y el
+análisis de la serie del rango. Se construye solo con agregados SQL (una fila
+por día) y se renderiza como un HTML autónomo e imprimible: CSS en línea y
+gráfica SVG generada en el servidor, sin recursos externos.
+
+Generarlo puede tardar segundos con rangos largos, así que lo hace el
+planificador (trabajo ``patient-report`` en shared/jobs.py) en sus hilos:
+
+    POST /admin/api/reports            encola (o devuelve ya el archivo si existe)
+    GET  /admin/api/reports/<job_id>   estado del trabajo
+    GET  /admin/reports/<key>/download descarga
+
+Los archivos se guardan por contenido: la clave es el SHA-256 de todo lo que
+determina el reporte (formato, perfil del paciente, rango y una huella barata
+de sus lecturas, episodios, resúmenes y población). Pedir el mismo reporte
+sin cambios en los datos reutiliza el archivo sin encolar nada; dos peticiones
+iguales simultáneas comparten trabajo (su nombre incluye la clave).
+"""
+import hashlib
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from flask import current_app, render_template
+from sqlalchemy import case, func, select
+
+from shared.models import db, User, SensorData, AlertEpisode, HealthDigest, ScheduledJob
+from shared.shards import readings_session
+
+REPORT_FORMAT = 1  # Subirlo al cambiar la plantilla o los cálculos invalida los archivos
+MAX_RANGE_DAYS = 366
+EPISODE_LIMIT = 50
+KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+CHART_WIDTH = 800
+CHART_HEIGHT = 220
+
+
+class InvalidReportRange(ValueError):
+    pass
+
+
+def parse_range(start, end, today=None):
+    """
+    Fechas 'YYYY-MM-DD' (ambas incluidas) -> (date, date). Por defecto, los
+    últimos 30 días.
+    """
+    today = today or datetime.utcnow().date()
+    try:
+        end_date = date.fromisoformat(end) if end else today
+        start_date = date.fromisoformat(start) if start else end_date - timedelta(days=29)
+    except (TypeError, ValueError):
+        raise InvalidReportRange('Fechas no válidas (formato AAAA-MM-DD)')
+    if start_date > end_date:
+        raise InvalidReportRange('La fecha inicial es posterior a la final')
+    if (end_date - start_date).days + 1 > MAX_RANGE_DAYS:
+        raise InvalidReportRange(f'El rango máximo es de {MAX_RANGE_DAYS} días')
+    return start_date, end_date
+
+
+def _bounds(start_date, end_date):
+    begin = datetime.combine(start_date, datetime.min.time())
+    return begin, datetime.combine(end_date, datetime.min.time()) + timedelta(days=1)
+
+
+# ==================== ALMACÉN ====================
+
+class ReportStore:
+    """
+    Archivos ``<dir>/<2 primeros>/<clave>.html``. La fecha de modificación se
+    renueva al reutilizarlos: ``prune`` borra los que llevan más tiempo sin uso.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        if not KEY_PATTERN.match(key):
+            raise ValueError(f'Clave de reporte no válida: {key}')
+        return os.path.join(self.directory, key[:2], f'{key}.html')
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def touch(self, key):
+        try:
+            os.utime(self.path(key))
+        except OSError:
+            pass
+
+    def write(self, key, content):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Escritura atómica: quien descargue nunca ve un archivo a medias
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temporary, path)
+        return os.path.getsize(path)
+
+    def prune(self, max_age_days):
+        """Borra los reportes sin usar en ``max_age_days`` días. Retorna (archivos, bytes)."""
+        cutoff = datetime.utcnow().timestamp() - max_age_days * 86400
+        removed = freed = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    if stat.st_mtime < cutoff:
+                        os.remove(path)
+                        removed += 1
+                        freed += stat.st_size
+                except OSError:
+                    continue
+        return removed, freed
+
+
+def get_store():
+    return ReportStore(current_app.config['REPORT_DIR'])
+
+
+# ==================== CLAVE ====================
+
+def _fingerprint(user, begin, end):
+    """
+    Huella de los datos del rango sin leer las lecturas: COUNT/MIN/MAX(id)
+    salen del índice (user_id, timestamp), que incluye el id en SQLite.
+    Cambia al ingerir o borrar lecturas del rango.
+    """
+    from shared.population import get_population
+
+    readings = readings_session(user.id).execute(
+        select(func.count(SensorData.id), func.min(SensorData.id), func.max(SensorData.id))
+        .where(SensorData.user_id == user.id, SensorData.timestamp >= begin, SensorData.timestamp < end)
+    ).one()
+    episodes = db.session.execute(
+        select(func.count(AlertEpisode.id), func.max(AlertEpisode.id), func.max(AlertEpisode.last_seen_at),
+               func.count(AlertEpisode.ended_at))
+        .where(AlertEpisode.user_id == user.id, AlertEpisode.started_at >= begin, AlertEpisode.started_at < end)
+    ).one()
+    digests = db.session.execute(
+        select(func.max(HealthDigest.id))
+        .where(HealthDigest.user_id == user.id, HealthDigest.digest_date < end.date())
+    ).scalar()
+    sketches = get_population()
+    return [list(readings), [str(value) for value in episodes], digests,
+            sketches.generation if sketches else None]
+
+
+def report_key(user, start_date, end_date):
+    begin, end = _bounds(start_date, end_date)
+    identity = {
+        'format': REPORT_FORMAT,
+        'user': [user.id, user.username, user.email, user.device_code, user.age, user.heart_condition,
+                 user.min_safe_bpm, user.max_safe_bpm],
+        'range': [start_date.isoformat(), end_date.isoformat()],
+        'data': _fingerprint(user, begin, end),
+    }
+    return hashlib.sha256(json.dumps(identity, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def download_name(user, start_date, end_date):
+    return f'reporte_{user.username}_{start_date.isoformat()}_{end_date.isoformat()}.html'
+
+
+# ==================== CONTENIDO ====================
+
+def _daily_rows(user, begin, end):
+    day = func.date(SensorData.timestamp).label('day')
+    rows = readings_session(user.id).execute(
+        select(day, func.count(SensorData.id), func.sum(case((SensorData.is_alert, 1), else_=0)),
+               func.avg(SensorData.bpm), func.min(SensorData.bpm), func.max(SensorData.bpm))
+        .where(SensorData.user_id == user.id, SensorData.timestamp >= begin, SensorData.timestamp < end)
+        .group_by(day).order_by(day)
+    ).all()
+    # SQLite devuelve la fecha como texto y MySQL como date
+    return [{'day': str(day_value)[:10], 'readings': count, 'alerts': int(alerts or 0),
+             'avg_bpm': round(float(avg), 1), 'min_bpm': low, 'max_bpm': high}
+            for day_value, count, alerts, avg, low, high in rows]
+
+
+def _weekly_rows(daily):
+    """Agrupa los días en semanas ISO (media ponderada por lecturas)."""
+    weeks = {}
+    for row in daily:
+        year, week, _ = date.fromisoformat(row['day']).isocalendar()
+        entry = weeks.setdefault((year, week), {'week': f'{year}-S{week:02d}', 'readings': 0, 'alerts': 0,
+                                                'bpm_sum': 0.0, 'min_bpm': row['min_bpm'],
+                                                'max_bpm': row['max_bpm']})
+        entry['readings'] += row['readings']
+        entry['alerts'] += row['alerts']
+        entry['bpm_sum'] += row['avg_bpm'] * row['readings']
+        entry['min_bpm'] = min(entry['min_bpm'], row['min_bpm'])
+        entry['max_bpm'] = max(entry['max_bpm'], row['max_bpm'])
+    return [dict(entry, avg_bpm=round(entry.pop('bpm_sum') / entry['readings'], 1))
+            for _, entry in sorted(weeks.items())]
+
+
+def _chart(daily, user):
+    """Polilíneas SVG de la media diaria, la banda mínimo-máximo y los límites."""
+    if not daily:
+        return None
+    low = min(min(row['min_bpm'] for row in daily), user.min_safe_bpm or 60) - 10
+    high = max(max(row['max_bpm'] for row in daily), user.max_safe_bpm or 120) + 10
+    step = CHART_WIDTH / max(len(daily) - 1, 1)
+
+    def y(bpm):
+        return round(CHART_HEIGHT - (bpm - low) / (high - low) * CHART_HEIGHT, 1)
+
+    def points(values):
+        return ' '.join(f'{round(i * step, 1)},{y(value)}' for i, value in enumerate(values))
+
+    band = points([row['max_bpm'] for row in daily]) + ' ' + ' '.join(
+        f'{round(i * step, 1)},{y(row["min_bpm"])}' for i, row in reversed(list(enumerate(daily))))
+    return {
+        'width': CHART_WIDTH,
+        'height': CHART_HEIGHT,
+        'average': points([row['avg_bpm'] for row in daily]),
+        'band': band,
+        'max_limit_y': y(user.max_safe_bpm or 120),
+        'min_limit_y': y(user.min_safe_bpm or 60),
+        'low': low,
+        'high': high,
+    }
+
+
+def build_report_context(user, start_date, end_date):
+    from shared.population import compare_to_population
+
+    begin, end = _bounds(start_date, end_date)
+    daily = _daily_rows(user, begin, end)
+    total_readings = sum(row['readings'] for row in daily)
+    alert_readings = sum(row['alerts'] for row in daily)
+    avg_bpm = (sum(row['avg_bpm'] * row['readings'] for row in daily) / total_readings
+               if total_readings else 0)
+
+    episodes = AlertEpisode.query.filter(
+        AlertEpisode.user_id == user.id, AlertEpisode.started_at >= begin, AlertEpisode.started_at < end
+    ).order_by(AlertEpisode.started_at.desc()).limit(EPISODE_LIMIT).all()
+    episode_counts = dict(db.session.query(AlertEpisode.kind, func.count(AlertEpisode.id)).filter(
+        AlertEpisode.user_id == user.id, AlertEpisode.started_at >= begin, AlertEpisode.started_at < end
+    ).group_by(AlertEpisode.kind).all())
+
+    # Último resumen dentro del rango: análisis de la serie (reposo, VFC, anomalías)
+    digest = HealthDigest.query.filter(
+        HealthDigest.user_id == user.id, HealthDigest.digest_date <= end_date
+    ).order_by(HealthDigest.digest_date.desc()).first()
+
+    return dict(user=user,
+                start_date=start_date,
+                end_date=end_date,
+                generated_at=datetime.utcnow(),
+                total_readings=total_readings,
+                alert_readings=alert_readings,
+                avg_bpm=avg_bpm,
+                min_bpm=min((row['min_bpm'] for row in daily), default=None),
+                max_bpm=max((row['max_bpm'] for row in daily), default=None),
+                daily_data=daily,
+                weekly_data=_weekly_rows(daily),
+                chart=_chart(daily, user),
+                episodes=episodes,
+                episode_counts=episode_counts,
+                digest=digest,
+                population=compare_to_population(user, avg_bpm, digest.resting_bpm if digest else None))
+
+
+def generate_report(user_id, start, end):
+    """
+    Cuerpo del trabajo ``patient-report``: calcula la clave con los datos
+    actuales y renderiza el archivo si no existe ya.
+
+    Returns:
+        dict: key, filename, size, readings, reused
+    """
+    user = db.session.get(User, user_id)
+    if user is None:
+        raise LookupError(f'El paciente {user_id} ya no existe')
+    start_date, end_date = parse_range(start, end)
+    store = get_store()
+    key = report_key(user, start_date, end_date)
+    result = {'key': key, 'filename': download_name(user, start_date, end_date)}
+    if store.exists(key):
+        store.touch(key)
+        return dict(result, size=os.path.getsize(store.path(key)), readings=None, reused=True)
+
+    context = build_report_context(user, start_date, end_date)
+    size = store.write(key, render_template('reports/patient_report.html', **context))
+    return dict(result, size=size, readings=context['total_readings'], reused=False)
+
+
+# ==================== PETICIONES ====================
+
+def submit_report(user, start_date, end_date):
+    """
+    Devuelve el reporte si ya existe para los datos actuales; si no, encola
+    su generación (o reutiliza el trabajo igual ya encolado).
+
+    Returns:
+        dict: status ('ready' o el del trabajo), key o job_id, filename
+    """
+    from sqlalchemy.exc import IntegrityError
+    from shared.scheduler import enqueue, run_now
+
+    store = get_store()
+    key = report_key(user, start_date, end_date)
+    filename = download_name(user, start_date, end_date)
+    if store.exists(key):
+        store.touch(key)
+        return {'status': 'ready', 'key': key, 'filename': filename}
+
+    name = f'patient-report:{key}'
+    entry = ScheduledJob.query.filter_by(name=name).first()
+    if entry is None:
+        try:
+            entry = enqueue('patient-report', {'user_id': user.id, 'start': start_date.isoformat(),
+                                               'end': end_date.isoformat()}, name=name)
+            db.session.commit()
+        except IntegrityError:
+            # Otra petición igual lo encoló a la vez
+            db.session.rollback()
+            entry = ScheduledJob.query.filter_by(name=name).one()
+    elif entry.status != 'running' and run_now(entry.id, statuses=('failed', 'succeeded')):
+        # Falló, o terminó pero su archivo ya se purgó: otra vez
+        db.session.commit()
+        db.session.refresh(entry)
+    return {'status': entry.status, 'job_id': entry.id, 'filename': filename}
+
+
+def report_status(entry):
+    """Estado de un trabajo ``patient-report`` para la API de sondeo."""
+    status = {'job_id': entry.id, 'status': entry.status, 'attempts': entry.attempts}
+    if entry.status == 'succeeded':
+        result = json.loads(entry.last_result or '{}')
+        if result.get('key') and get_store().exists(result['key']):
+            status.update(key=result['key'], filename=result.get('filename'), size=result.get('size'))
+        else:
+            status['status'] = 'expired'
+    elif entry.status == 'failed' or entry.last_outcome == 'failed':
+        status['error'] = entry.last_error
+    return status
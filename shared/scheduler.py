@@ -0,0 +1,446 @@
+# shared/scheduler.py
+"""
+Planificador de trabajos en segundo plano compartido por ambas apps.
+
+Los trabajos se declaran con ``@job``: periódicos (``every``) o puntuales
+(``enqueue``). Cada ejecución pendiente es una fila de ``scheduled_jobs``, que
+hace a la vez de cola y de estado visible en /admin/jobs.
+
+Cada proceso worker arranca un ``Scheduler`` con un hilo que cada
+``poll_interval`` segundos:
+    - renueva el arrendamiento (lease) de los trabajos que está ejecutando;
+    - reclama los trabajos vencidos que su rol sabe ejecutar con un UPDATE
+      condicional, como el despachador de notificaciones: si varios procesos
+      lo intentan a la vez, solo uno lo consigue;
+    - los ejecuta en hilos propios, con como mucho ``workers`` a la vez por
+      proceso y ``concurrency`` a la vez por definición entre todos los
+      procesos (límite comprobado antes de reclamar, no dentro del UPDATE).
+
+Si un proceso muere con un trabajo en curso, su arrendamiento vence y otro
+proceso lo reclama de nuevo, así que los trabajos deben ser idempotentes. Un
+trabajo puntual que falla se reintenta con espera exponencial hasta
+``max_attempts`` veces; uno periódico vuelve a programarse para su
+siguiente turno en cualquier caso.
+
+Uso:
+    @job('purge-notifications', every=timedelta(hours=6))
+    def purge_notifications(days=30):
+        ...
+
+    enqueue('purge-notifications', payload={'days': 7}); db.session.commit()
+    flask --app admin.app_admin run-job build-population --payload '{"days": 7}'
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from shared.models import db, ScheduledJob
+
+RETRY_BASE = 30  # Segundos antes del primer reintento de un trabajo puntual
+RESULT_MAX_LENGTH = 4000
+
+JOBS = {}
+
+
+# ==================== DEFINICIONES ====================
+
+class JobDefinition:
+    """
+    Args:
+        name (str): Nombre único (el de la fila de los periódicos)
+        func: Función a ejecutar con los argumentos del payload; puede
+            devolver un dict que se guarda como resultado
+        every (timedelta): Periodo, o None para trabajos solo puntuales
+        roles (tuple): Roles de app que lo ejecutan (None = todos)
+        concurrency (int): Ejecuciones simultáneas entre todos los procesos
+        max_attempts (int): Intentos de un trabajo puntual antes de 'failed'
+    """
+
+    def __init__(self, name, func, every=None, roles=None, concurrency=1, max_attempts=3):
+        self.name = name
+        self.func = func
+        self.interval = int(every.total_seconds()) if every is not None else None
+        self.roles = roles
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.description = (func.__doc__ or '').strip().split('\n')[0]
+
+    @property
+    def is_periodic(self):
+        return self.interval is not None
+
+
+def job(name, every=None, roles=None, concurrency=1, max_attempts=3):
+    """Registra la función decorada como trabajo (ver JobDefinition)."""
+    def decorator(func):
+        JOBS[name] = JobDefinition(name, func, every, roles, concurrency, max_attempts)
+        return func
+    return decorator
+
+
+def _load_jobs():
+    import shared.jobs  # noqa: F401 (registra los trabajos de mantenimiento)
+    return JOBS
+
+
+def definitions_for(role):
+    return {name: definition for name, definition in _load_jobs().items()
+            if definition.roles is None or role in definition.roles}
+
+
+# ==================== COLA ====================
+
+def enqueue(job_name, payload=None, run_at=None, name=None):
+    """
+    Añade una ejecución puntual dentro de la transacción del llamador (el
+    commit lo hace él, como al encolar notificaciones).
+
+    Args:
+        payload (dict): Argumentos de la función (serializables en JSON)
+        run_at (datetime): Primer intento (por defecto, ya)
+        name (str): Nombre único; repetirlo hace fallar el commit (deduplicación)
+
+    Returns:
+        ScheduledJob
+    """
+    if job_name not in _load_jobs():
+        raise KeyError(f'Trabajo desconocido: {job_name}')
+    entry = ScheduledJob(
+        name=name or f'{job_name}:{uuid.uuid4().hex[:12]}',
+        job=job_name,
+        payload=json.dumps(payload) if payload else None,
+        status='scheduled',
+        next_run_at=run_at or datetime.utcnow()
+    )
+    db.session.add(entry)
+    db.session.flush()
+    return entry
+
+
+def run_now(job_id, statuses=('scheduled', 'failed')):
+    """
+    Adelanta un trabajo programado o reintenta uno puntual fallido. Retorna True si cambió.
+
+    Args:
+        statuses (tuple): Estados desde los que se permite (nunca 'running')
+    """
+    return ScheduledJob.query.filter(
+        ScheduledJob.id == job_id,
+        ScheduledJob.status.in_(statuses)
+    ).update({'status': 'scheduled', 'next_run_at': datetime.utcnow(), 'attempts': 0},
+             synchronize_session=False) > 0
+
+
+def sync_periodic_jobs(definitions):
+    """Crea la fila de cada trabajo periódico que falte y actualiza su periodo si cambió."""
+    periodic = {name: d for name, d in definitions.items() if d.is_periodic}
+    if not periodic:
+        return
+    now = datetime.utcnow()
+    existing = {row.name: row for row in ScheduledJob.query.filter(ScheduledJob.name.in_(list(periodic)))}
+    for name, definition in periodic.items():
+        row = existing.get(name)
+        if row is None:
+            db.session.add(ScheduledJob(name=name, job=name, interval_seconds=definition.interval,
+                                        status='scheduled', next_run_at=now))
+        elif row.interval_seconds != definition.interval:
+            row.interval_seconds = definition.interval
+            row.next_run_at = min(row.next_run_at, now + timedelta(seconds=definition.interval))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Otro proceso las creó a la vez
+        db.session.rollback()
+
+
+def _next_slot(scheduled_for, interval, now):
+    """Siguiente turno del periodo posterior a ``now`` (se saltan los perdidos)."""
+    missed = max(0, int((now - scheduled_for).total_seconds() // interval))
+    return scheduled_for + timedelta(seconds=interval * (missed + 1))
+
+
+# ==================== PLANIFICADOR ====================
+
+class Scheduler:
+    """
+    Args:
+        app: Aplicación Flask (contexto de BD de los trabajos)
+        definitions (dict): Trabajos que este proceso sabe ejecutar
+        workers (int): Trabajos simultáneos en este proceso
+        poll_interval (float): Segundos entre ciclos
+        lease_seconds (int): Duración del arrendamiento (se renueva cada ciclo)
+    """
+
+    def __init__(self, app, definitions, workers=2, poll_interval=5, lease_seconds=60):
+        self.app = app
+        self.definitions = definitions
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._running = {}  # id de la fila -> hilo
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._synced = False
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='job-scheduler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        """
+        Deja de reclamar trabajos y espera ``timeout`` segundos a los que están
+        en curso. Los que sigan corriendo liberan su arrendamiento para que otro
+        proceso los retome (sus hilos mueren con el proceso).
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        deadline = time.monotonic() + timeout
+        for thread in self._threads():
+            thread.join(max(0, deadline - time.monotonic()))
+        unfinished = [job_id for job_id, thread in self._snapshot().items() if thread.is_alive()]
+        if unfinished:
+            with self.app.app_context():
+                ScheduledJob.query.filter(
+                    ScheduledJob.id.in_(unfinished), ScheduledJob.lease_owner == self.owner
+                ).update({'lease_expires_at': datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+            print(f"⚠️ {len(unfinished)} trabajo(s) interrumpidos: otro proceso los retomará")
+
+    def _snapshot(self):
+        with self._lock:
+            return dict(self._running)
+
+    def _threads(self):
+        return list(self._snapshot().values())
+
+    @property
+    def active(self):
+        return sum(1 for thread in self._threads() if thread.is_alive())
+
+    def _run(self):
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                self.tick()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                print(f"❌ Error en el planificador de trabajos: {e}")
+            # Con la BD caída (o sin migrar) se espera cada vez más, hasta un minuto
+            self._stop.wait(min(self.poll_interval * 2 ** failures, 60))
+
+    def tick(self):
+        """Un ciclo: renovar, reclamar y lanzar. Retorna el número de trabajos lanzados."""
+        with self.app.app_context():
+            if not self._synced:
+                sync_periodic_jobs(self.definitions)
+                self._synced = True
+            self._renew_leases()
+            free = self.workers - self.active
+            claimed = self._claim(free) if free > 0 and not self._stop.is_set() else []
+        for job_id, definition, payload in claimed:
+            self._spawn(job_id, definition, payload)
+        return len(claimed)
+
+    def _renew_leases(self):
+        ids = list(self._snapshot())
+        if not ids:
+            return
+        ScheduledJob.query.filter(
+            ScheduledJob.id.in_(ids),
+            ScheduledJob.lease_owner == self.owner,
+            ScheduledJob.status == 'running'
+        ).update({'lease_expires_at': datetime.utcnow() + timedelta(seconds=self.lease_seconds)},
+                 synchronize_session=False)
+        db.session.commit()
+
+    def _claim(self, limit):
+        now = datetime.utcnow()
+        candidates = ScheduledJob.query.filter(
+            ScheduledJob.job.in_(list(self.definitions)),
+            db.or_(
+                db.and_(ScheduledJob.status == 'scheduled', ScheduledJob.next_run_at <= now),
+                db.and_(ScheduledJob.status == 'running', ScheduledJob.lease_expires_at < now)
+            )
+        ).order_by(ScheduledJob.next_run_at).limit(limit * 2).all()
+        if not candidates:
+            return []
+
+        running = dict(db.session.query(ScheduledJob.job, func.count(ScheduledJob.id)).filter(
+            ScheduledJob.status == 'running', ScheduledJob.lease_expires_at >= now
+        ).group_by(ScheduledJob.job).all())
+
+        claimed = []
+        for row in candidates:
+            if len(claimed) >= limit:
+                break
+            definition = self.definitions[row.job]
+            if running.get(row.job, 0) >= definition.concurrency:
+                continue
+            # Reclamo atómico: solo si nadie cambió la fila desde que se leyó
+            current = ScheduledJob.query.filter_by(
+                id=row.id, status=row.status, lease_owner=row.lease_owner, lease_expires_at=row.lease_expires_at
+            )
+            if row.status == 'running' and not row.is_periodic and row.attempts >= definition.max_attempts:
+                # Su proceso murió en el último intento permitido
+                current.update({'status': 'failed', 'lease_owner': None, 'lease_expires_at': None,
+                                'last_outcome': 'failed', 'last_finished_at': now,
+                                'last_error': 'Arrendamiento vencido: el proceso que lo ejecutaba terminó'},
+                               synchronize_session=False)
+                continue
+            if current.update({
+                'status': 'running',
+                'lease_owner': self.owner,
+                'lease_expires_at': now + timedelta(seconds=self.lease_seconds),
+                'attempts': ScheduledJob.attempts + 1,
+                'last_started_at': now
+            }, synchronize_session=False):
+                claimed.append((row.id, definition, row.payload))
+                running[row.job] = running.get(row.job, 0) + 1
+        db.session.commit()
+        return claimed
+
+    def _spawn(self, job_id, definition, payload):
+        thread = threading.Thread(target=self._execute, args=(job_id, definition, payload),
+                                  name=f'job-{definition.name}', daemon=True)
+        with self._lock:
+            self._running[job_id] = thread
+        thread.start()
+        return thread
+
+    def _execute(self, job_id, definition, payload):
+        from shared import metrics
+
+        started = time.monotonic()
+        outcome, error, result = 'succeeded', None, None
+        try:
+            with self.app.app_context():
+                result = definition.func(**json.loads(payload or '{}'))
+        except Exception as e:
+            outcome, error = 'failed', f'{type(e).__name__}: {e}'
+            traceback.print_exc()
+        duration = time.monotonic() - started
+
+        try:
+            with self.app.app_context():
+                self._finish(job_id, definition, outcome, error, result, duration)
+        except Exception as e:
+            print(f"❌ No se pudo registrar el final del trabajo {definition.name}: {e}")
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+
+        metrics.job_runs.inc(definition.name, outcome)
+        metrics.job_duration.observe(duration, definition.name)
+        metrics.registry.flush()
+        if outcome == 'succeeded':
+            print(f"⏱️ Trabajo {definition.name} completado en {duration:.1f}s")
+        else:
+            print(f"❌ Trabajo {definition.name} fallido tras {duration:.1f}s: {error}")
+
+    def _finish(self, job_id, definition, outcome, error, result, duration):
+        row = db.session.get(ScheduledJob, job_id)
+        now = datetime.utcnow()
+        values = {
+            'lease_owner': None,
+            'lease_expires_at': None,
+            'run_count': ScheduledJob.run_count + 1,
+            'last_finished_at': now,
+            'last_duration': round(duration, 3),
+            'last_outcome': outcome,
+            'last_error': error[:1000] if error else None,
+            'last_result': json.dumps(result, default=str)[:RESULT_MAX_LENGTH] if result is not None else None,
+        }
+        if row.is_periodic:
+            values.update(status='scheduled', attempts=0,
+                          next_run_at=_next_slot(row.next_run_at, row.interval_seconds, now))
+        elif outcome == 'succeeded':
+            values['status'] = 'succeeded'
+        elif row.attempts < definition.max_attempts:
+            values.update(status='scheduled',
+                          next_run_at=now + timedelta(seconds=RETRY_BASE * 2 ** (row.attempts - 1)))
+        else:
+            values['status'] = 'failed'
+
+        updated = ScheduledJob.query.filter_by(id=job_id, lease_owner=self.owner, status='running')\
+            .update(values, synchronize_session=False)
+        db.session.commit()
+        if not updated:
+            print(f"⚠️ Trabajo {definition.name}: el arrendamiento venció y lo reclamó otro proceso")
+
+    def run_inline(self, job_name, payload=None):
+        """
+        Ejecuta un trabajo en este proceso y espera a que termine (flask
+        run-job), registrándolo como puntual y renovando su arrendamiento.
+
+        Returns:
+            ScheduledJob | None: Fila final, o None si el límite de concurrencia lo impide
+        """
+        definition = self.definitions[job_name]
+        now = datetime.utcnow()
+        running = ScheduledJob.query.filter(
+            ScheduledJob.job == job_name, ScheduledJob.status == 'running', ScheduledJob.lease_expires_at >= now
+        ).count()
+        if running >= definition.concurrency:
+            return None
+        entry = enqueue(job_name, payload)
+        entry.status = 'running'
+        entry.lease_owner = self.owner
+        entry.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+        entry.attempts = definition.max_attempts  # Sin reintentos: el resultado se ve ya
+        entry.last_started_at = now
+        db.session.commit()
+        job_id = entry.id
+
+        thread = self._spawn(job_id, definition, entry.payload)
+        while thread.is_alive():
+            thread.join(self.poll_interval)
+            self._renew_leases()
+        db.session.expire_all()
+        return db.session.get(ScheduledJob, job_id)
+
+
+# ==================== INSTANCIA DEL PROCESO ====================
+
+_scheduler = None
+
+
+def create_scheduler(app):
+    return Scheduler(
+        app, definitions_for(app.config.get('APP_ROLE')),
+        workers=app.config.get('SCHEDULER_WORKERS', 2),
+        poll_interval=app.config.get('SCHEDULER_POLL_INTERVAL', 5),
+        lease_seconds=app.config.get('SCHEDULER_LEASE', 60)
+    )
+
+
+def start_scheduler(app):
+    """Arranca el planificador de la app (una vez por proceso, tras el fork)."""
+    global _scheduler
+    if _scheduler is None:
+        if not app.config.get('SCHEDULER_ENABLED', True):
+            print("ℹ️ Planificador de trabajos deshabilitado (SCHEDULER_ENABLED=0)")
+            return None
+        _scheduler = create_scheduler(app).start()
+        print(f"✅ Planificador de trabajos iniciado: {', '.join(sorted(_scheduler.definitions))}")
+    return _scheduler
+
+
+def stop_scheduler(timeout=5):
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop(timeout)
+        _scheduler = None
@@ -0,0 +1,302 @@
+# shared/shards.py
+"""
+Reparto horizontal opcional de ``sensor_data`` en varios archivos SQLite.
+
+Con una sola BD todas las ingestas compiten por el único escritor de SQLite,
+y cualquier lectura larga de ``sensor_data`` (reportes, resúmenes) retrasa las
+confirmaciones de todos los pacientes. Con ``SENSOR_SHARDS = N`` (N > 1) las
+lecturas de cada paciente viven en ``SENSOR_SHARD_DIR/sensor_data_{user_id % N}.db``:
+cada archivo tiene su propio bloqueo, así que las ingestas de pacientes en
+shards distintos escriben a la vez. El resto de tablas (usuarios, episodios,
+outbox, resúmenes) sigue en la BD principal.
+
+    readings_session(user_id)   sesión ORM del shard del paciente (db.session sin reparto)
+    readings_query(user_id)     equivalente a SensorData.query para ese paciente
+    readings_engine(user_id)    engine para SQL directo (carga masiva)
+    scatter(func, items)        agregados de toda la población: func(connection, items
+                                del shard) en todos los shards a la vez; retorna la lista
+
+Todas las lecturas de un paciente están en un mismo shard, así que las
+consultas por usuario no cambian; los agregados globales se reparten por
+shard en paralelo y se combinan en el llamador.
+
+La ingesta confirma la lectura en su shard y después los episodios y la
+outbox en la BD principal: ya no es una sola transacción. Si falla la segunda
+confirmación la lectura queda guardada sin su episodio.
+
+N no debe cambiar con datos cargados (los pacientes cambiarían de archivo).
+Para pasar una instalación existente a shards: ``flask shard-readings``.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask.globals import app_ctx
+from sqlalchemy import Column, Index, MetaData, Table, create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from shared.models import db, SensorData
+
+SHARD_FILE = 'sensor_data_{index}.db'
+
+
+def shard_index(user_id, count):
+    """Shard de un paciente (sin estado: lo usan también los procesos del lote)."""
+    return user_id % count if count > 1 else 0
+
+
+def shard_path(directory, index):
+    return os.path.join(directory, SHARD_FILE.format(index=index))
+
+
+def _shard_table():
+    """``sensor_data`` sin la clave foránea: ``users`` no existe en los shards."""
+    source = SensorData.__table__
+    table = Table(source.name, MetaData(),
+                  *[Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+                    for column in source.columns])
+    for index in source.indexes:
+        Index(index.name, *[table.c[column.name] for column in index.columns])
+    return table
+
+
+class ShardRouter:
+    """
+    Un engine y una sesión con ámbito (contexto de aplicación, como db.session)
+    por shard. Las lecturas no se modifican tras insertarlas, así que las
+    sesiones no expiran los objetos al confirmar (la ingesta no relee la fila).
+    """
+
+    def __init__(self, directory, count):
+        self.directory = directory
+        self.count = count
+        self.urls = ['sqlite:///' + shard_path(directory, i) for i in range(count)]
+        self.engines = [create_engine(url) for url in self.urls]
+        self.sessions = [scoped_session(sessionmaker(bind=engine, expire_on_commit=False),
+                                        scopefunc=lambda: id(app_ctx._get_current_object()))
+                         for engine in self.engines]
+        self.table = _shard_table()
+
+    def index(self, user_id):
+        return shard_index(user_id, self.count)
+
+    def create_schema(self):
+        """Crea la tabla en cada shard; IF NOT EXISTS porque varios procesos pueden arrancar a la vez."""
+        os.makedirs(self.directory, exist_ok=True)
+        for engine in self.engines:
+            with engine.begin() as connection:
+                connection.execute(CreateTable(self.table, if_not_exists=True))
+                for index in self.table.indexes:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+
+    def drop_schema(self):
+        for engine in self.engines:
+            self.table.drop(engine, checkfirst=True)
+
+    def stray_files(self):
+        """Archivos de shards por encima de N: señal de que N cambió con datos cargados."""
+        stray = []
+        index = self.count
+        while os.path.exists(shard_path(self.directory, index)):
+            stray.append(shard_path(self.directory, index))
+            index += 1
+        return stray
+
+    def remove_sessions(self):
+        for session in self.sessions:
+            session.remove()
+
+    def dispose(self, close=True):
+        for engine in self.engines:
+            engine.dispose(close=close)
+
+
+# ==================== INSTANCIA DEL PROCESO ====================
+
+_router = None
+
+
+def init_shards(app):
+    """
+    Returns:
+        ShardRouter | None: None si el reparto está desactivado (SENSOR_SHARDS <= 1)
+    """
+    global _router
+    count = app.config.get('SENSOR_SHARDS') or 0
+    if count <= 1:
+        return None
+    _router = ShardRouter(app.config['SENSOR_SHARD_DIR'], count)
+    for path in _router.stray_files():
+        print(f"⚠️ Shard fuera de rango (¿cambió SENSOR_SHARDS?): {path}")
+
+    @app.teardown_appcontext
+    def remove_shard_sessions(exception=None):
+        if _router is not None:
+            _router.remove_sessions()
+
+    print(f"🧩 sensor_data repartida en {count} shards ({_router.directory})")
+    return _router
+
+
+def get_router():
+    return _router
+
+
+def release_shards(close=True):
+    """Descarta las conexiones del proceso (close=False tras un fork: son del maestro)."""
+    if _router is not None:
+        _router.dispose(close=close)
+
+
+def create_shard_schema():
+    if _router is not None:
+        _router.create_schema()
+
+
+def reset_shards():
+    """Vacía los shards (``flask init-db --reset``: los ids de usuario se reutilizan)."""
+    if _router is not None:
+        _router.remove_sessions()
+        _router.drop_schema()
+        _router.create_schema()
+
+
+def shard_urls():
+    """URIs de los shards para procesos externos (lote de resúmenes); None sin reparto."""
+    return list(_router.urls) if _router is not None else None
+
+
+# ==================== ENRUTADO ====================
+
+def readings_session(user_id):
+    """Sesión donde viven las lecturas del paciente."""
+    if _router is None:
+        return db.session
+    return _router.sessions[_router.index(user_id)]
+
+
+def readings_query(user_id):
+    """Consulta de SensorData en el shard del paciente (sin filtrar: el llamador filtra por user_id)."""
+    if _router is None:
+        return SensorData.query
+    return readings_session(user_id).query(SensorData)
+
+
+def readings_engine(user_id):
+    if _router is None:
+        return db.engine
+    return _router.engines[_router.index(user_id)]
+
+
+def commit_readings(session):
+    """Confirma la sesión de lecturas si no es la principal (esa la confirma el llamador)."""
+    if session is not db.session:
+        session.commit()
+
+
+def delete_user_readings(user_ids):
+    """
+    Borra todas las lecturas de los usuarios. Sin reparto el borrado queda en
+    db.session y lo confirma el llamador con el resto de cambios; con reparto
+    se confirma ya en cada shard.
+
+    Returns:
+        int: Lecturas borradas
+    """
+    # Un DELETE ... IN por shard, no uno por usuario
+    groups = []
+    for user_id in user_ids:
+        session = readings_session(user_id)
+        for grouped_session, grouped_ids in groups:
+            if grouped_session is session:
+                grouped_ids.append(user_id)
+                break
+        else:
+            groups.append((session, [user_id]))
+    deleted = 0
+    for session, grouped_ids in groups:
+        deleted += session.query(SensorData).filter(SensorData.user_id.in_(grouped_ids)).delete()
+        commit_readings(session)
+    return deleted
+
+
+def scatter(func, items, key=None):
+    """
+    Reparte ``items`` por shard y ejecuta ``func(connection, items_del_shard)``
+    en paralelo, un hilo por shard con elementos (SQLite suelta el GIL mientras
+    ejecuta). Sin reparto es una sola llamada sobre la BD principal.
+
+    Args:
+        items (iterable): ids de usuario, o elementos de los que ``key`` saca el id
+        key (callable): elemento -> user_id
+
+    Returns:
+        list: Resultado de cada shard con elementos
+    """
+    items = list(items)
+    if _router is None:
+        with db.engine.connect() as connection:
+            return [func(connection, items)]
+
+    key = key or (lambda item: item)
+    groups = {}
+    for item in items:
+        groups.setdefault(_router.index(key(item)), []).append(item)
+
+    def gather(index):
+        with _router.engines[index].connect() as connection:
+            return func(connection, groups[index])
+
+    if len(groups) <= 1:
+        return [gather(index) for index in groups]
+    with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix='shard-scatter') as pool:
+        return list(pool.map(gather, sorted(groups)))
+
+
+# ==================== PASO A SHARDS ====================
+
+def distribute_readings(chunk_size=20000):
+    """
+    Mueve las lecturas de la BD principal a su shard conservando los ids.
+    Paciente a paciente y por bloques de ids consecutivos: cada bloque se
+    inserta en el shard (borrando antes ese rango, por si una ejecución
+    anterior se cortó a medias) y luego se borra de la principal. Debe
+    ejecutarse antes de activar la ingesta con reparto, para que los ids
+    nuevos de los shards no choquen con los copiados.
+
+    Returns:
+        dict: patients, rows, elapsed
+    """
+    import time
+    from sqlalchemy import select
+
+    if _router is None:
+        raise RuntimeError('Reparto desactivado (SENSOR_SHARDS <= 1)')
+    started = time.perf_counter()
+    source = SensorData.__table__
+    target = _router.table
+    _router.create_schema()
+
+    with db.engine.connect() as connection:
+        user_ids = connection.execute(select(source.c.user_id).distinct().order_by(source.c.user_id)).scalars().all()
+
+    moved = 0
+    for user_id in user_ids:
+        engine = readings_engine(user_id)
+        while True:
+            with db.engine.connect() as connection:
+                rows = connection.execute(
+                    select(source).where(source.c.user_id == user_id).order_by(source.c.id).limit(chunk_size)
+                ).mappings().all()
+            if not rows:
+                break
+            first, last = rows[0]['id'], rows[-1]['id']
+            with engine.begin() as connection:
+                connection.execute(target.delete().where(target.c.user_id == user_id,
+                                                         target.c.id.between(first, last)))
+                connection.execute(target.insert(), [dict(row) for row in rows])
+            with db.engine.begin() as connection:
+                connection.execute(source.delete().where(source.c.user_id == user_id,
+                                                         source.c.id.between(first, last)))
+            moved += len(rows)
+    return {'patients': len(user_ids), 'rows': moved, 'elapsed': round(time.perf_counter() - started, 2)}
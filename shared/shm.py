@@ -0,0 +1,62 @@
+# shared/shm.py
+"""
+Utilidades de memoria compartida entre procesos.
+Los archivos mapeados viven en /app/instance (volumen compartido por los
+contenedores admin y user), así ambos procesos ven las mismas páginas.
+"""
+import fcntl
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+
+
+class SharedMapping:
+    """
+    Región de memoria mapeada sobre un archivo, con bloqueo exclusivo
+    entre procesos (flock) y entre hilos del mismo proceso.
+
+    Args:
+        path (str): Ruta del archivo de respaldo
+        size (int): Tamaño total de la región en bytes
+        initializer (callable): Función ``initializer(buf)`` que se ejecuta
+            con el bloqueo tomado cuando el archivo es nuevo o ``is_valid``
+            devuelve False
+        is_valid (callable): Función ``is_valid(buf)`` que valida la cabecera
+    """
+
+    def __init__(self, path, size, initializer=None, is_valid=None):
+        self.path = path
+        self.size = size
+        self._thread_lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o660)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            fresh = os.fstat(self._fd).st_size != size
+            if fresh:
+                os.ftruncate(self._fd, size)
+            self.buf = mmap.mmap(self._fd, size)
+            if initializer and (fresh or (is_valid and not is_valid(self.buf))):
+                self.buf[:] = bytes(size)
+                initializer(self.buf)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @contextmanager
+    def locked(self):
+        """Bloqueo exclusivo para escrituras (hilos + procesos)."""
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield self.buf
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self.buf.close()
+        os.close(self._fd)
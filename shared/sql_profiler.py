@@ -0,0 +1,276 @@
+# shared/sql_profiler.py
+"""
+Perfilador de SQL para desarrollo (opcional, SQL_PROFILER=1).
+
+Registra las sentencias de cada petición mediante eventos de SQLAlchemy y al
+terminar imprime un informe cuando detecta:
+    - N+1: la misma forma de sentencia (parámetros aparte) repetida
+      SQL_PROFILER_REPEAT veces o más, con la línea de la app que la lanza;
+    - consultas lentas (más de SQL_PROFILER_SLOW_MS);
+    - recorridos completos de sensor_data: se adjunta EXPLAIN QUERY PLAN de
+      cada forma de SELECT sobre esa tabla (una vez por forma y proceso);
+    - rutas que superan su presupuesto de consultas (``@query_budget``).
+
+Las respuestas llevan X-SQL-Queries y X-SQL-Time-ms. Con
+SQL_PROFILER_STRICT=1 superar un presupuesto lanza QueryBudgetExceeded.
+
+En pruebas, sin activar el perfilador:
+    with max_queries(5) as recorder:
+        client.get('/admin/dashboard')      # QueryBudgetExceeded si pasa de 5
+
+Uso:
+    SQL_PROFILER=1 python -m admin.app_admin
+"""
+import contextvars
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_APP_DIRS = tuple(os.path.join(PROJECT_ROOT, name) + os.sep for name in ('admin', 'user', 'shared'))
+
+_IN_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+_recorders = contextvars.ContextVar('sql_recorders', default=())
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecord:
+    __slots__ = ('statement', 'parameters', 'duration', 'location', 'executemany')
+
+    def __init__(self, statement, parameters, duration, location, executemany):
+        self.statement = statement
+        self.parameters = parameters
+        self.duration = duration
+        self.location = location
+        self.executemany = executemany
+
+    @property
+    def shape(self):
+        return statement_shape(self.statement)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(query.duration for query in self.queries)
+
+    def repeated(self, threshold):
+        """[(forma, veces, primera ubicación)] de las formas repetidas >= threshold."""
+        shapes = {}
+        for query in self.queries:
+            entry = shapes.setdefault(query.shape, [0, query.location])
+            entry[0] += 1
+        return sorted(((shape, count, location) for shape, (count, location) in shapes.items()
+                       if count >= threshold), key=lambda item: -item[1])
+
+    def describe(self):
+        return '\n'.join(f'  {query.duration * 1000:7.1f} ms  {query.location or "-"}  {_short(query.statement)}'
+                         for query in self.queries)
+
+
+def statement_shape(statement):
+    """Sentencia sin variaciones de formato ni de tamaño de listas IN."""
+    return _IN_LIST.sub('(?...)', _WHITESPACE.sub(' ', statement).strip())
+
+
+def _short(statement, width=160):
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    return statement if len(statement) <= width else statement[:width - 3] + '...'
+
+
+def _caller():
+    """Primera línea de la app (fuera de este módulo) en la pila actual."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIRS) and filename != __file__:
+            return f'{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return None
+
+
+# ==================== CAPTURA ====================
+
+_tracking = False
+
+
+def _track_statements():
+    global _tracking
+    if _tracking:
+        return
+    _tracking = True
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        context._profiler_started = time.perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        recorders = list(_recorders.get())
+        if has_request_context() and 'sql_profile' in g:
+            recorders.append(g.sql_profile)
+        if not recorders:
+            return
+        record = QueryRecord(statement, parameters, time.perf_counter() - context._profiler_started,
+                             _caller(), executemany)
+        for recorder in recorders:
+            recorder.queries.append(record)
+
+
+@contextmanager
+def record_queries():
+    """Registra las sentencias ejecutadas en el bloque (mismo hilo/contexto)."""
+    _track_statements()
+    recorder = QueryRecorder()
+    token = _recorders.set(_recorders.get() + (recorder,))
+    try:
+        yield recorder
+    finally:
+        _recorders.reset(token)
+
+
+@contextmanager
+def max_queries(budget):
+    """Falla (QueryBudgetExceeded) si el bloque ejecuta más de ``budget`` sentencias."""
+    with record_queries() as recorder:
+        yield recorder
+    if len(recorder) > budget:
+        raise QueryBudgetExceeded(
+            f'{len(recorder)} consultas (presupuesto {budget}):\n{recorder.describe()}')
+
+
+def query_budget(budget):
+    """Presupuesto de consultas de una vista; lo comprueba el perfilador."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapper.query_budget = budget
+        return wrapper
+    return decorator
+
+
+# ==================== ANÁLISIS POR PETICIÓN ====================
+
+class SQLProfiler:
+    """
+    Args:
+        repeat_threshold (int): Repeticiones de una forma que se reportan como N+1
+        slow_ms (float): Umbral de consulta lenta
+        explain_tables (tuple): Tablas cuyos SELECT se explican
+        strict (bool): Lanzar QueryBudgetExceeded al superar un presupuesto
+    """
+
+    def __init__(self, repeat_threshold=5, slow_ms=100, explain_tables=('sensor_data',), strict=False):
+        self.repeat_threshold = repeat_threshold
+        self.slow_ms = slow_ms
+        self.explain_tables = explain_tables
+        self.strict = strict
+        self._plans = {}
+
+    def explain(self, connection, query):
+        """Detalle de EXPLAIN QUERY PLAN (cacheado por forma)."""
+        shape = query.shape
+        if shape not in self._plans:
+            try:
+                rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + query.statement,
+                                                  query.parameters).fetchall()
+                self._plans[shape] = [row[-1] for row in rows]
+            except Exception as e:
+                self._plans[shape] = [f'(sin plan: {e})']
+        return self._plans[shape]
+
+    def _explainable(self, query):
+        statement = query.statement.lstrip().upper()
+        return not query.executemany and statement.startswith(('SELECT', 'WITH')) and \
+            any(re.search(rf'\b{table.upper()}\b', statement) for table in self.explain_tables)
+
+    def full_scans(self, recorder, engine):
+        """[(consulta, detalle del plan)] de los SELECT que recorren entera una tabla vigilada."""
+        candidates = {}
+        for query in recorder.queries:
+            if self._explainable(query):
+                candidates.setdefault(query.shape, query)
+        if not candidates:
+            return []
+        scans = []
+        with engine.connect() as connection:
+            for query in candidates.values():
+                for detail in self.explain(connection, query):
+                    if any(detail.startswith(f'SCAN {table}') for table in self.explain_tables):
+                        scans.append((query, detail))
+        return scans
+
+    def analyze(self, recorder, engine, budget=None):
+        """
+        Returns:
+            list: Advertencias (texto) de la petición
+        """
+        warnings = []
+        for shape, count, location in recorder.repeated(self.repeat_threshold):
+            warnings.append(f'⚠️ N+1: {count}× {_short(shape)} ({location or "-"})')
+        for query in recorder.queries:
+            if query.duration * 1000 >= self.slow_ms:
+                warnings.append(f'🐢 Lenta ({query.duration * 1000:.0f} ms): '
+                                f'{_short(query.statement)} ({query.location or "-"})')
+        for query, detail in self.full_scans(recorder, engine):
+            warnings.append(f'📋 {detail}: {_short(query.statement)} ({query.location or "-"})')
+        if budget is not None and len(recorder) > budget:
+            warnings.append(f'❌ Presupuesto superado: {len(recorder)} consultas (máximo {budget})')
+        return warnings
+
+
+def init_sql_profiler(app, db):
+    """Activa el perfilador si SQL_PROFILER está habilitado en la configuración."""
+    if not app.config.get('SQL_PROFILER'):
+        return None
+    profiler = SQLProfiler(repeat_threshold=app.config.get('SQL_PROFILER_REPEAT', 5),
+                           slow_ms=app.config.get('SQL_PROFILER_SLOW_MS', 100),
+                           strict=app.config.get('SQL_PROFILER_STRICT', False))
+    _track_statements()
+    print("🔍 Perfilador SQL activo")
+
+    @app.before_request
+    def start_sql_profile():
+        g.sql_profile = QueryRecorder()
+
+    @app.after_request
+    def report_sql_profile(response):
+        recorder = g.pop('sql_profile', None)
+        if recorder is None:
+            return response
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        warnings = profiler.analyze(recorder, db.engine, budget)
+
+        response.headers['X-SQL-Queries'] = str(len(recorder))
+        response.headers['X-SQL-Time-ms'] = f'{recorder.total_time * 1000:.1f}'
+        if warnings:
+            print(f"🔍 SQL {request.method} {request.path} → {len(recorder)} consultas, "
+                  f"{recorder.total_time * 1000:.1f} ms")
+            for warning in warnings:
+                print(f"   {warning}")
+        if profiler.strict and budget is not None and len(recorder) > budget:
+            raise QueryBudgetExceeded(
+                f'{request.endpoint}: {len(recorder)} consultas (presupuesto {budget}):\n{recorder.describe()}')
+        return response
+
+    return profiler
@@ -0,0 +1,247 @@
+# shared/synthetic.py
+"""
+Series sintéticas de frecuencia cardíaca y carga masiva en ``sensor_data``.
+
+Cada serie se genera vectorizada con NumPy (una muestra cada ``interval``
+segundos, como la pulsera) sumando:
+    - reposo: según edad y condición, distinto para cada paciente;
+    - ritmo circadiano: mínimo hacia las 4:00, máximo por la tarde;
+    - actividad: deriva lenta (ruido suavizado) y sesiones de ejercicio
+      diurnas con subida, meseta y recuperación (np.interp sobre los nodos);
+    - condición: latidos ectópicos en arritmia, rachas paroxísticas en
+      taquicardia, caídas en bradicardia;
+    - ruido de medida del sensor.
+
+La alerta de cada lectura se calcula con los límites del paciente
+(min_safe_bpm/max_safe_bpm), igual que en la ingesta.
+
+Uso:
+    flask --app admin.app_admin seed-readings --patients 1000 --days 30
+    flask --app admin.app_admin seed-readings --user-id 5 --days 7 --interval 3
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from shared.models import db, User, SensorData
+from shared.shards import readings_engine
+
+# Condiciones (valores del formulario de datos médicos) y su peso al crear pacientes
+CONDITIONS = (('', 0.55), ('arritmia', 0.12), ('taquicardia', 0.12), ('bradicardia', 0.08),
+              ('hipertension', 0.08), ('cardiopatia', 0.05))
+
+# Desplazamiento del pulso en reposo por condición
+REST_OFFSET = {'taquicardia': 22, 'bradicardia': -18, 'hipertension': 6, 'cardiopatia': 4}
+
+CIRCADIAN_AMPLITUDE = 5
+EXERCISE_SESSIONS_PER_DAY = 0.8
+SENSOR_NOISE = 1.5
+BPM_RANGE = (30, 220)
+
+
+def _timeline(start, end, interval, rng):
+    """Instantes (epoch, float64) cada ``interval`` segundos con algo de jitter."""
+    # Fechas UTC sin zona: timestamp() las tomaría como hora local
+    begin = start.replace(tzinfo=timezone.utc).timestamp()
+    count = int((end.replace(tzinfo=timezone.utc).timestamp() - begin) // interval)
+    times = begin + np.arange(count) * interval
+    return times + rng.uniform(-0.25, 0.25, count) * min(interval, 1.0)
+
+
+def _smoothed_noise(count, sigma, window, rng):
+    """Ruido gaussiano suavizado (deriva lenta) con núcleo exponencial."""
+    kernel = np.exp(-np.arange(window) / (window / 4))
+    kernel /= np.sqrt((kernel ** 2).sum())
+    noise = rng.normal(0, sigma, count + window - 1)
+    return np.convolve(noise, kernel, mode='valid')
+
+
+def _bursts(times, rate_per_day, duration, rise, fall, amplitude, rng, daytime=None):
+    """
+    Episodios trapezoidales (subida, meseta, bajada) sin solaparse.
+
+    Args:
+        rate_per_day (float): Episodios por día (Poisson)
+        duration (tuple): Duración mínima y máxima en segundos
+        rise, fall (float): Segundos de subida y de recuperación
+        amplitude (tuple): Intensidad mínima y máxima (bpm sumados en la meseta)
+        daytime (tuple): Franja horaria de inicio (horas UTC) o None
+    """
+    if len(times) == 0:
+        return np.zeros(0)
+    begin, end = times[0], times[-1]
+    days = max((end - begin) / 86400, 1e-9)
+    count = rng.poisson(rate_per_day * days)
+    if count == 0:
+        return np.zeros(len(times))
+    starts = np.sort(rng.uniform(begin, end, count))
+    if daytime is not None:
+        day_start = np.floor(starts / 86400) * 86400
+        starts = day_start + rng.uniform(daytime[0], daytime[1], count) * 3600
+        starts = np.sort(starts[(starts >= begin) & (starts < end)])
+    lengths = rng.uniform(duration[0], duration[1], len(starts))
+    levels = rng.uniform(amplitude[0], amplitude[1], len(starts))
+    # Sin solapes: se descartan los que empiezan antes de que acabe el anterior
+    ends = starts + lengths + fall
+    keep = np.ones(len(starts), dtype=bool)
+    keep[1:] = starts[1:] > np.maximum.accumulate(ends)[:-1]
+    starts, lengths, levels = starts[keep], lengths[keep], levels[keep]
+    if len(starts) == 0:
+        return np.zeros(len(times))
+
+    knots = np.column_stack([starts, starts + rise, starts + lengths, starts + lengths + fall]).ravel()
+    values = np.column_stack([np.zeros_like(levels), levels, levels, np.zeros_like(levels)]).ravel()
+    return np.interp(times, knots, values, left=0, right=0)
+
+
+def _ectopic_beats(times, probability, rng):
+    """Saltos aislados de pocos segundos (latidos ectópicos) hacia arriba o abajo."""
+    hits = rng.random(len(times)) < probability
+    jumps = np.zeros(len(times))
+    jumps[hits] = rng.choice([-1, 1], hits.sum()) * rng.uniform(18, 40, hits.sum())
+    # La muestra siguiente conserva parte del salto
+    jumps[1:] += 0.4 * jumps[:-1]
+    return jumps
+
+
+def resting_bpm(age, heart_condition, rng):
+    age = age or 40
+    base = 72 + 0.08 * (age - 40) + REST_OFFSET.get(heart_condition or '', 0)
+    return base + rng.normal(0, 4)
+
+
+def generate_readings(patient, start, end, interval=3, rng=None):
+    """
+    Serie de un paciente entre ``start`` y ``end`` (datetime UTC).
+
+    Args:
+        patient: Objeto con age, heart_condition, min_safe_bpm y max_safe_bpm (User)
+        interval (float): Segundos entre muestras
+
+    Returns:
+        tuple: (times epoch float64, bpm int16, is_alert bool) como arrays de NumPy
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    times = _timeline(start, end, interval, rng)
+    count = len(times)
+    condition = patient.heart_condition or ''
+    age = patient.age or 40
+    # El reposo queda por encima del límite inferior: las alertas las provocan
+    # la noche, el ejercicio y la condición, no un paciente sano siempre en alerta
+    rest = min(max(resting_bpm(age, condition, rng), (patient.min_safe_bpm or 60) + 12),
+               (patient.max_safe_bpm or 120) - 15)
+    reserve = max(20, (220 - age) - rest)
+
+    hours = (times % 86400) / 3600
+    bpm = rest - CIRCADIAN_AMPLITUDE * np.cos(2 * np.pi * (hours - 4) / 24)
+    bpm += _smoothed_noise(count, 3.0, max(2, int(600 / interval)), rng)
+    bpm += _bursts(times, EXERCISE_SESSIONS_PER_DAY, (15 * 60, 60 * 60), 180, 300,
+                   (0.35 * reserve, 0.7 * reserve), rng, daytime=(7, 21))
+
+    if condition == 'arritmia':
+        bpm += _ectopic_beats(times, 0.004 * interval / 3, rng)
+        bpm += _smoothed_noise(count, 4.0, 4, rng)
+    elif condition == 'taquicardia':
+        bpm += _bursts(times, 1.5, (60, 300), 10, 30, (35, 60), rng)
+    elif condition == 'bradicardia':
+        bpm += _bursts(times, 2.0, (120, 900), 30, 60, (-12, -6), rng)
+
+    bpm += rng.normal(0, SENSOR_NOISE, count)
+    bpm = np.clip(np.rint(bpm), *BPM_RANGE).astype(np.int16)
+    is_alert = (bpm > (patient.max_safe_bpm or 120)) | (bpm < (patient.min_safe_bpm or 60))
+    return times, bpm, is_alert
+
+
+def _format_timestamps(times):
+    """Epoch -> texto 'YYYY-MM-DD HH:MM:SS.ffffff' (formato de DateTime en SQLite)."""
+    stamps = np.datetime_as_string((times * 1e6).astype('datetime64[us]'), unit='us')
+    return np.char.replace(stamps, 'T', ' ')
+
+
+def bulk_load_readings(connection, user_id, times, bpm, is_alert, chunk_size=200000):
+    """
+    Inserta la serie con executemany directo del driver (sin objetos ORM).
+
+    Returns:
+        int: Filas insertadas
+    """
+    table = SensorData.__table__
+    marker = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+    statement = (f'INSERT INTO {table.name} (user_id, bpm, timestamp, is_alert) '
+                 f'VALUES ({marker}, {marker}, {marker}, {marker})')
+    stamps = _format_timestamps(times)
+    for offset in range(0, len(times), chunk_size):
+        window = slice(offset, offset + chunk_size)
+        rows = list(zip([user_id] * len(stamps[window]), bpm[window].tolist(),
+                        stamps[window].tolist(), is_alert[window].tolist()))
+        connection.exec_driver_sql(statement, rows)
+    return len(times)
+
+
+def create_patients(count, password='paciente123', seed=None):
+    """
+    Crea ``count`` pacientes sintéticos (edad, condición y límites calculados).
+
+    Returns:
+        list: ids de los pacientes creados
+    """
+    rng = random.Random(seed)
+    conditions, weights = zip(*CONDITIONS)
+    # Todos comparten contraseña: un único hash para no pagar pbkdf2 por paciente
+    template = User(role='user')
+    template.set_password(password)
+    tag = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+
+    rows = []
+    for i in range(count):
+        patient = User(username=f'sim{tag}{i:05d}', email=f'sim{tag}{i:05d}@example.com',
+                       role='user', age=rng.randint(18, 90), weight=round(rng.uniform(45, 120), 1),
+                       height=round(rng.uniform(150, 198), 1),
+                       heart_condition=rng.choices(conditions, weights)[0] or None)
+        patient.calculate_safe_limits()
+        rows.append(dict(username=patient.username, email=patient.email, password_hash=template.password_hash,
+                         role='user', is_active=True, is_deleted=False, created_at=datetime.utcnow(),
+                         age=patient.age, weight=patient.weight, height=patient.height,
+                         heart_condition=patient.heart_condition,
+                         max_safe_bpm=patient.max_safe_bpm or 120, min_safe_bpm=patient.min_safe_bpm or 60))
+    if rows:
+        db.session.execute(User.__table__.insert(), rows)
+        db.session.commit()
+    usernames = [row['username'] for row in rows]
+    return [uid for (uid,) in db.session.query(User.id).filter(User.username.in_(usernames))]
+
+
+def seed_readings(patients, days=7, interval=3, end=None, seed=None):
+    """
+    Genera y carga las lecturas de los pacientes (una transacción por paciente).
+
+    Args:
+        patients (list): Objetos User
+        days (float): Días hacia atrás desde ``end``
+        end (datetime): Última lectura (por defecto, ahora)
+
+    Returns:
+        dict: patients, rows, alerts, elapsed, rows_per_second
+    """
+    rng = np.random.default_rng(seed)
+    end = end or datetime.utcnow()
+    start = end - timedelta(days=days)
+    started = time.perf_counter()
+    total = alerts = 0
+
+    for patient in patients:
+        times, bpm, is_alert = generate_readings(patient, start, end, interval, rng)
+        with readings_engine(patient.id).begin() as connection:
+            total += bulk_load_readings(connection, patient.id, times, bpm, is_alert)
+        alerts += int(is_alert.sum())
+
+    elapsed = time.perf_counter() - started
+    return {
+        'patients': len(patients),
+        'rows': total,
+        'alerts': alerts,
+        'elapsed': round(elapsed, 2),
+        'rows_per_second': int(total / elapsed) if elapsed else total,
+    }
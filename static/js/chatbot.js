@@ -13,7 +13,7 @@ class Chatbot {
         this.showLoading();
         
         try {
-            const response = await fetch('/user/api/chatbot-analysis', {
+            const response = await fetch('/user/api/chatbot-stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -21,12 +21,29 @@ class Chatbot {
                 body: JSON.stringify({ message: message })
             });
             
-            const data = await response.json();
-            
-            if (response.ok) {
-                this.addMessage('bot', data.response);
-            } else {
+            if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                this.hideLoading();
                 this.addMessage('bot', '❌ Error: ' + (data.error || 'No se pudo conectar con el asistente'));
+                return;
+            }
+            
+            // La respuesta llega por fragmentos: se muestra a medida que se recibe
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let text = '';
+            let bubble = null;
+            
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                text += decoder.decode(value, { stream: true });
+                if (!bubble) {
+                    this.hideLoading();
+                    bubble = this.addMessage('bot', text);
+                } else {
+                    this.updateMessage(bubble, text);
+                }
             }
         } catch (error) {
             this.addMessage('bot', '❌ Error de conexión. Intenta nuevamente.');
@@ -50,6 +67,13 @@ class Chatbot {
         
         messagesContainer.innerHTML += messageHtml;
         messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        return messagesContainer.lastElementChild;
+    }
+
+    updateMessage(element, text) {
+        element.innerHTML = `<strong>CardioBot:</strong><br>${this.formatMessage(text)}`;
+        const messagesContainer = document.getElementById('chatbot-messages');
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
     }
 
     formatMessage(text) {
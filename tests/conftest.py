@@ -0,0 +1,74 @@
+# tests/conftest.py
+"""
+Fixtures comunes: una app combinada sobre una BD SQLite nueva por prueba.
+
+INSTANCE_PATH se lee al importar shared.app_factory, así que se fija aquí,
+antes de que ninguna prueba importe la app. El planificador y las métricas
+se desactivan para que no arranquen hilos ni escriban instantáneas.
+
+Uso:
+    python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ['INSTANCE_PATH'] = tempfile.mkdtemp(prefix='hearttone-tests-')
+os.environ['SCHEDULER_ENABLED'] = '0'
+os.environ['METRICS_ENABLED'] = '0'
+# Hash barato: las pruebas crean usuarios, no miden el coste de pbkdf2
+os.environ.setdefault('PASSWORD_HASH_ADMIN', 'pbkdf2:sha256:1000')
+os.environ.setdefault('PASSWORD_HASH_USER', 'pbkdf2:sha256:1000')
+
+
+@pytest.fixture
+def app(tmp_path):
+    from shared.app_factory import create_app
+    from shared.commands import initialize_database
+    from shared.alert_rules import alert_engine
+    from shared.live_buffer import get_live_buffer
+    from shared.identity import reset_identities
+    from shared.fragments import reset_fragments
+    from shared.population import reset_population
+
+    app = create_app('combined', {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.db'),
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+    })
+    initialize_database(app)
+    # Estado del proceso compartido entre pruebas (los ids se repiten en cada BD)
+    alert_engine._states.clear()
+    reset_identities()
+    reset_fragments()
+    reset_population()
+    with app.app_context():
+        live_buffer = get_live_buffer()
+        if live_buffer:
+            live_buffer.reset()
+    yield app
+    from shared.models import db
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def make_patient(app):
+    """Crea un paciente activo con dispositivo; retorna (id, device_code)."""
+    from shared.models import db, User
+
+    def make(username='paciente', device_code='HR-TEST-0001', password='paciente123', **fields):
+        with app.app_context():
+            user = User(username=username, email=f'{username}@example.com', role='user',
+                        device_code=device_code, **fields)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+            return user.id, device_code
+    return make
@@ -0,0 +1,28 @@
+def _login(client, prefix, username, password):
+    response = client.post(f'{prefix}/login', data={'username': username, 'password': password})
+    assert response.status_code == 302
+
+
+def test_deleting_admin_logs_out_patients_it_created(app, make_patient):
+    from shared.models import db, User
+
+    with app.app_context():
+        root = User.query.filter_by(username='admin').one()
+        other = User(username='ana', email='ana@example.com', role='admin', created_by=root.id)
+        other.set_password('ana12345')
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.id
+    patient_id, _ = make_patient(created_by=other_id)
+
+    patient = app.test_client()
+    _login(patient, '/user', 'paciente', 'paciente123')
+    assert patient.get('/user/dashboard').status_code == 200  # Identidad en caché
+
+    admin = app.test_client()
+    _login(admin, '/admin', 'admin', 'admin123')
+    assert admin.post(f'/admin/admin/delete/{other_id}').status_code == 302
+
+    with app.app_context():
+        assert db.session.get(User, patient_id) is None
+    assert patient.get('/user/dashboard').status_code == 302
@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from shared.alert_rules import (AlertRuleEngine, RateOfChangeRule, SustainedThresholdRule, _RuleState,
+                                 close_stale_episodes, end_open_episodes)
+
+
+def _state(bpm, timestamp):
+    state = _RuleState()
+    state.last_bpm = bpm
+    state.last_timestamp = timestamp
+    return state
+
+
+def test_rate_rule_skips_readings_closer_than_min_gap():
+    rule = RateOfChangeRule('cambio_brusco', max_bpm_per_minute=400)
+    now = datetime(2026, 1, 1, 12, 0, 0)
+    # Reintento del dispositivo: 5 BPM en 5 ms serían 60000 BPM/min
+    assert not rule.accepts(now + timedelta(milliseconds=5), _state(80, now))
+    assert not rule.accepts(now, _state(80, now))
+    assert rule.accepts(now + timedelta(seconds=3), _state(80, now))
+    assert rule.accepts(now, _RuleState())
+
+
+def test_rate_rule_still_detects_real_jumps():
+    rule = RateOfChangeRule('cambio_brusco', max_bpm_per_minute=400)
+    now = datetime(2026, 1, 1, 12, 0, 0)
+    user = SimpleNamespace(id=1)
+    assert rule.is_triggered(user, 110, now + timedelta(seconds=3), _state(80, now))
+    assert not rule.is_triggered(user, 85, now + timedelta(seconds=3), _state(80, now))
+    # Más allá de max_gap no se comparan
+    assert not rule.is_triggered(user, 150, now + timedelta(seconds=60), _state(80, now))
+
+
+def test_burst_of_posts_does_not_open_rate_episode(app, make_patient):
+    from shared.models import AlertEpisode, NotificationOutbox
+
+    user_id, code = make_patient(caregiver_email='cuidador@example.com')
+    client = app.test_client()
+    for bpm in (80, 85, 80, 86):
+        response = client.post('/admin/api/sensor-data', json={'device_code': code, 'bpm': bpm})
+        assert response.status_code == 200
+        assert 'alert_episodes' not in response.get_json()
+
+    with app.app_context():
+        assert AlertEpisode.query.filter_by(user_id=user_id).count() == 0
+        assert NotificationOutbox.query.filter_by(user_id=user_id).count() == 0
+
+
+# ==================== MOTOR ====================
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def _run(engine, user, readings):
+    """readings: [(segundos desde START, bpm)] -> eventos (tipo, regla)"""
+    events = []
+    for seconds, bpm in readings:
+        events += [(event.type, event.rule.name)
+                   for event in engine.evaluate(user, bpm, START + timedelta(seconds=seconds))]
+    return events
+
+
+@pytest.fixture
+def patient(app, make_patient):
+    from shared.models import db, User
+
+    user_id, _ = make_patient(max_safe_bpm=120, min_safe_bpm=60)
+    with app.app_context():
+        yield db.session.get(User, user_id)
+        db.session.rollback()
+
+
+def _episodes(user_id):
+    from shared.models import AlertEpisode
+    return AlertEpisode.query.filter_by(user_id=user_id).order_by(AlertEpisode.id).all()
+
+
+def test_readings_hours_apart_are_not_sustained(patient):
+    engine = AlertRuleEngine([SustainedThresholdRule('taquicardia', 'high', min_duration=60)], max_gap=120)
+    assert _run(engine, patient, [(0, 150), (3 * 3600, 150)]) == []
+    assert _run(engine, patient, [(3 * 3600 + 61, 150)]) == [('opened', 'taquicardia')]
+    assert _episodes(patient.id)[0].started_at == START + timedelta(hours=3)
+
+
+def test_gap_closes_open_episode_at_last_reading(patient):
+    engine = AlertRuleEngine([SustainedThresholdRule('taquicardia', 'high', min_duration=60)], max_gap=120)
+    assert _run(engine, patient, [(0, 150), (30, 150), (61, 150), (90, 155)]) == [('opened', 'taquicardia')]
+    assert _run(engine, patient, [(3600, 70)]) == [('closed', 'taquicardia')]
+    (episode,) = _episodes(patient.id)
+    assert episode.ended_at == START + timedelta(seconds=90)
+
+
+def test_close_stale_episodes_for_silent_device(patient):
+    engine = AlertRuleEngine([SustainedThresholdRule('taquicardia', 'high', min_duration=60)], max_gap=120)
+    _run(engine, patient, [(0, 150), (61, 150)])
+    assert close_stale_episodes(engine.max_gap, now=START + timedelta(seconds=120)) == []
+    (closed,) = close_stale_episodes(engine.max_gap, now=START + timedelta(seconds=300))
+    assert closed[0] == 'taquicardia'
+    assert _episodes(patient.id)[0].ended_at == START + timedelta(seconds=61)
+    # El motor no vuelve a cerrarlo ni actualiza el episodio cerrado
+    assert _run(engine, patient, [(600, 70)]) == []
+
+
+def test_close_reading_does_not_start_clear_timer(patient):
+    engine = AlertRuleEngine([RateOfChangeRule('cambio_brusco', clear_duration=60)])
+    assert _run(engine, patient, [(0, 80), (3, 110)]) == [('opened', 'cambio_brusco')]
+    state = engine._states[(patient.id, 'cambio_brusco')]
+    before = (state.clear_since, state.last_bpm, state.last_timestamp, state.samples)
+    assert _run(engine, patient, [(3.5, 110)]) == []
+    assert (state.clear_since, state.last_bpm, state.last_timestamp, state.samples) == before
+    assert state.episode_id is not None
+
+
+def test_episode_ended_elsewhere_is_not_continued(patient):
+    from shared.models import db
+
+    engine = AlertRuleEngine([SustainedThresholdRule('taquicardia', 'high', min_duration=60)], max_gap=120)
+    _run(engine, patient, [(0, 150), (61, 150)])
+    end_open_episodes(patient.id)
+    db.session.commit()
+    assert _run(engine, patient, [(64, 170)]) == []
+    (episode,) = _episodes(patient.id)
+    assert (episode.extreme_bpm, episode.ended_at) == (150, START + timedelta(seconds=61))
+
+
+def test_deleting_readings_ends_episodes_and_forgets_state(app, make_patient):
+    from shared.alert_rules import alert_engine
+    from shared.models import db, AlertEpisode, User
+
+    user_id, _ = make_patient()
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        alert_engine.evaluate(user, 150, START)  # Umbral pendiente
+        db.session.add(AlertEpisode(user_id=user_id, rule='bradicardia_sostenida', kind='low',
+                                    started_at=START, last_seen_at=START, extreme_bpm=40))
+        db.session.commit()
+    assert any(key[0] == user_id for key in alert_engine._states)
+
+    client = app.test_client()
+    client.post('/user/login', data={'username': 'paciente', 'password': 'paciente123'})
+    assert client.post('/user/delete-readings').status_code == 302
+
+    assert not any(key[0] == user_id for key in alert_engine._states)
+    with app.app_context():
+        assert AlertEpisode.query.filter_by(user_id=user_id, ended_at=None).count() == 0
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+from shared.chatbot_config import INTENTS, fold_text, intent_matcher
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+from bench_intent_matcher import CORPUS, folded_legacy_intent, legacy_intent  # noqa: E402
+
+
+@pytest.mark.parametrize('message', CORPUS)
+def test_matches_legacy_chain_on_folded_text(message):
+    assert intent_matcher.match(fold_text(message))[0] == folded_legacy_intent(message)
+
+
+def test_only_accentless_messages_differ_from_original():
+    changed = [m for m in CORPUS if intent_matcher.match(fold_text(m))[0] != legacy_intent(m)]
+    assert changed and all(m.isascii() for m in changed)
+
+
+def test_returns_keywords_of_winning_intent():
+    assert intent_matcher.match(fold_text('Tengo dolor y además una alerta')) == ('emergencia', ['alerta'])
+    assert intent_matcher.match(fold_text('dolor y mareo')) == ('sintomas', ['dolor', 'mareo'])
+    assert intent_matcher.match('buenos dias') == (None, [])
+
+
+def test_every_keyword_routes_to_its_intent_or_a_higher_one():
+    priority = [intent for intent, _ in INTENTS]
+    for intent, keywords in INTENTS:
+        for keyword in keywords:
+            found = intent_matcher.match(fold_text(keyword))[0]
+            assert priority.index(found) <= priority.index(intent)
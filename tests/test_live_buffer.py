@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from shared.live_buffer import PROBES, LiveReadingBuffer
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def _readings(count, start=START, bpm=70):
+    return [(start + timedelta(seconds=i), bpm, False) for i in range(count)]
+
+
+def test_colliding_users_keep_their_readings(tmp_path):
+    buffer = LiveReadingBuffer(str(tmp_path / 'live.bin'), slots=8, capacity=4)
+    assert buffer.seed(1, _readings(2, bpm=60)) == 0
+    assert buffer.seed(9, _readings(2, bpm=90)) == 0  # 9 % 8 == 1
+
+    assert buffer.append(1, START + timedelta(seconds=5), 61, False)
+    assert buffer.append(9, START + timedelta(seconds=5), 91, False)
+    assert [r.bpm for r in buffer.window(1, START)] == [60, 60, 61]
+    assert [r.bpm for r in buffer.window(9, START)] == [90, 90, 91]
+
+
+def test_full_probe_range_evicts_least_recent(tmp_path):
+    buffer = LiveReadingBuffer(str(tmp_path / 'live.bin'), slots=8, capacity=4)
+    colliding = [1 + 8 * i for i in range(PROBES)]
+    for i, user_id in enumerate(colliding):
+        buffer.seed(user_id, _readings(1, start=START + timedelta(minutes=i)))
+    buffer.append(colliding[0], START + timedelta(hours=1), 70, False)
+
+    assert buffer.seed(1 + 8 * PROBES, _readings(1)) == colliding[1]
+    assert buffer.latest(colliding[1]) is None
+    assert not buffer.append(colliding[1], START + timedelta(hours=1), 70, False)
+    assert buffer.latest(colliding[0]).bpm == 70
+
+
+def test_discard_frees_slot_for_reuse(tmp_path):
+    buffer = LiveReadingBuffer(str(tmp_path / 'live.bin'), slots=8, capacity=4)
+    buffer.seed(1, _readings(1))
+    buffer.seed(9, _readings(1))
+    buffer.discard(1)
+    assert buffer.latest(1) is None
+    assert buffer.latest(9) is not None
+    assert buffer.seed(17, _readings(1)) == 0
@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from shared.chatbot_config import INTERRUPTED_NOTICE, ChatbotManager
+from shared.llm_backend import HTTPModelBackend, LLMTimeout, LLMUnavailable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+from llm_stub_server import ANSWER, make_handler  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    """Modelo simulado en un hilo; las opciones se pueden cambiar en cada prueba."""
+    options = SimpleNamespace(token_delay=0, first_token_delay=0, fail_rate=0.0, verbose=False)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(options))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    options.url = f'http://127.0.0.1:{server.server_address[1]}/generate'
+    yield options
+    server.shutdown()
+    server.server_close()
+
+
+def _manager(backend):
+    manager = ChatbotManager()
+    manager.backend = backend
+    return manager
+
+
+def test_stream_yields_tokens_as_they_arrive(stub):
+    chunks = list(HTTPModelBackend(stub.url).stream('hola'))
+    assert len(chunks) == len(ANSWER.split(' '))
+    assert ''.join(chunks) == ANSWER
+
+
+def test_generate_joins_the_stream(stub):
+    assert HTTPModelBackend(stub.url).generate('hola') == ANSWER
+
+
+def test_read_timeout_before_first_token(stub):
+    stub.first_token_delay = 1
+    backend = HTTPModelBackend(stub.url, read_timeout=0.2)
+    started = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        list(backend.stream('hola'))
+    assert time.monotonic() - started < 0.9
+
+
+def test_total_timeout_cuts_slow_stream(stub):
+    stub.token_delay = 0.05
+    backend = HTTPModelBackend(stub.url, read_timeout=5, total_timeout=0.2)
+    chunks = []
+    with pytest.raises(LLMTimeout):
+        for chunk in backend.stream('hola'):
+            chunks.append(chunk)
+    assert 0 < len(chunks) < len(ANSWER.split(' '))
+
+
+def test_semaphore_limits_concurrent_calls(stub):
+    stub.token_delay = 0.05
+    backend = HTTPModelBackend(stub.url, max_concurrency=1, acquire_timeout=0.05)
+    first = backend.stream('uno')
+    assert next(first)  # Ocupa el único hueco mientras no termine
+    with pytest.raises(LLMUnavailable, match='simultáneas'):
+        next(backend.stream('dos'))
+    first.close()
+    stub.token_delay = 0
+    assert backend.generate('tres') == ANSWER
+
+
+def test_http_error_is_unavailable(stub):
+    stub.fail_rate = 1.0
+    with pytest.raises(LLMUnavailable):
+        list(HTTPModelBackend(stub.url).stream('hola'))
+
+
+def test_falls_back_to_rules_when_backend_fails(stub):
+    stub.fail_rate = 1.0
+    manager = _manager(HTTPModelBackend(stub.url))
+    expected = manager._get_rule_based('dame un consejo', None)
+    assert list(manager.stream_response('dame un consejo')) == [expected]
+    assert manager.get_response('dame un consejo') == expected
+
+
+def test_falls_back_when_backend_is_unreachable():
+    with ThreadingHTTPServer(('127.0.0.1', 0), None) as closed:
+        url = f'http://127.0.0.1:{closed.server_address[1]}/generate'
+    manager = _manager(HTTPModelBackend(url, connect_timeout=0.5))
+    assert manager.get_response('hola') == manager._get_rule_based('hola', None)
+
+
+def test_stream_interrupted_midway_ends_with_notice(stub):
+    stub.token_delay = 0.05
+    manager = _manager(HTTPModelBackend(stub.url, total_timeout=0.2))
+    chunks = list(manager.stream_response('hola'))
+    assert chunks[-1] is INTERRUPTED_NOTICE
+    assert ANSWER.startswith(''.join(chunks[:-1]))
+
+
+def test_http_error_releases_the_connection(stub):
+    stub.fail_rate = 1.0
+    backend = HTTPModelBackend(stub.url, pool_size=1)
+    session = backend._get_session()
+    responses = []
+    post = session.post
+
+    def recording_post(*args, **kwargs):
+        responses.append(post(*args, **kwargs))
+        return responses[-1]
+    session.post = recording_post
+
+    with pytest.raises(LLMUnavailable):
+        list(backend.stream('hola'))
+    (response,) = responses
+    assert response.status_code >= 500
+    assert response.raw.closed and response.raw.connection is None  # Devuelta al pool
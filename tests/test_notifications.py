@@ -0,0 +1,262 @@
+import json
+import socketserver
+import threading
+from datetime import datetime, timedelta
+from email import message_from_bytes
+from email.header import decode_header, make_header
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from shared.notifications import (NotificationDispatcher, SMTPChannel, WebhookChannel,
+                                  enqueue_alert_notifications)
+
+WEBHOOK_CONFIG = {'NOTIFY_WEBHOOK_URL': 'http://127.0.0.1:9/hook'}
+
+
+# ==================== SERVIDORES LOCALES ====================
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Servidor SMTP de depuración: acepta cualquier mensaje y lo guarda."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost')
+        envelope = {'rcpt': []}
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'EHLO':
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                envelope['from'] = line.split(':', 1)[1].strip('<> ')
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                envelope['rcpt'].append(line.split(':', 1)[1].strip('<> '))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                data = []
+                for raw in iter(self.rfile.readline, b'.\r\n'):
+                    data.append(raw[1:] if raw.startswith(b'..') else raw)
+                envelope['message'] = message_from_bytes(b''.join(data))
+                self.server.messages.append(envelope)
+                envelope = {'rcpt': []}
+                self.reply('250 OK')
+            else:
+                self.reply('250 OK')
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, self.headers['Content-Type'], json.loads(body)))
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _SMTPHandler)
+    server.messages = []
+    yield _serve(server)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def webhook_server():
+    server = HTTPServer(('127.0.0.1', 0), _WebhookHandler)
+    server.requests = []
+    server.status = 200
+    yield _serve(server)
+    server.shutdown()
+    server.server_close()
+
+
+# ==================== AUXILIARES ====================
+
+def _notification(id, body='cuerpo', subject='asunto', user_id=1, event_count=1):
+    return SimpleNamespace(id=id, user_id=user_id, subject=subject, body=body,
+                           event_count=event_count, created_at=datetime(2026, 1, 1, 12, 0, 0))
+
+
+def _event(kind='high', bpm=150):
+    episode = SimpleNamespace(kind=kind, started_at=datetime.utcnow(), extreme_bpm=bpm)
+    return SimpleNamespace(type='opened', episode=episode)
+
+
+def _enqueue(app, user_id, events, config=WEBHOOK_CONFIG):
+    from shared.models import db, User
+
+    with app.app_context():
+        enqueue_alert_notifications(db.session.get(User, user_id), events, config)
+        db.session.commit()
+
+
+def _outbox(app):
+    from shared.models import NotificationOutbox
+
+    with app.app_context():
+        return NotificationOutbox.query.order_by(NotificationOutbox.id).all()
+
+
+class _RecordingChannel:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def send(self, recipient, notifications):
+        if self.error:
+            raise self.error
+        self.sent.append((recipient, [n.id for n in notifications]))
+
+
+@pytest.fixture
+def dispatcher(app):
+    dispatchers = []
+
+    def make(channels, **options):
+        dispatchers.append(NotificationDispatcher(app, channels, **options))
+        return dispatchers[-1]
+    yield make
+    for instance in dispatchers:
+        instance.stop()
+
+
+# ==================== CANALES ====================
+
+def test_smtp_channel_sends_one_message_per_batch(smtp_server):
+    channel = SMTPChannel('127.0.0.1', smtp_server.server_address[1], sender='alertas@test.local')
+    channel.send('cuidador@example.com', [_notification(1, 'primero', 'Alerta 1')])
+    channel.send('cuidador@example.com', [_notification(2, 'segundo'), _notification(3, 'tercero')])
+
+    single, batch = smtp_server.messages
+    assert single['from'] == 'alertas@test.local'
+    assert single['rcpt'] == ['cuidador@example.com']
+    assert single['message']['Subject'] == 'Alerta 1'
+    assert str(make_header(decode_header(batch['message']['Subject']))) == '🚨 2 avisos de alerta cardíaca'
+    body = batch['message'].get_payload(decode=True).decode()
+    assert 'segundo' in body and 'tercero' in body
+
+
+def test_smtp_channel_raises_when_server_is_down():
+    with socketserver.TCPServer(('127.0.0.1', 0), _SMTPHandler) as closed:
+        port = closed.server_address[1]
+    with pytest.raises(OSError):
+        SMTPChannel('127.0.0.1', port, timeout=2).send('cuidador@example.com', [_notification(1)])
+
+
+def test_webhook_channel_posts_json(webhook_server):
+    url = f'http://127.0.0.1:{webhook_server.server_address[1]}/hook'
+    WebhookChannel().send(url, [_notification(7, 'cuerpo', event_count=3)])
+
+    path, content_type, payload = webhook_server.requests[0]
+    assert (path, content_type) == ('/hook', 'application/json')
+    assert payload == {'notifications': [{
+        'id': 7, 'user_id': 1, 'subject': 'asunto', 'body': 'cuerpo',
+        'event_count': 3, 'created_at': '2026-01-01T12:00:00'
+    }]}
+
+
+def test_webhook_channel_raises_on_http_error(webhook_server):
+    import requests
+
+    webhook_server.status = 503
+    url = f'http://127.0.0.1:{webhook_server.server_address[1]}/hook'
+    with pytest.raises(requests.HTTPError):
+        WebhookChannel().send(url, [_notification(1)])
+
+
+# ==================== OUTBOX Y DESPACHADOR ====================
+
+def test_enqueue_coalesces_pending_notifications(app, make_patient, dispatcher):
+    user_id, _ = make_patient()
+    _enqueue(app, user_id, [_event('high', 150)])
+    _enqueue(app, user_id, [_event('low', 38), _event('rate', 120)])
+
+    (pending,) = _outbox(app)
+    assert pending.event_count == 3
+    assert pending.body.count('Episodio detectado') == 3
+
+    # Una vez reclamada por el despachador ya no se le agregan episodios
+    channel = _RecordingChannel()
+    assert dispatcher({'webhook': channel}).dispatch_once() == 1
+    _enqueue(app, user_id, [_event()])
+    sent, new = _outbox(app)
+    assert (sent.status, new.status, new.event_count) == ('sent', 'pending', 1)
+    assert channel.sent == [(WEBHOOK_CONFIG['NOTIFY_WEBHOOK_URL'], [sent.id])]
+
+
+def test_enqueue_does_not_coalesce_outside_window(app, make_patient):
+    from shared.models import db, NotificationOutbox
+    from shared.notifications import COALESCE_WINDOW
+
+    user_id, _ = make_patient()
+    _enqueue(app, user_id, [_event()])
+    with app.app_context():
+        NotificationOutbox.query.update({'created_at': datetime.utcnow() - COALESCE_WINDOW - timedelta(seconds=1)})
+        db.session.commit()
+    _enqueue(app, user_id, [_event()])
+    assert [n.event_count for n in _outbox(app)] == [1, 1]
+
+
+def test_dispatcher_backs_off_and_marks_failed(app, make_patient, dispatcher):
+    from shared.models import db, NotificationOutbox
+
+    user_id, _ = make_patient()
+    _enqueue(app, user_id, [_event()])
+    worker = dispatcher({'webhook': _RecordingChannel(RuntimeError('caído'))},
+                        max_attempts=3, backoff_base=30, backoff_max=45)
+
+    delays = []
+    for _ in range(3):
+        started = datetime.utcnow()
+        assert worker.dispatch_once() == 1
+        (notification,) = _outbox(app)
+        delays.append((notification.next_attempt_at - started).total_seconds())
+        assert worker.dispatch_once() == 0  # Aún no toca reintentar
+        with app.app_context():
+            NotificationOutbox.query.update({'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)})
+            db.session.commit()
+
+    (notification,) = _outbox(app)
+    assert (notification.status, notification.attempts, notification.last_error) == ('failed', 3, 'caído')
+    assert 30 <= delays[0] < 31 and 45 <= delays[1] < 46  # 30 s, luego 60 s acotado a 45
+    assert worker.dispatch_once() == 0
+
+
+def test_dispatcher_retries_unknown_channel(app, make_patient, dispatcher):
+    user_id, _ = make_patient()
+    _enqueue(app, user_id, [_event()])
+    assert dispatcher({}).dispatch_once() == 1
+    (notification,) = _outbox(app)
+    assert (notification.status, notification.attempts) == ('pending', 1)
+    assert 'Canal no configurado' in notification.last_error
+
+
+def test_dispatcher_delivers_through_real_webhook(app, make_patient, dispatcher, webhook_server):
+    url = f'http://127.0.0.1:{webhook_server.server_address[1]}/hook'
+    user_id, _ = make_patient()
+    _enqueue(app, user_id, [_event(), _event('low', 38)], config={'NOTIFY_WEBHOOK_URL': url})
+
+    assert dispatcher({'webhook': WebhookChannel()}).dispatch_once() == 1
+    (notification,) = _outbox(app)
+    assert notification.status == 'sent' and notification.sent_at
+    (_, _, payload), = webhook_server.requests
+    assert payload['notifications'][0]['event_count'] == 2
@@ -0,0 +1,35 @@
+from shared.pagination import encode_cursor, keyset_paginate
+
+
+def _page(app, **kwargs):
+    from shared.models import User
+
+    with app.app_context():
+        query = User.query.filter_by(role='user')
+        page = keyset_paginate(query, [User.username, User.id], per_page=2, **kwargs)
+        return [user.username for user in page.items], page.next_cursor, page.prev_cursor
+
+
+def _patients(make_patient, count):
+    return [make_patient(username=f'paciente{i}', device_code=f'HR-TEST-{i:04d}')[0] for i in range(count)]
+
+
+def test_forward_and_back(app, make_patient):
+    _patients(make_patient, 5)
+    first, next_cursor, prev_cursor = _page(app)
+    assert (first, prev_cursor) == (['paciente0', 'paciente1'], None)
+    second, _, back = _page(app, after=next_cursor)
+    assert second == ['paciente2', 'paciente3']
+    assert _page(app, before=back)[0] == first
+
+
+def test_empty_page_before_boundary_returns_first_page(app, make_patient):
+    ids = _patients(make_patient, 5)
+    boundary = encode_cursor(['paciente0', ids[0]])
+    items, next_cursor, prev_cursor = _page(app, before=boundary)
+    assert (items, prev_cursor) == (['paciente0', 'paciente1'], None)
+    assert _page(app, after=next_cursor)[0] == ['paciente2', 'paciente3']
+
+
+def test_empty_listing_has_no_cursors(app):
+    assert _page(app, before=encode_cursor(['zzz', 1])) == ([], None, None)
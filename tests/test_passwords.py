@@ -0,0 +1,105 @@
+import threading
+
+from shared import passwords
+from shared.passwords import PasswordHasher, PasswordVerifierBusy
+
+
+def test_rehash_only_upgrades_cost():
+    hasher = PasswordHasher({'user': 'pbkdf2:sha256:260000'})
+    try:
+        assert not hasher.needs_rehash('pbkdf2:sha256:600000$salt$hash', 'user')
+        assert not hasher.needs_rehash('pbkdf2:sha256:260000$salt$hash', 'user')
+        assert hasher.needs_rehash('pbkdf2:sha256:100000$salt$hash', 'user')
+        assert hasher.needs_rehash('scrypt:32768:8:1$salt$hash', 'user')
+    finally:
+        hasher.shutdown()
+
+
+def test_admission_limit_keeps_request_threads_free():
+    assert passwords.admission_limit({'WEB_THREADS': 4}) == 2
+    assert passwords.admission_limit({'WEB_THREADS': 2}) == 1
+    assert passwords.admission_limit({'WEB_THREADS': 8, 'PASSWORD_HASH_MAX_PENDING': 3}) == 3
+
+
+def test_login_storm_leaves_other_pages_responsive(app, make_patient, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from itertools import islice
+
+    make_patient()
+    app.config['WEB_THREADS'] = 4
+    passwords.configure_password_hasher(app.config)
+    release = threading.Event()
+
+    def slow_check(password_hash, password):
+        release.wait(10)
+        return True
+    monkeypatch.setattr(passwords, 'check_password_hash', slow_check)
+
+    def login():
+        return app.test_client().post('/user/login', data={'username': 'paciente', 'password': 'x'}).status_code
+
+    # Cuatro "hilos de petición", como gunicorn con WEB_THREADS=4
+    with ThreadPoolExecutor(max_workers=4) as request_threads:
+        try:
+            logins = [request_threads.submit(login) for _ in range(6)]
+            page = request_threads.submit(lambda: app.test_client().get('/user/login').status_code)
+            assert page.result(timeout=5) == 200
+            # Los dos bloqueados ocupan hueco; los otros cuatro se rechazan sin esperar
+            rejected = list(islice(as_completed(logins, timeout=5), 4))
+            assert [f.result() for f in rejected] == [503] * 4
+        finally:
+            release.set()
+    assert sorted(f.result() for f in logins) == [302, 302, 503, 503, 503, 503]
+
+
+def _busy(password, role):
+    raise PasswordVerifierBusy()
+
+
+def _login(client, prefix, username, password):
+    assert client.post(f'{prefix}/login', data={'username': username, 'password': password}).status_code == 302
+
+
+def test_profile_update_reports_busy_without_changes(app, make_patient, monkeypatch):
+    from shared.models import db, User
+
+    user_id, _ = make_patient()
+    client = app.test_client()
+    _login(client, '/user', 'paciente', 'paciente123')
+    monkeypatch.setattr(passwords.password_hasher, 'hash', _busy)
+
+    response = client.post('/user/profile', data={'username': 'otro', 'email': 'otro@example.com',
+                                                  'password': 'nueva1234'})
+    assert response.status_code == 503
+    with app.app_context():
+        assert db.session.get(User, user_id).username == 'paciente'
+
+
+def test_create_admin_reports_busy(app, monkeypatch):
+    from shared.models import User
+
+    client = app.test_client()
+    _login(client, '/admin', 'admin', 'admin123')
+    monkeypatch.setattr(passwords.password_hasher, 'hash', _busy)
+
+    response = client.post('/admin/create-admin', data={'username': 'ana', 'email': 'ana@example.com',
+                                                        'password': 'ana12345', 'confirm_password': 'ana12345'})
+    assert response.status_code == 503
+    with app.app_context():
+        assert User.query.filter_by(username='ana').first() is None
+
+
+def test_initialize_database_survives_busy_hasher(app, monkeypatch, capsys):
+    from shared.commands import initialize_database
+    from shared.models import db, User
+
+    with app.app_context():
+        db.session.delete(User.query.filter_by(username='admin').one())
+        db.session.commit()
+    monkeypatch.setattr(passwords.password_hasher, 'hash', _busy)
+    initialize_database(app)
+    assert 'Error crítico' not in capsys.readouterr().out
+    monkeypatch.undo()
+    initialize_database(app)
+    with app.app_context():
+        assert User.query.filter_by(username='admin').one()
@@ -0,0 +1,51 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from shared.population import parse_hour_range, resting_hours_utc
+
+
+def test_default_resting_hours_are_utc_night():
+    assert resting_hours_utc() == (0, 1, 2, 3, 4, 5)
+
+
+def test_local_resting_hours_shift_to_utc():
+    guayaquil = ZoneInfo('America/Guayaquil')  # UTC-5 sin horario de verano
+    assert resting_hours_utc(guayaquil, (0, 6)) == (5, 6, 7, 8, 9, 10)
+    madrid = ZoneInfo('Europe/Madrid')
+    assert resting_hours_utc(madrid, (0, 2), now=datetime(2026, 1, 15)) == (23, 0)
+    assert resting_hours_utc(madrid, (0, 2), now=datetime(2026, 7, 15)) == (22, 23)
+
+
+def test_hour_range_across_midnight():
+    assert parse_hour_range('22-2') == (22, 2)
+    assert resting_hours_utc(None, (22, 2)) == (22, 23, 0, 1)
+
+
+@pytest.mark.parametrize('text', ['6', '3-3', '25-2', 'a-b'])
+def test_invalid_hour_range(text):
+    with pytest.raises(ValueError):
+        parse_hour_range(text)
+
+
+def test_resting_percentile_uses_configured_hours(app):
+    from types import SimpleNamespace
+    from shared import population
+
+    sketches = population.get_population()
+    # Mismo grupo: de noche en UTC (pulso alto) y de noche en Guayaquil (pulso bajo)
+    for hour in range(0, 5):
+        sketches.add(40, '', datetime(2026, 1, 1, hour), 90)
+    for hour in range(5, 11):
+        sketches.add(40, '', datetime(2026, 1, 1, hour), 50)
+    patient = SimpleNamespace(age=40, heart_condition='')
+
+    population._timezone, population._resting_hours = None, (0, 6)
+    utc = population.compare_to_population(patient, 70, resting_bpm=70)['resting_percentile']
+    population._timezone = ZoneInfo('America/Guayaquil')
+    try:
+        local = population.compare_to_population(patient, 70, resting_bpm=70)['resting_percentile']
+    finally:
+        population._timezone = None
+    assert local > utc
@@ -0,0 +1,174 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Query
+
+from shared.scheduler import RETRY_BASE, JobDefinition, Scheduler, _next_slot
+
+
+# ==================== AUXILIARES ====================
+
+def _definitions(func=lambda: None, every=None, max_attempts=3, concurrency=2):
+    # Con concurrency=2 el límite por definición no decide quién reclama
+    return {'prueba': JobDefinition('prueba', func, every=every, concurrency=concurrency,
+                                    max_attempts=max_attempts)}
+
+
+def _add_row(app, interval=None, next_run_at=None):
+    from shared.models import db, ScheduledJob
+
+    with app.app_context():
+        row = ScheduledJob(name='prueba' if interval else 'prueba:1', job='prueba', interval_seconds=interval,
+                           status='scheduled', next_run_at=next_run_at or datetime.utcnow())
+        db.session.add(row)
+        db.session.commit()
+        return row.id
+
+
+def _row(app, job_id):
+    from shared.models import db, ScheduledJob
+
+    with app.app_context():
+        return db.session.get(ScheduledJob, job_id)
+
+
+def _make_due(app, job_id):
+    from shared.models import db, ScheduledJob
+
+    with app.app_context():
+        ScheduledJob.query.filter_by(id=job_id).update({'next_run_at': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+
+
+def _claim(scheduler):
+    with scheduler.app.app_context():
+        return scheduler._claim(1)
+
+
+def _run_claimed(scheduler):
+    """Reclama y ejecuta en este hilo, sin el bucle del planificador."""
+    (claimed,) = _claim(scheduler)
+    scheduler._execute(*claimed)
+
+
+# ==================== RECLAMO Y ARRENDAMIENTO ====================
+
+def test_two_schedulers_claim_a_due_job_once(app, monkeypatch):
+    job_id = _add_row(app)
+    schedulers = [Scheduler(app, _definitions()) for _ in range(2)]
+
+    # Ambos leen la fila como pendiente antes de que ninguno intente el UPDATE
+    barrier = threading.Barrier(2, timeout=5)
+    original_all = Query.all
+    read = threading.local()
+
+    def all_then_wait(query):
+        rows = original_all(query)
+        if not getattr(read, 'done', False):
+            read.done = True
+            barrier.wait()
+        return rows
+    monkeypatch.setattr(Query, 'all', all_then_wait)
+
+    results = [None, None]
+
+    def claim(index):
+        results[index] = _claim(schedulers[index])
+    threads = [threading.Thread(target=claim, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    winners = [s for s, claimed in zip(schedulers, results) if claimed]
+    assert len(winners) == 1 and sorted(map(len, results)) == [0, 1]
+    row = _row(app, job_id)
+    assert (row.status, row.lease_owner, row.attempts) == ('running', winners[0].owner, 1)
+
+
+def test_expired_lease_is_reclaimed_by_another_process(app):
+    job_id = _add_row(app)
+    first, second = Scheduler(app, _definitions()), Scheduler(app, _definitions())
+    assert len(_claim(first)) == 1
+    assert _claim(second) == []  # Arrendamiento vigente
+
+    from shared.models import db, ScheduledJob
+    with app.app_context():
+        ScheduledJob.query.filter_by(id=job_id).update({'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+    assert len(_claim(second)) == 1
+    row = _row(app, job_id)
+    assert (row.lease_owner, row.attempts) == (second.owner, 2)
+
+    # El dueño original termina tarde: no pisa al nuevo
+    with app.app_context():
+        first._finish(job_id, first.definitions['prueba'], 'succeeded', None, None, 1.0)
+    row = _row(app, job_id)
+    assert (row.status, row.lease_owner) == ('running', second.owner)
+
+
+# ==================== REINTENTOS Y PERIODOS ====================
+
+def test_one_off_job_backs_off_then_fails(app):
+    calls = []
+
+    def broken():
+        calls.append(1)
+        raise RuntimeError('caído')
+    job_id = _add_row(app)
+    scheduler = Scheduler(app, _definitions(broken, max_attempts=3))
+
+    delays = []
+    for _ in range(3):
+        started = datetime.utcnow()
+        _run_claimed(scheduler)
+        row = _row(app, job_id)
+        if row.status == 'scheduled':
+            delays.append((row.next_run_at - started).total_seconds())
+            assert _claim(scheduler) == []  # Aún no toca reintentar
+            _make_due(app, job_id)
+
+    row = _row(app, job_id)
+    assert (row.status, row.attempts, row.last_error) == ('failed', 3, 'RuntimeError: caído')
+    assert len(calls) == 3
+    assert RETRY_BASE <= delays[0] < RETRY_BASE + 1 and 2 * RETRY_BASE <= delays[1] < 2 * RETRY_BASE + 1
+    assert _claim(scheduler) == []
+
+
+def test_expired_lease_on_last_attempt_marks_failed(app):
+    from shared.models import db, ScheduledJob
+
+    job_id = _add_row(app)
+    with app.app_context():
+        ScheduledJob.query.filter_by(id=job_id).update({
+            'status': 'running', 'attempts': 3, 'lease_owner': 'muerto',
+            'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+    assert _claim(Scheduler(app, _definitions(max_attempts=3))) == []
+    row = _row(app, job_id)
+    assert (row.status, row.lease_owner) == ('failed', None)
+    assert 'Arrendamiento vencido' in row.last_error
+
+
+@pytest.mark.parametrize('late, expected', [
+    (timedelta(0), timedelta(minutes=10)),
+    (timedelta(minutes=5), timedelta(minutes=10)),
+    (timedelta(minutes=35), timedelta(minutes=40)),  # Se saltan los turnos perdidos
+    (timedelta(minutes=-1), timedelta(minutes=10)),  # Adelantado con run_now
+])
+def test_next_slot_catches_up_on_the_period(late, expected):
+    slot = datetime(2026, 1, 1, 10, 0)
+    assert _next_slot(slot, 600, slot + late) == slot + expected
+
+
+def test_periodic_job_reschedules_on_its_grid(app):
+    slot = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=25)
+    job_id = _add_row(app, interval=600, next_run_at=slot)
+    scheduler = Scheduler(app, _definitions(lambda: {'ok': True}, every=timedelta(minutes=10)))
+
+    _run_claimed(scheduler)
+    row = _row(app, job_id)
+    assert (row.status, row.attempts, row.last_outcome) == ('scheduled', 0, 'succeeded')
+    assert row.next_run_at == slot + timedelta(minutes=30)
+    assert row.last_result == '{"ok": true}'
@@ -0,0 +1,148 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from shared import shards
+
+
+def _build(tmp_path, count):
+    from shared.app_factory import create_app
+    from shared.commands import initialize_database
+
+    app = create_app('combined', {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.db'),
+        'SENSOR_SHARDS': count,
+        'SENSOR_SHARD_DIR': str(tmp_path / 'shards'),
+        'WTF_CSRF_ENABLED': False,
+        'TESTING': True,
+    })
+    initialize_database(app)
+    return app
+
+
+def _release(app):
+    from shared.models import db
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    shards.release_shards()
+    shards._router = None  # El resto de pruebas corre sin reparto
+
+
+@pytest.fixture
+def sharded_app(app, tmp_path):
+    """Misma BD principal que ``app`` con sensor_data repartida en 2 shards."""
+    sharded = _build(tmp_path, 2)
+    yield sharded
+    _release(sharded)
+
+
+def _patients(make_patient, count):
+    # El admin principal es el id 1: los pacientes alternan entre los shards 0 y 1
+    return [make_patient(username=f'paciente{i}', device_code=f'HR-TEST-{i:04d}') for i in range(count)]
+
+
+def _shard_rows(tmp_path, index, user_id=None):
+    path = shards.shard_path(str(tmp_path / 'shards'), index)
+    with sqlite3.connect(path) as connection:
+        query = 'SELECT id, user_id, bpm FROM sensor_data'
+        if user_id is not None:
+            return connection.execute(query + ' WHERE user_id = ? ORDER BY id', (user_id,)).fetchall()
+        return connection.execute(query + ' ORDER BY id').fetchall()
+
+
+def _main_rows(tmp_path):
+    with sqlite3.connect(tmp_path / 'test.db') as connection:
+        return connection.execute('SELECT id, user_id, bpm FROM sensor_data ORDER BY id').fetchall()
+
+
+def _ingest(app, code, values):
+    client = app.test_client()
+    for bpm in values:
+        assert client.post('/admin/api/sensor-data', json={'device_code': code, 'bpm': bpm}).status_code == 200
+
+
+def _seed(app, user_ids, per_user=6):
+    from shared.models import db, SensorData
+
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add_all(SensorData(user_id=user_id, bpm=60 + i + user_id, is_alert=i == 0,
+                                      timestamp=now - timedelta(hours=i))
+                           for user_id in user_ids for i in range(per_user))
+        db.session.commit()
+
+
+def test_ingest_and_pages_use_the_patient_shard(sharded_app, make_patient, tmp_path):
+    (a, code_a), (b, code_b) = _patients(make_patient, 2)
+    assert (shards.shard_index(a, 2), shards.shard_index(b, 2)) == (0, 1)
+    _ingest(sharded_app, code_a, [70, 71, 72])
+    _ingest(sharded_app, code_b, [90, 91, 92, 93, 94])
+
+    assert [row[2] for row in _shard_rows(tmp_path, 0)] == [70, 71, 72]
+    assert [row[2] for row in _shard_rows(tmp_path, 1)] == [90, 91, 92, 93, 94]
+    assert _main_rows(tmp_path) == []
+
+    patient = sharded_app.test_client()
+    patient.post('/user/login', data={'username': 'paciente1', 'password': 'paciente123'})
+    assert '<h3>5</h3>' in patient.get('/user/dashboard').get_data(as_text=True)
+
+    admin = sharded_app.test_client()
+    admin.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+    assert '<h3>3</h3>' in admin.get(f'/admin/user-report/{a}').get_data(as_text=True)
+
+
+def test_delete_user_readings_commits_on_each_shard(sharded_app, make_patient, tmp_path):
+    (a, code_a), (b, code_b), (c, code_c) = _patients(make_patient, 3)
+    for code in (code_a, code_b, code_c):
+        _ingest(sharded_app, code, [70, 80])
+
+    with sharded_app.app_context():
+        assert shards.delete_user_readings([a, b]) == 4
+        shards.readings_session(a).remove()  # Sin commit del llamador: ya está confirmado
+
+    assert _shard_rows(tmp_path, 0, a) == [] and _shard_rows(tmp_path, 1, b) == []
+    assert len(_shard_rows(tmp_path, 0, c)) == 2
+
+
+def test_shard_readings_keeps_ids_and_aggregates(app, make_patient, tmp_path):
+    from admin.admin_routes import _recent_stats
+
+    ids = [user_id for user_id, _ in _patients(make_patient, 4)]
+    _seed(app, ids)
+    original = _main_rows(tmp_path)
+    since = datetime.utcnow() - timedelta(days=7)
+
+    def aggregate(target):
+        with target.app_context():
+            merged = {}
+            for partial in shards.scatter(lambda connection, group: _recent_stats(connection, group, since), ids):
+                merged.update(partial)
+            return merged
+
+    unsharded = aggregate(app)
+    sharded = _build(tmp_path, 2)
+    try:
+        # Ejecución anterior cortada: el primer bloque del paciente ya copiado pero no borrado
+        with sharded.app_context():
+            shards.create_shard_schema()
+        first = [row for row in original if row[1] == ids[0]][:3]
+        with sqlite3.connect(shards.shard_path(str(tmp_path / 'shards'), 0)) as connection:
+            connection.executemany('INSERT INTO sensor_data (id, user_id, bpm, timestamp, is_alert) '
+                                   'VALUES (?, ?, ?, CURRENT_TIMESTAMP, 0)', first)
+
+        runner = sharded.test_cli_runner()
+        for _ in range(2):  # Idempotente
+            result = runner.invoke(args=['shard-readings', '--chunk-size', '4'])
+            assert result.exit_code == 0, result.output
+
+        assert _main_rows(tmp_path) == []
+        moved = sorted(_shard_rows(tmp_path, 0) + _shard_rows(tmp_path, 1))
+        assert moved == original
+        assert all(shards.shard_index(user_id, 2) == index
+                   for index in (0, 1) for _, user_id, _ in _shard_rows(tmp_path, index))
+        assert aggregate(sharded) == unsharded
+    finally:
+        _release(sharded)
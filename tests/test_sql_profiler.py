@@ -0,0 +1,144 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from shared.sql_profiler import SQLProfiler, max_queries, record_queries
+
+
+def _login(client, prefix, username, password):
+    assert client.post(f'{prefix}/login', data={'username': username, 'password': password}).status_code == 302
+    return client
+
+
+def _add_admin(app, username='ana'):
+    from shared.models import db, User
+
+    with app.app_context():
+        root = User.query.filter_by(username='admin').one()
+        admin = User(username=username, email=f'{username}@example.com', role='admin', created_by=root.id)
+        admin.set_password('ana12345')
+        db.session.add(admin)
+        db.session.commit()
+        return admin.id
+
+
+def _seed_patients(make_patient, count, created_by=None, prefix='paciente'):
+    return [make_patient(username=f'{prefix}{i}', device_code=f'HR-{prefix[:3].upper()}-{i:04d}',
+                         created_by=created_by)[0] for i in range(count)]
+
+
+# ==================== PRESUPUESTOS DE RUTAS ====================
+
+def _expected_dashboard(app, username):
+    """Los contadores como se calculaban antes, un COUNT por tarjeta."""
+    from shared.models import AlertEpisode, Device, User
+
+    with app.app_context():
+        admin = User.query.filter_by(username=username).one()
+        inactive = User.query.filter_by(is_active=False, is_deleted=True)
+        if not admin.is_root_admin():
+            inactive = inactive.filter_by(created_by=admin.id)
+        values = [
+            User.query.filter_by(role='user', is_active=True, is_deleted=False).count(),
+            Device.query.filter_by(is_used=False).count(),
+            Device.query.filter_by(is_used=True).count(),
+            AlertEpisode.query.count(),
+        ]
+        if admin.is_root_admin():
+            values.append(User.query.filter_by(role='admin', is_active=True, is_deleted=False).count() - 1)
+        else:
+            values.append(User.query.filter_by(created_by=admin.id, is_active=True, is_deleted=False).count())
+        return values + [inactive.count()]
+
+
+def test_admin_dashboard_counts_in_one_query(app, make_patient):
+    from shared.models import db, Device, User
+
+    ana_id = _add_admin(app)
+    root_patients = _seed_patients(make_patient, 3)
+    _seed_patients(make_patient, 2, created_by=ana_id, prefix='ana')
+    with app.app_context():
+        db.session.get(User, root_patients[0]).deactivate_account()
+        for device in Device.query.limit(3):
+            device.is_used = True
+        db.session.commit()
+
+    for username, password in (('admin', 'admin123'), ('ana', 'ana12345')):
+        client = _login(app.test_client(), '/admin', username, password)
+        with max_queries(4):
+            page = client.get('/admin/dashboard').get_data(as_text=True)
+        cards = [int(value) for value in re.findall(r'<h5 class="card-title">(\d+)</h5>', page)]
+        assert cards == _expected_dashboard(app, username)
+
+
+def test_user_reports_within_budget(app, make_patient):
+    ids = _seed_patients(make_patient, 6)
+    with app.app_context():
+        from shared.models import db, SensorData
+        db.session.add_all(SensorData(user_id=user_id, bpm=70, timestamp=datetime.utcnow()) for user_id in ids)
+        db.session.commit()
+    client = _login(app.test_client(), '/admin', 'admin', 'admin123')
+
+    with max_queries(4):
+        assert client.get('/admin/user-reports').status_code == 200
+    with max_queries(1):  # Fragmento en caché
+        assert client.get('/admin/user-reports').status_code == 200
+
+
+def test_weekly_report_is_one_grouped_query(app, make_patient):
+    from shared.models import db, SensorData
+
+    user_id, _ = make_patient()
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.add_all([
+            SensorData(user_id=user_id, bpm=70, timestamp=now - timedelta(hours=1)),
+            SensorData(user_id=user_id, bpm=130, is_alert=True, timestamp=now - timedelta(hours=2)),
+            SensorData(user_id=user_id, bpm=60, timestamp=now - timedelta(days=2, hours=1)),
+            SensorData(user_id=user_id, bpm=99, timestamp=now - timedelta(days=8)),  # Fuera de la semana
+        ])
+        db.session.commit()
+    client = _login(app.test_client(), '/user', 'paciente', 'paciente123')
+
+    with max_queries(2) as recorder:
+        days = client.get('/user/api/weekly-report').get_json()
+    assert sum('FROM sensor_data' in query.statement for query in recorder.queries) == 1
+    assert len(days) == 7
+    assert (days[6]['readings'], days[6]['alerts'], days[6]['avg_bpm']) == (2, 1, 100.0)
+    assert (days[4]['readings'], days[4]['avg_bpm']) == (1, 60.0)
+    assert sum(day['readings'] for day in days) == 3
+
+
+@pytest.mark.parametrize('patients', [2, 10])
+def test_delete_admin_cost_does_not_grow_with_patients(app, make_patient, patients):
+    from shared.models import db, User
+
+    ana_id = _add_admin(app)
+    _seed_patients(make_patient, patients, created_by=ana_id)
+    client = _login(app.test_client(), '/admin', 'admin', 'admin123')
+
+    with max_queries(12):
+        assert client.post(f'/admin/admin/delete/{ana_id}').status_code == 302
+    with app.app_context():
+        assert User.query.filter_by(created_by=ana_id).count() == 0
+
+
+# ==================== ANÁLISIS ====================
+
+def test_analyze_flags_repeats_and_sensor_scans(app, make_patient):
+    from shared.models import db
+
+    make_patient()
+    with app.app_context():
+        with record_queries() as recorder:
+            with db.engine.connect() as connection:
+                for bpm in range(60, 65):
+                    connection.exec_driver_sql('SELECT id FROM sensor_data WHERE bpm = ?', (bpm,)).fetchall()
+                connection.exec_driver_sql('SELECT id FROM users WHERE id = ?', (1,)).fetchall()
+        warnings = SQLProfiler(repeat_threshold=5).analyze(recorder, db.engine, budget=3)
+
+    assert any(w.startswith('⚠️ N+1: 5×') and 'sensor_data WHERE bpm = ?' in w for w in warnings)
+    assert any(w.startswith('📋 SCAN sensor_data') for w in warnings)
+    assert not any('users' in w for w in warnings)
+    assert warnings[-1] == '❌ Presupuesto superado: 6 consultas (máximo 3)'
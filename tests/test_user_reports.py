@@ -0,0 +1,71 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from shared.sql_profiler import record_queries
+
+
+def _seed(app, make_patient, patients, with_digest=()):
+    from shared.models import db, HealthDigest, SensorData
+
+    now = datetime.utcnow()
+    ids = []
+    for i in range(patients):
+        user_id, _ = make_patient(username=f'paciente{i}', device_code=f'HR-TEST-{i:04d}')
+        ids.append(user_id)
+    with app.app_context():
+        for i, user_id in enumerate(ids):
+            db.session.add_all(SensorData(user_id=user_id, bpm=70 + i + minute, is_alert=minute == 0,
+                                          timestamp=now - timedelta(minutes=minute))
+                               for minute in range(4))
+            if i in with_digest:
+                db.session.add(HealthDigest(user_id=user_id, digest_date=date.today(), total_readings=99,
+                                            alert_readings=0, avg_bpm=60, status='Estable',
+                                            status_class='success'))
+        db.session.commit()
+    return ids
+
+
+@pytest.mark.parametrize('patients', [2, 12])
+def test_live_fallback_is_one_grouped_query(app, make_patient, patients):
+    _seed(app, make_patient, patients, with_digest={0})
+    client = app.test_client()
+    assert client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'}).status_code == 302
+
+    with record_queries() as recorder:
+        response = client.get('/admin/user-reports')
+    assert response.status_code == 200
+    readings_queries = [q for q in recorder.queries if 'FROM sensor_data' in q.statement]
+    assert len(readings_queries) == 1
+    assert 'GROUP BY sensor_data.user_id' in readings_queries[0].statement
+
+    page = response.get_data(as_text=True)
+    assert '<td>99</td>' in page  # Paciente con resumen del lote
+    assert '<strong>72.5</strong>' in page  # Agregado en vivo: 71, 72, 73, 74
+
+
+def test_ingested_readings_do_not_invalidate_until_next_window(app, make_patient, monkeypatch):
+    import admin.admin_routes as admin_routes
+
+    bucket = [0]
+    monkeypatch.setattr(admin_routes, 'time_bucket', lambda: bucket[0])
+    _seed(app, make_patient, 2)
+    admin = app.test_client()
+    assert admin.post('/admin/login', data={'username': 'admin', 'password': 'admin123'}).status_code == 302
+
+    def reports_queries():
+        with record_queries() as recorder:
+            assert admin.get('/admin/user-reports').status_code == 200
+        return [q for q in recorder.queries if 'FROM sensor_data' in q.statement]
+
+    assert len(reports_queries()) == 1
+    ingest = app.test_client()
+    for bpm in (80, 81, 82):
+        assert ingest.post('/admin/api/sensor-data', json={'device_code': 'HR-TEST-0000', 'bpm': bpm}).status_code == 200
+    assert reports_queries() == []  # Las lecturas no cambian la versión global
+
+    bucket[0] += 1
+    assert len(reports_queries()) == 1  # Tramo nuevo
+
+    make_patient(username='paciente_nuevo', device_code='HR-TEST-9999')
+    assert len(reports_queries()) == 1  # Alta de un paciente: versión global
@@ -1,8 +1,17 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, Response, stream_with_context
 from flask_login import login_required, current_user, logout_user, login_user
-from shared.models import db, User, Device, SensorData
+from shared.models import db, User, Device, SensorData, HealthDigest
 from shared.forms import MedicalDataForm, ProfileForm, LoginForm, RegistrationForm
 from shared.chatbot_config import chatbot_manager
+from shared.live_buffer import get_live_buffer
+from shared.fragments import render_cached_page, mark_data_changed
+from shared import metrics
+from shared.sql_profiler import query_budget
+from shared.health import generate_health_analysis
+from shared.devices import find_device, claim_device, normalize_device_code
+from shared.passwords import PasswordVerifierBusy, rehash_after_login
+from shared.shards import readings_session, readings_query, delete_user_readings
+from shared.alert_rules import alert_engine, end_open_episodes
 from datetime import datetime, timedelta
 import random
 
@@ -19,7 +28,14 @@ def user_login():
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
         
-        if user and user.check_password(form.password.data) and user.is_active and user.role == 'user':
+        try:
+            valid = bool(user) and user.check_password(form.password.data)
+        except PasswordVerifierBusy:
+            flash('El servidor está atendiendo muchos inicios de sesión. Inténtalo de nuevo en unos segundos.', 'warning')
+            return render_template('auth/login.html', form=form), 503
+        
+        if valid and user.is_active and user.role == 'user':
+            rehash_after_login(user, form.password.data)
             login_user(user)
             flash('¡Inicio de sesión exitoso!', 'success')
             return redirect(url_for('user.dashboard'))
@@ -48,25 +64,13 @@ def user_register():
             flash('El email ya está registrado', 'danger')
             return render_template('auth/register.html', form=form)
         
-        # Validar código de dispositivo
-        device_code = form.device_code.data.strip().upper()
-        
-        from shared.auth import is_valid_device_code
+        # Validar código de dispositivo contra el registro
+        device_code = normalize_device_code(form.device_code.data)
         
-        if not is_valid_device_code(device_code):
+        if not find_device(device_code):
             flash('Código de dispositivo inválido. Use el código exacto de su pulsera.', 'danger')
             return render_template('auth/register.html', form=form)
         
-        # Verificar si el dispositivo ya está en uso
-        device = Device.query.filter_by(device_code=device_code).first()
-        if device and device.is_used:
-            flash('Este dispositivo ya está en uso por otro usuario', 'danger')
-            return render_template('auth/register.html', form=form)
-        
-        # Si el dispositivo no existe en BD, crearlo
-        if not device:
-            device = Device(device_code=device_code)
-        
         # Crear usuario
         user = User(
             username=form.username.data,
@@ -74,13 +78,18 @@ def user_register():
             device_code=device_code,
             role='user'
         )
-        user.set_password(form.password.data)
-        
-        device.is_used = True
+        try:
+            user.set_password(form.password.data)
+        except PasswordVerifierBusy:
+            flash('El servidor está atendiendo muchas solicitudes. Inténtalo de nuevo en unos segundos.', 'warning')
+            return render_template('auth/register.html', form=form), 503
+        
+        # Asignación atómica: falla si otro usuario ya lo tiene
+        if not claim_device(device_code):
+            flash('Este dispositivo ya está en uso por otro usuario', 'danger')
+            return render_template('auth/register.html', form=form)
         
         db.session.add(user)
-        if not Device.query.filter_by(device_code=device_code).first():
-            db.session.add(device)
         db.session.commit()
         
         flash('¡Cuenta creada exitosamente! Por favor inicia sesión.', 'success')
@@ -118,15 +127,16 @@ def dashboard():
         'normales': False
     }
     
-    query = SensorData.query.filter_by(user_id=current_user.id)
+    readings = readings_query(current_user.id)
+    query = readings.filter_by(user_id=current_user.id)
     
     if filter_type in filter_map and filter_map[filter_type] is not None:
         query = query.filter_by(is_alert=filter_map[filter_type])
     
     recent_data = query.order_by(SensorData.timestamp.desc()).limit(limit).all()
     
-    total_readings = SensorData.query.filter_by(user_id=current_user.id).count()
-    alert_count = SensorData.query.filter_by(user_id=current_user.id, is_alert=True).count()
+    total_readings = readings.filter_by(user_id=current_user.id).count()
+    alert_count = readings.filter_by(user_id=current_user.id, is_alert=True).count()
     
     return render_template('user/dashboard.html', 
                          recent_data=recent_data,
@@ -150,13 +160,19 @@ def profile():
             flash('El email ya está en uso por otro usuario', 'danger')
             return render_template('user/profile.html', form=form)
         
+        # Primero el hash: si el pool está saturado no se cambia nada
+        if form.password.data:
+            try:
+                current_user.set_password(form.password.data)
+            except PasswordVerifierBusy:
+                flash('El servidor está atendiendo muchas solicitudes. Inténtalo de nuevo en unos segundos.', 'warning')
+                return render_template('user/profile.html', form=form), 503
+        
         current_user.username = form.username.data
         current_user.email = form.email.data
         
-        if form.password.data:
-            current_user.set_password(form.password.data)
-        
         db.session.commit()
+        chatbot_manager.invalidate_user(current_user.id)
         flash('Perfil actualizado correctamente', 'success')
         return redirect(url_for('user.dashboard'))
     
@@ -184,10 +200,12 @@ def medical_data():
         current_user.height = form.height.data
         current_user.age = form.age.data
         current_user.heart_condition = form.heart_condition.data
+        current_user.caregiver_email = form.caregiver_email.data or None
         
         current_user.calculate_safe_limits()
         
         db.session.commit()
+        chatbot_manager.invalidate_user(current_user.id)
         flash('Datos médicos guardados correctamente', 'success')
         return redirect(url_for('user.monitoring'))
     
@@ -216,6 +234,14 @@ def health_report():
     filter_type = request.args.get('filter', 'todas')
     days = int(request.args.get('dias', 7))
     
+    # Visitas repetidas sin lecturas nuevas ni cambios de perfil: sin consultas ni render.
+    # La ventana de días avanza con el reloj: el TTL de la caché acota ese desfase
+    return render_cached_page('user/health_report.html',
+                              key=(current_user.id, filter_type, days),
+                              user_ids=[current_user.id],
+                              build=lambda: _health_report_context(filter_type, days))
+
+def _health_report_context(filter_type, days):
     filter_map = {
         'todas': None,
         'alertas': True,
@@ -224,7 +250,7 @@ def health_report():
     
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    query = SensorData.query.filter(
+    query = readings_query(current_user.id).filter(
         SensorData.user_id == current_user.id,
         SensorData.timestamp >= start_date
     )
@@ -250,19 +276,18 @@ def health_report():
         avg_bpm
     )
     
-    return render_template('user/health_report.html',
-                         recent_data=recent_data,
-                         total_readings=total_readings,
-                         alert_readings=alert_readings,
-                         normal_readings=normal_readings,
-                         alert_percentage=alert_percentage,
-                         normal_percentage=normal_percentage,
-                         avg_bpm=avg_bpm,
-                         health_message=health_message,
-                         health_tips=health_tips,
-                         current_filter=filter_type,
-                         current_days=days,
-                         start_date=start_date)
+    return dict(recent_data=recent_data,
+                total_readings=total_readings,
+                alert_readings=alert_readings,
+                normal_readings=normal_readings,
+                alert_percentage=alert_percentage,
+                normal_percentage=normal_percentage,
+                avg_bpm=avg_bpm,
+                health_message=health_message,
+                health_tips=health_tips,
+                current_filter=filter_type,
+                current_days=days,
+                start_date=start_date)
 
 # ==================== GESTIÓN DE CUENTA ====================
 
@@ -289,8 +314,9 @@ def deactivate_account():
 @user_bp.route('/delete-readings', methods=['POST'])
 @login_required
 def delete_readings():
-    deleted_count = SensorData.query.filter_by(user_id=current_user.id).delete()
+    deleted_count = delete_user_readings([current_user.id])
     db.session.commit()
+    invalidate_reading_caches(current_user.id)
     
     flash(f'Se eliminaron {deleted_count} lecturas de tu historial', 'success')
     return redirect(url_for('user.dashboard'))
@@ -298,7 +324,8 @@ def delete_readings():
 @user_bp.route('/cleanup-readings', methods=['POST'])
 @login_required
 def cleanup_readings():
-    latest_readings = SensorData.query.filter_by(user_id=current_user.id)\
+    readings = readings_session(current_user.id)
+    latest_readings = readings.query(SensorData).filter_by(user_id=current_user.id)\
         .order_by(SensorData.timestamp.desc())\
         .limit(100)\
         .all()
@@ -306,12 +333,13 @@ def cleanup_readings():
     if latest_readings:
         keep_ids = [reading.id for reading in latest_readings]
         
-        deleted_count = SensorData.query.filter(
+        deleted_count = readings.query(SensorData).filter(
             SensorData.user_id == current_user.id,
             ~SensorData.id.in_(keep_ids)
         ).delete()
         
-        db.session.commit()
+        readings.commit()
+        invalidate_reading_caches(current_user.id)
         flash(f'Se eliminaron {deleted_count} lecturas antiguas. Se mantuvieron las 100 más recientes.', 'success')
     else:
         flash('No hay lecturas para limpiar', 'info')
@@ -322,17 +350,29 @@ def cleanup_readings():
 
 @user_bp.route('/api/real-time-data')
 @login_required
+@query_budget(4)
 def api_real_time_data():
+    # La página de monitoreo sondea este endpoint cada pocos segundos
+    metrics.monitoring_sessions.touch(current_user.id)
     try:
-        latest_data = SensorData.query.filter_by(user_id=current_user.id)\
-            .order_by(SensorData.timestamp.desc())\
-            .first()
-        
         time_ago = datetime.utcnow() - timedelta(minutes=10)
-        historical_data = SensorData.query.filter(
-            SensorData.user_id == current_user.id,
-            SensorData.timestamp >= time_ago
-        ).order_by(SensorData.timestamp.asc()).all()
+        
+        # Primero el buffer compartido en memoria; la BD solo si no cubre la ventana
+        live_buffer = get_live_buffer()
+        historical_data = live_buffer.window(current_user.id, time_ago) if live_buffer else None
+        
+        if historical_data is not None:
+            latest_data = historical_data[-1] if historical_data else live_buffer.latest(current_user.id)
+        else:
+            readings = readings_query(current_user.id)
+            latest_data = readings.filter_by(user_id=current_user.id)\
+                .order_by(SensorData.timestamp.desc())\
+                .first()
+            
+            historical_data = readings.filter(
+                SensorData.user_id == current_user.id,
+                SensorData.timestamp >= time_ago
+            ).order_by(SensorData.timestamp.asc()).all()
         
         chart_labels = []
         chart_bpm = []
@@ -393,11 +433,14 @@ def api_chatbot_analysis():
         if not user_message:
             return jsonify({'error': 'Mensaje vacío'}), 400
         
-        # Obtener datos del usuario para contexto
-        user_data = get_user_health_context()
-        
-        # Obtener respuesta del chatbot real
-        bot_response = chatbot_manager.get_response(user_message, user_data)
+        # Respuesta desde caché si la intención y las estadísticas no cambiaron;
+        # el contexto completo solo se construye en un fallo de caché
+        bot_response = chatbot_manager.get_cached_response(
+            user_message,
+            current_user.id,
+            get_user_health_fingerprint(),
+            get_user_health_context
+        )
         
         return jsonify({
             'response': bot_response,
@@ -408,40 +451,98 @@ def api_chatbot_analysis():
         print(f"❌ Error en chatbot: {str(e)}")
         return jsonify({'error': 'Error en el análisis'}), 500
 
+@user_bp.route('/api/chatbot-stream', methods=['POST'])
+@login_required
+def api_chatbot_stream():
+    """Misma respuesta que api_chatbot_analysis, enviada por fragmentos (texto plano)."""
+    data = request.get_json(silent=True) or {}
+    user_message = data.get('message', '').strip()
+    
+    if not user_message:
+        return jsonify({'error': 'Mensaje vacío'}), 400
+    
+    chunks = chatbot_manager.stream_cached_response(
+        user_message,
+        current_user.id,
+        get_user_health_fingerprint(),
+        get_user_health_context
+    )
+    
+    response = Response(stream_with_context(chunks), mimetype='text/plain; charset=utf-8')
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: no acumular la respuesta
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @user_bp.route('/api/weekly-report')
 @login_required
+@query_budget(2)
 def api_weekly_report():
     week_ago = datetime.utcnow() - timedelta(days=7)
-    daily_data = []
     
+    # Los siete días en un solo GROUP BY (antes, una consulta por día)
+    day = db.case(*[(SensorData.timestamp < week_ago + timedelta(days=i + 1), i) for i in range(6)], else_=6)
+    rows = readings_session(current_user.id).query(
+        day,
+        db.func.count(SensorData.id),
+        db.func.avg(SensorData.bpm),
+        db.func.sum(db.case((SensorData.is_alert, 1), else_=0))
+    ).filter(
+        SensorData.user_id == current_user.id,
+        SensorData.timestamp >= week_ago,
+        SensorData.timestamp < week_ago + timedelta(days=7)
+    ).group_by(day).all()
+    by_day = {index: (count, avg_bpm, alerts) for index, count, avg_bpm, alerts in rows}
+    
+    daily_data = []
     for i in range(7):
-        day_start = week_ago + timedelta(days=i)
-        day_end = day_start + timedelta(days=1)
-        
-        day_readings = SensorData.query.filter(
-            SensorData.user_id == current_user.id,
-            SensorData.timestamp >= day_start,
-            SensorData.timestamp < day_end
-        ).all()
-        
-        day_bpms = [d.bpm for d in day_readings]
-        avg_bpm = sum(day_bpms) / len(day_bpms) if day_bpms else 0
-        alerts = len([d for d in day_readings if d.is_alert])
-        
+        count, avg_bpm, alerts = by_day.get(i, (0, 0, 0))
         daily_data.append({
-            'date': day_start.strftime('%d/%m'),
-            'avg_bpm': round(avg_bpm, 1),
-            'alerts': alerts,
-            'readings': len(day_readings)
+            'date': (week_ago + timedelta(days=i)).strftime('%d/%m'),
+            'avg_bpm': round(avg_bpm or 0, 1),
+            'alerts': int(alerts or 0),
+            'readings': count
         })
     
     return jsonify(daily_data)
 
 # ==================== FUNCIONES AUXILIARES ====================
 
+def invalidate_reading_caches(user_id):
+    """Descarta lo cacheado y el estado de alertas derivado de las lecturas del usuario tras borrarlas."""
+    # Lo pendiente o abierto venía de las lecturas borradas: no debe seguir con las nuevas.
+    # El motor de la ingesta (otro proceso) lo detecta al no poder actualizar el episodio
+    end_open_episodes(user_id)
+    db.session.commit()
+    alert_engine.forget(user_id)
+    chatbot_manager.invalidate_user(user_id)
+    mark_data_changed([user_id])
+    live_buffer = get_live_buffer()
+    if live_buffer:
+        live_buffer.discard(user_id)
+
+def get_user_health_fingerprint():
+    """Huella barata (una consulta agregada por índice) de los datos que usa get_user_health_context."""
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    count, last_id = readings_session(current_user.id).query(
+        db.func.count(SensorData.id),
+        db.func.max(SensorData.id)
+    ).filter(
+        SensorData.user_id == current_user.id,
+        SensorData.timestamp >= week_ago
+    ).one()
+    # El lote de resúmenes regenera la fila (id nuevo) con el análisis de la serie
+    digest_id = db.session.query(db.func.max(HealthDigest.id))\
+        .filter(HealthDigest.user_id == current_user.id).scalar()
+    
+    return (
+        count, last_id, digest_id,
+        current_user.age, current_user.weight, current_user.height,
+        current_user.heart_condition, current_user.max_safe_bpm, current_user.min_safe_bpm
+    )
+
 def get_user_health_context():
     week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_data = SensorData.query.filter(
+    recent_data = readings_query(current_user.id).filter(
         SensorData.user_id == current_user.id,
         SensorData.timestamp >= week_ago
     ).order_by(SensorData.timestamp.desc()).all()
@@ -465,7 +566,23 @@ def get_user_health_context():
     older_avg = sum(older_bpms) / len(older_bpms) if older_bpms else 0
     trend = "mejorando" if recent_avg < older_avg else "estable" if recent_avg == older_avg else "empeorando"
     
+    # Análisis de la serie (VFC, anomalías, reposo) del último resumen nocturno
+    digest = HealthDigest.query.filter_by(user_id=current_user.id)\
+        .order_by(HealthDigest.digest_date.desc()).first()
+    analytics = None
+    if digest and digest.resting_bpm is not None:
+        analytics = {
+            'digest_date': digest.digest_date.isoformat(),
+            'resting_bpm': digest.resting_bpm,
+            'rmssd_ms': digest.rmssd_ms,
+            'sdnn_ms': digest.sdnn_ms,
+            'pnn50': digest.pnn50,
+            'anomaly_count': digest.anomaly_count,
+            'changepoint_count': digest.changepoint_count
+        }
+    
     return {
+        'analytics': analytics,
         'user_profile': {
             'username': current_user.username,
             'age': current_user.age,
@@ -495,72 +612,3 @@ def get_user_health_context():
             for d in recent_data if d.is_alert
         ][:10]
     }
-
-def generate_health_analysis(recent_data, user, alert_percentage, avg_bpm):
-    messages = []
-    tips = []
-    
-    if alert_percentage < 10:
-        messages.append("🎉 ¡Excelente! Tu ritmo cardíaco se mantiene muy estable.")
-        tips.append("Continúa con tus buenos hábitos de salud.")
-    elif alert_percentage < 30:
-        messages.append("👍 Buen trabajo, tu ritmo cardíaco es mayormente estable.")
-        tips.append("Mantén un estilo de vida saludable y monitorea regularmente.")
-    else:
-        messages.append("⚠️ Se han detectado varias anomalías. Es importante prestar atención.")
-        tips.append("Considera consultar con un especialista para una evaluación completa.")
-    
-    if user.heart_condition:
-        if user.heart_condition == 'taquicardia':
-            if avg_bpm > 100:
-                messages.append("🔴 Se detectan valores consistentemente altos. Recomendamos:")
-                tips.extend([
-                    "Evita el consumo de cafeína y estimulantes",
-                    "Practica técnicas de relajación y respiración",
-                    "Mantén una hidratación adecuada"
-                ])
-            else:
-                messages.append("💚 Buen control de la taquicardia")
-                tips.append("Sigue las recomendaciones de tu cardiólogo")
-                
-        elif user.heart_condition == 'bradicardia':
-            if avg_bpm < 50:
-                messages.append("🔵 Se detectan valores consistentemente bajos. Recomendamos:")
-                tips.extend([
-                    "Realiza actividad física moderada regularmente",
-                    "Mantén una alimentación balanceada",
-                    "Consulta sobre posibles ajustes medicamentosos"
-                ])
-            else:
-                messages.append("💚 Buen control de la bradicardia")
-                tips.append("Continúa con tu seguimiento médico regular")
-                
-        elif user.heart_condition == 'arritmia':
-            bpms = [d.bpm for d in recent_data]
-            variability = max(bpms) - min(bpms) if bpms else 0
-            
-            if variability > 50:
-                messages.append("🔄 Alta variabilidad detectada. Recomendamos:")
-                tips.extend([
-                    "Evita situaciones de estrés intenso",
-                    "Mantén un horario regular de sueño",
-                    "Registra los episodios para compartir con tu médico"
-                ])
-            else:
-                messages.append("💚 Buena estabilidad del ritmo cardíaco")
-                tips.append("Sigue tomando tus medicamentos según indicación")
-                
-        elif user.heart_condition == 'hipertension':
-            messages.append("🩺 Para tu condición de hipertensión:")
-            tips.extend([
-                "Controla tu consumo de sal",
-                "Realiza ejercicio aeróbico regular",
-                "Mide tu presión arterial regularmente"
-            ])
-    
-    if avg_bpm > 90:
-        tips.append("💡 Considera incorporar meditación o yoga para reducir el estrés")
-    elif avg_bpm < 55:
-        tips.append("💡 La actividad física moderada puede ayudar a aumentar tu ritmo cardíaco en reposo")
-    
-    return messages, tips
\ No newline at end of file
@@ -0,0 +1,7 @@
+# wsgi.py - Punto de entrada WSGI para producción
+# gunicorn -c gunicorn.conf.py wsgi:app   (APP_ROLE=admin|user|combined)
+import os
+
+from shared.app_factory import create_app
+
+app = create_app(os.environ.get('APP_ROLE', 'admin'))